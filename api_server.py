@@ -0,0 +1,340 @@
+# api_server.py
+# Local HTTP JSON API: validations.validate_input + core.calculate_all for other internal systems.
+#
+#   python api_server.py --port 8765 --workers 4 --window-ms 5 --max-batch 32
+#
+# Endpoints (request bodies use the io_json payload: a bare input dict or {"app_version", "input"}):
+#   POST /calculate[?search=full]      one input  -> 200 {"index": 0, "result": ...} / 422 {"index": 0, "errors": [...]}
+#   POST /calculate/bulk[?search=full] {"inputs": [...]} or [...] -> {"results": [batch_cli lines...], "ok", "errors"}
+#   POST /validate                     one input  -> {"errors": [...], "input": <normalized input>}
+#   GET  /health, GET /stats           stats: latency p50/p99, requests, records/s, batches, CPU/RSS per process
+#
+# - asyncio streams only (HTTP/1.1 with keep-alive, Content-Length bodies); no third-party server.
+# - Micro-batching: records arriving within window seconds (or max_batch of them) are grouped per search
+#   mode and sent as one batch_cli.process_chunk call to the executor, so the event loop never runs
+#   calculate_all and pool round trips are amortized. Workers return the JSON lines ready to send.
+# - workers <= 1 uses one worker thread instead of a process pool (tests, small hosts).
+
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from batch_cli import Record, process_chunk
+from core import SEARCH_MODES
+from io_json import normalize_input_dict
+from validations import validate_input
+
+MAX_BODY_BYTES = 32 * 1024 * 1024
+MAX_HEADER_LINES = 100
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    # nearest-rank percentile of an ascending list (0.0 when empty)
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def process_usage(pid: Optional[int] = None) -> Dict[str, Any]:
+    # {"pid", "cpuSeconds" (user+system), "rssBytes"} from /proc; this process falls back to os.times/resource
+    pid = os.getpid() if pid is None else int(pid)
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/statm", "r") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        return {"pid": pid, "cpuSeconds": (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK"), "rssBytes": rss}
+    except (OSError, ValueError, IndexError):
+        if pid != os.getpid():
+            return {"pid": pid, "cpuSeconds": None, "rssBytes": None}
+        import resource  # peak RSS only (no /proc), kilobytes on Linux
+        t = os.times()
+        return {"pid": pid, "cpuSeconds": t.user + t.system,
+                "rssBytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+class LatencyStats:
+    # latency of the last `window` calculate requests + cumulative counters since start
+    def __init__(self, window: int = 10000):
+        self._latency: deque = deque(maxlen=window)
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.records = 0
+        self.batches = 0
+        self.batched_records = 0
+
+    def observe(self, seconds: float, records: int) -> None:
+        self._latency.append(seconds)
+        self.requests += 1
+        self.records += records
+
+    def batch(self, size: int) -> None:
+        self.batches += 1
+        self.batched_records += size
+
+    def snapshot(self) -> Dict[str, Any]:
+        lat = sorted(self._latency)
+        uptime = time.perf_counter() - self.started
+        return {
+            "requests": self.requests, "records": self.records, "uptimeSeconds": uptime,
+            "recordsPerSecond": self.records / uptime if uptime > 0 else 0.0,
+            "latencyMs": {"p50": percentile(lat, 50) * 1000, "p99": percentile(lat, 99) * 1000,
+                          "max": (lat[-1] * 1000) if lat else 0.0, "samples": len(lat)},
+            "batches": self.batches, "meanBatchSize": self.batched_records / self.batches if self.batches else 0.0,
+        }
+
+
+class MicroBatcher:
+    def __init__(self, executor: Executor, window: float, max_batch: int, stats: LatencyStats):
+        self._executor = executor
+        self._window = max(0.0, float(window))
+        self._max_batch = max(1, int(max_batch))
+        self._stats = stats
+        self._pending: Dict[str, List[Tuple[Record, asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+
+    async def submit(self, records: List[Record], search: str) -> List[Tuple[bool, str]]:
+        # -> batch_cli.process_record results, in the order of records
+        loop = asyncio.get_running_loop()
+        futures = []
+        for rec in records:
+            fut = loop.create_future()
+            self._pending.setdefault(search, []).append((rec, fut))
+            futures.append(fut)
+            if len(self._pending[search]) >= self._max_batch:
+                self._flush(search)
+        if self._pending.get(search) and search not in self._timers:
+            self._timers[search] = loop.call_later(self._window, self._flush, search)
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self, search: str) -> None:
+        timer = self._timers.pop(search, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._pending.pop(search, [])
+        if not items:
+            return
+        self._stats.batch(len(items))
+        job = asyncio.get_running_loop().run_in_executor(self._executor, process_chunk, [r for r, _ in items], search)
+        job.add_done_callback(lambda f: self._resolve(f, items))
+
+    @staticmethod
+    def _resolve(job: asyncio.Future, items: List[Tuple[Record, asyncio.Future]]) -> None:
+        error = job.exception()
+        for k, (_, fut) in enumerate(items):
+            if fut.done():
+                continue
+            if error is not None:
+                fut.set_exception(error)
+            else:
+                fut.set_result(job.result()[k])
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, List[str]], Dict[str, str], bytes]]:
+    # -> (method, path, query, headers, body), None on a cleanly closed connection
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "malformed request line")
+    headers: Dict[str, str] = {}
+    for _ in range(MAX_HEADER_LINES):
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = h.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HttpError(400, "too many headers")
+    try:
+        length = int(headers.get("content-length", "0") or 0)
+    except ValueError:
+        raise HttpError(400, "bad Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "request body too large")
+    body = await reader.readexactly(length) if length > 0 else b""
+    url = urlsplit(target)
+    return method.upper(), url.path, parse_qs(url.query), headers, body
+
+
+def _response(status: int, body: bytes, keep_alive: bool) -> bytes:
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, 'Unknown')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+def _dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _json_body(body: bytes) -> Any:
+    try:
+        return json.loads(body.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise HttpError(400, "JSON形式が不正です。")
+
+
+class ApiServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, workers: int = 0, window: float = 0.005,
+                 max_batch: int = 32):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.stats = LatencyStats()
+        self._executor: Executor = (ProcessPoolExecutor(max_workers=workers) if workers > 1
+                                    else ThreadPoolExecutor(max_workers=1))
+        self._batcher = MicroBatcher(self._executor, window, max_batch, self.stats)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> int:
+        # -> bound port (pass port=0 to pick a free one)
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                keep_alive = True
+                try:
+                    req = await _read_request(reader)
+                    if req is None:
+                        break
+                    method, path, query, headers, body = req
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    status, payload = await self._dispatch(method, path, query, body)
+                except HttpError as e:
+                    status, payload, keep_alive = e.status, _dumps({"errors": [str(e)]}), False
+                except Exception as e:  # never kill the connection handler without an answer
+                    status, payload, keep_alive = 500, _dumps({"errors": [f"{type(e).__name__}: {e}"]}), False
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, query: Dict[str, List[str]], body: bytes) -> Tuple[int, bytes]:
+        if path == "/health":
+            return 200, _dumps({"ok": True})
+        if path == "/stats":
+            worker_pids = sorted(getattr(self._executor, "_processes", None) or {})
+            processes = [dict(process_usage(), role="server")] + [dict(process_usage(pid), role="worker")
+                                                                  for pid in worker_pids]
+            return 200, _dumps(dict(self.stats.snapshot(), processes=processes))
+        if path not in ("/calculate", "/calculate/bulk", "/validate"):
+            raise HttpError(404, f"unknown path: {path}")
+        if method != "POST":
+            raise HttpError(405, "POST only")
+        obj = _json_body(body)
+        if path == "/validate":
+            if not isinstance(obj, dict):
+                raise HttpError(400, "JSON形式が不正です。")
+            input_ = normalize_input_dict(obj)
+            return 200, _dumps({"errors": validate_input(input_), "input": input_})
+        search = (query.get("search") or ["standard"])[0]
+        if search not in SEARCH_MODES:
+            raise HttpError(400, f"unknown search mode: {search}")
+        started = time.perf_counter()
+        if path == "/calculate":
+            if not isinstance(obj, dict):
+                raise HttpError(400, "JSON形式が不正です。")
+            (ok, line), = await self._batcher.submit([(0, obj)], search)
+            self.stats.observe(time.perf_counter() - started, 1)
+            return (200 if ok else 422), line.encode("utf-8")
+        inputs = obj.get("inputs") if isinstance(obj, dict) else obj
+        if not isinstance(inputs, list):
+            raise HttpError(400, 'body must be {"inputs": [...]} or a JSON list')
+        results = await self._batcher.submit(list(enumerate(inputs)), search)
+        n_ok = sum(1 for ok, _ in results if ok)
+        payload = ('{"results":[' + ",".join(line for _, line in results)
+                   + f'],"ok":{n_ok},"errors":{len(results) - n_ok}}}').encode("utf-8")
+        self.stats.observe(time.perf_counter() - started, len(results))
+        return 200, payload
+
+
+async def request_json(host: str, port: int, method: str, path: str, body: Any = None) -> Tuple[int, Any]:
+    # minimal one-shot client (tests, load testing): -> (status, decoded JSON)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        data = b"" if body is None else _dumps(body)
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while True:
+            h = await reader.readline()
+            if h in (b"\r\n", b""):
+                break
+            name, _, value = h.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip())
+        return status, json.loads(await reader.readexactly(length)) if length else None
+    finally:
+        writer.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="退職金・年金受取最適化シミュレーター JSON API（validate_input + calculate_all）")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--workers", type=int, default=0, help="プロセス数（0/1 はスレッド1本で計算）")
+    p.add_argument("--window-ms", type=float, default=5.0, help="マイクロバッチの待ち時間（ミリ秒）")
+    p.add_argument("--max-batch", type=int, default=32, help="1バッチの最大件数")
+    args = p.parse_args(argv)
+
+    async def serve():
+        server = ApiServer(args.host, args.port, args.workers, args.window_ms / 1000.0, args.max_batch)
+        port = await server.start()
+        print(f"listening on http://{args.host}:{port}", file=sys.stderr)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,12 @@
 # app.py
 from __future__ import annotations
+import time
 import streamlit as st
 
 from core import calculate_all
+from incremental import IncrementalCalculator
+from jobs import DONE, CANCELLED, CalculationJob
+from result_cache import cache_from_env
 from validations import validate_input
 from io_json import export_input_json, import_input_json
 import ui
@@ -10,6 +14,13 @@ import ui
 st.set_page_config(page_title="退職金・年金受取最適化シミュレーター v4.4", layout="wide")
 ui.inject_css()
 
+@st.cache_resource
+def _result_cache():
+    # プロセス内で1回だけ開く（SQLiteファイルは全ワーカープロセスで共有）
+    return cache_from_env()
+
+_debug = st.query_params.get("debug") == "1"
+
 if "active_tab" not in st.session_state:
     st.session_state.active_tab = 0
 if "input_defaults" not in st.session_state:
@@ -27,6 +38,26 @@ if "last_result" not in st.session_state:
     st.session_state.last_result = None
 if "last_errors" not in st.session_state:
     st.session_state.last_errors = []
+if "calc_job" not in st.session_state:
+    st.session_state.calc_job = None
+if "incremental" not in st.session_state:
+    # 前回入力からの変更項目に依存する部分だけを再計算（セッションごと。結果キャッシュはこの中で参照）
+    st.session_state.incremental = IncrementalCalculator(result_cache=_result_cache())
+
+# バックグラウンド計算の完了を取り込む（再実行ごとに計算し直さない）
+_job = st.session_state.calc_job
+if _job is not None and not _job.running:
+    st.session_state.calc_job = None
+    if _job.status == DONE:
+        st.session_state.last_result = _job.result
+        st.session_state.sweep_result = None
+        st.session_state.retire_opt_result = None
+        st.session_state.pareto_result = None
+        st.toast("計算が完了しました。")
+    elif _job.status == CANCELLED:
+        st.toast("計算を中止しました。")
+    else:
+        st.session_state.last_errors = [f"計算に失敗しました（{_job.error}）"]
 
 # Simple tab switch control
 choice = st.radio("", ["📝 情報入力", "📊 シミュレーション結果"], index=st.session_state.active_tab, horizontal=True, label_visibility="collapsed")
@@ -52,15 +83,27 @@ if st.session_state.active_tab == 0:
         if errs:
             st.error("入力に不備があります。以下をご確認ください：\n- " + "\n- ".join(errs))
         else:
-            st.session_state.last_result = calculate_all(input_internal)
+            search = "full" if st.session_state.get("fullSearch", False) else "standard"
+            if _debug:
+                # 管理者向け：メトリクスを取るため結果キャッシュを通さず計算
+                fn = lambda progress, i=input_internal: calculate_all(i, search=search, metrics=True, progress=progress)
+            else:
+                inc = st.session_state.incremental
+                fn = lambda progress, i=input_internal: inc.calculate_all(i, search=search, progress=progress)
+            if st.session_state.calc_job is not None:
+                st.session_state.calc_job.cancel()
+            st.session_state.calc_job = CalculationJob(fn).start()
             st.session_state.input_defaults = input_internal
-            st.success("計算が完了しました。結果タブをご覧ください。")
             st.session_state.active_tab = 1
             st.rerun()
 else:
     if st.session_state.last_errors:
         st.warning("前回の入力に警告/エラーがあります。入力タブで修正してください。")
-    if st.session_state.last_result is None:
+    if st.session_state.calc_job is not None:
+        if ui.render_job_progress(st.session_state.calc_job.snapshot()):
+            st.session_state.calc_job.cancel()
+            st.rerun()
+    elif st.session_state.last_result is None:
         st.info("まだ計算結果がありません。『情報入力』タブで入力して計算してください。")
     else:
         # 結果から入力へ戻る（再計算用）
@@ -72,5 +115,18 @@ else:
         best = res["best"]
         input_ = res["input"]
         ui.render_results(strategies, best, input_, res["publicPensionAnnual"])
+        ui.render_sweep(input_)
+        ui.render_retirement_age_optimizer(input_)
+        ui.render_pareto(input_)
+
+if _debug:
+    ui.render_cache_debug(_result_cache())
+    ui.render_metrics_debug((st.session_state.last_result or {}).get("metrics"))
 
 ui.render_shell_end()
+
+if st.session_state.calc_job is not None and st.session_state.active_tab == 1:
+    # 結果タブで計算中のときだけ進捗を表示し直すため短い間隔で再実行（計算自体はスレッド側で継続。
+    # 入力タブでは再実行しないので入力が中断されず、完了は次の操作時に取り込む）
+    time.sleep(0.3)
+    st.rerun()
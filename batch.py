@@ -0,0 +1,361 @@
+# batch.py
+# Vectorized (NumPy) evaluation of core.calculate_all over a whole cohort.
+# Mirrors core.optimize_strategy / evaluate_candidate / pick_best_strategy branch by branch,
+# with every employee as one element of the arrays.
+#
+# Tolerance vs. the scalar path (core.calculate_all):
+# - future values use the closed-form engine and sums are NumPy reductions, so totals
+#   agree within BATCH_REL_TOLERANCE (relative) / BATCH_ABS_TOLERANCE (万円, absolute).
+# - chosen candidate ages and best strategy codes are identical, except for inputs whose
+#   competing candidates tie within that tolerance (better()/pick_best_strategy thresholds).
+# - ages are integers (as core casts them with int()). Events whose periods are all empty
+#   (e.g. serviceYears=0) make the scalar path raise IndexError; here they count as 0 years.
+
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+import numpy as np
+
+from core import (
+    SimulationInput,
+    calculate_pension_tax,
+    calculate_retirement_deduction,
+    calculate_retirement_tax,
+)
+
+BATCH_REL_TOLERANCE = 1e-9
+BATCH_ABS_TOLERANCE = 1e-6
+
+STRATEGY_CODES = ("A", "B", "C", "D")
+
+# input columns: the SimulationInput fields minus the ones calculate_all does not compute with
+# (joinAge and idecoContinueContribution are only read by validate_input)
+UNUSED_FIELDS = ("joinAge", "idecoContinueContribution")
+INT_FIELDS = tuple(k for k in SimulationInput.INT_FIELDS if k not in UNUSED_FIELDS)
+FLOAT_FIELDS = tuple(k for k in SimulationInput.FLOAT_FIELDS if k not in UNUSED_FIELDS)
+BOOL_FIELDS = tuple(k for k in SimulationInput.BOOL_FIELDS if k not in UNUSED_FIELDS)
+
+MAX_RECEIVE_AGE = 75
+NO_AGE = -1  # candidate age column value for "not applicable" (None in core)
+
+
+def records_to_columns(records: Iterable[Mapping[str, Any]]) -> Dict[str, np.ndarray]:
+    # list of input_ dicts (core.calculate_all schema) -> columnar arrays
+    rows = list(records)
+    cols: Dict[str, np.ndarray] = {}
+    for k in INT_FIELDS:
+        if k == "severanceReceiveAge":
+            vals = [r.get(k, r["retirementAge"]) for r in rows]
+        else:
+            vals = [r[k] for r in rows]
+        cols[k] = np.array([int(v) for v in vals], dtype=np.int64)
+    for k in FLOAT_FIELDS:
+        cols[k] = np.array([float(r[k]) for r in rows], dtype=np.float64)
+    for k in BOOL_FIELDS:
+        cols[k] = np.array([bool(r[k]) for r in rows], dtype=bool)
+    return cols
+
+
+def _normalize_columns(columns: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+    cols: Dict[str, np.ndarray] = {}
+    for k in INT_FIELDS:
+        if k == "severanceReceiveAge" and k not in columns:
+            continue
+        cols[k] = np.asarray(columns[k], dtype=np.float64).astype(np.int64)
+    if "severanceReceiveAge" not in cols:
+        cols["severanceReceiveAge"] = cols["retirementAge"].copy()
+    for k in FLOAT_FIELDS:
+        cols[k] = np.nan_to_num(np.asarray(columns[k], dtype=np.float64), nan=0.0, posinf=0.0, neginf=0.0)
+    for k in BOOL_FIELDS:
+        cols[k] = np.asarray(columns[k], dtype=bool)
+    n = len(cols["currentAge"])
+    for k, v in cols.items():
+        if v.shape != (n,):
+            raise ValueError(f"column {k} has shape {v.shape}, expected ({n},)")
+    return cols
+
+
+# ---- vectorized counterparts of the core scalar functions ----
+# (tax brackets/deductions use the ndarray paths of the core functions directly)
+
+def future_value(balance: np.ndarray, contribution: np.ndarray, annual_rate: np.ndarray,
+                 current_age: np.ndarray, target_age: np.ndarray, contribution_end_age: np.ndarray) -> np.ndarray:
+    # core.calculate_future_value, closed_form engine
+    r = annual_rate / 12.0
+    n_total = 12 * np.maximum(0, target_age - current_age)
+    n1 = 12 * np.clip(np.minimum(target_age, contribution_end_age) - current_age, 0, None)
+    n1 = np.minimum(n1, n_total)
+    n2 = n_total - n1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_growth = np.log1p(np.where(r > -1, r, 0.0))
+        g1m1 = np.expm1(n1 * log_growth)
+        geometric = np.where(r == 0, n1, g1m1 / np.where(r == 0, 1.0, r))
+    return (balance * (1 + g1m1) + contribution * geometric) * np.exp(n2 * log_growth)
+
+
+def pmt(principal: np.ndarray, annual_rate: np.ndarray, years: np.ndarray) -> np.ndarray:
+    # core.calculate_pmt
+    safe_rate = np.where(annual_rate == 0, 1.0, annual_rate)
+    power = (1 + safe_rate) ** years
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = principal * safe_rate * power / (power - 1)
+    return np.where(annual_rate == 0, principal / years, annuity)
+
+
+def public_pension(avg_salary: np.ndarray, years_of_service: np.ndarray, exemption: np.ndarray,
+                   retirement_age: np.ndarray) -> np.ndarray:
+    # core.calculate_public_pension
+    employee_pension = avg_salary * 0.005481 * (years_of_service * 12)
+    gap = np.where(retirement_age < 60, 60 - retirement_age, 0)
+    basic_years = years_of_service + np.where(exemption, gap * 0.5, gap)
+    return employee_pension + 81.6 * basic_years / 40
+
+
+# ---- lump events (build_lump_events + adjusted_deduction_with_19_year_rule) ----
+
+def _coverage(start: np.ndarray, end: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    # (N, G) mask of the integer years in [min(s,e), max(s,e)); union/overlap lengths are mask sums.
+    lo = np.minimum(start, end)[:, None]
+    hi = np.maximum(start, end)[:, None]
+    return (grid[None, :] >= lo) & (grid[None, :] < hi)
+
+
+def _lump_tax(sources: Sequence[tuple]) -> np.ndarray:
+    # sources: (active, age, amount, coverage) per event kind, in core.build_lump_events order.
+    # Events at the same age are merged; each merged event is charged once, through its first source.
+    total = np.zeros(sources[0][1].shape, dtype=np.float64)
+    for k, (act_k, age_k, _amt_k, _cov_k) in enumerate(sources):
+        amount = np.zeros_like(total)
+        cov = np.zeros_like(sources[0][3])
+        prev_age = np.full(age_k.shape, np.iinfo(np.int64).min, dtype=np.int64)
+        first = act_k.copy()
+        for j, (act_j, age_j, amt_j, cov_j) in enumerate(sources):
+            same = act_j & (age_j == age_k)
+            if j < k:
+                first &= ~same
+            amount += np.where(same, amt_j, 0.0)
+            cov |= same[:, None] & cov_j
+            earlier = act_j & (age_j < age_k)
+            prev_age = np.where(earlier, np.maximum(prev_age, age_j), prev_age)
+        has_prev = prev_age != np.iinfo(np.int64).min
+        prev_cov = np.zeros_like(cov)
+        for act_j, age_j, _amt_j, cov_j in sources:
+            prev_cov |= (act_j & has_prev & (age_j == prev_age))[:, None] & cov_j
+        base = calculate_retirement_deduction(cov.sum(axis=1).astype(np.float64))
+        # merged events carry no "kind", so the threshold is always 20 years (see core.retirement_rule_threshold_years)
+        adjusted = np.maximum(0.0, base - calculate_retirement_deduction((cov & prev_cov).sum(axis=1).astype(np.float64)))
+        deduction = np.where(has_prev & ((age_k - prev_age) < 20), adjusted, base)
+        total += np.where(first, calculate_retirement_tax(amount, deduction), 0.0)
+    return total
+
+
+# ---- candidate evaluation / optimize_strategy ----
+
+def _evaluate(c: Dict[str, np.ndarray], ctx: Dict[str, np.ndarray], dc_mode: str, ideco_mode: str,
+              dc_age: np.ndarray, ideco_age: np.ndarray, dc_fv: Optional[np.ndarray] = None,
+              ideco_fv: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    # core.evaluate_candidate for one candidate slot; dc_age/ideco_age are lump ages or pension start ages.
+    # dc_fv/ideco_fv: balances at those ages if already known (e.g. simulated paths); default is future_value().
+    end_age = c["endAge"]
+    if dc_fv is None:
+        dc_fv = future_value(c["dcCurrentBalance"], c["dcMonthlyContribution"], c["dcReturnRate"],
+                             c["currentAge"], dc_age, c["dcEndAge"])
+    if ideco_fv is None:
+        ideco_fv = future_value(c["idecoCurrentBalance"], c["idecoMonthlyContribution"], c["idecoReturnRate"],
+                                c["currentAge"], ideco_age, c["idecoEndAge"])
+    zero = np.zeros_like(dc_fv)
+    no = np.zeros(dc_fv.shape, dtype=bool)
+    yes = ~no
+    sources = [(yes, c["severanceReceiveAge"], c["severancePay"], ctx["sev_cov"])]
+    if dc_mode == "lump":
+        sources.append((yes, dc_age, dc_fv, ctx["dc_cov"]))
+        dc_annual = zero
+    else:
+        dc_annual = pmt(dc_fv, c["dcReturnRate"], np.maximum(1, end_age - dc_age))
+    if ideco_mode == "lump":
+        sources.append((yes, ideco_age, ideco_fv, ctx["ideco_cov"]))
+        ideco_annual = zero
+    else:
+        ideco_annual = pmt(ideco_fv, c["idecoReturnRate"], np.maximum(1, end_age - ideco_age))
+    lump_gross = sum(s[2] for s in sources)
+    lump_tax = _lump_tax(sources)
+
+    ages = ctx["pension_ages"][None, :]
+    yearly = np.where(ages >= 65, ctx["public"][:, None], 0.0)
+    if dc_mode == "pension":
+        yearly = yearly + np.where(ages >= dc_age[:, None], dc_annual[:, None], 0.0)
+    if ideco_mode == "pension":
+        yearly = yearly + np.where(ages >= ideco_age[:, None], ideco_annual[:, None], 0.0)
+    counted = (ages < end_age[:, None]) & (yearly > 0)
+    pension_gross = np.where(counted, yearly, 0.0).sum(axis=1)
+    pension_tax_total = np.where(counted, calculate_pension_tax(yearly, np.broadcast_to(ages, yearly.shape)), 0.0).sum(axis=1)
+
+    gross = lump_gross + pension_gross
+    tax = lump_tax + pension_tax_total
+    return {"totalGross": gross, "totalTax": tax, "totalNet": gross - tax}
+
+
+def _eff(gross: np.ndarray, tax: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(gross > 0, tax / np.where(gross > 0, gross, 1.0), 1.0)
+
+
+def _optimize(c: Dict[str, np.ndarray], ctx: Dict[str, np.ndarray], pattern: str) -> Dict[str, np.ndarray]:
+    # core.optimize_strategy: candidates are visited in the same order and folded with the same better()/guard().
+    n = len(c["currentAge"])
+    sev_age = c["severanceReceiveAge"]
+    max_lump_age = np.minimum(MAX_RECEIVE_AGE, c["endAge"])
+    base = np.where(sev_age <= 54, np.maximum(60, np.minimum(sev_age + 20, max_lump_age)), 60)
+    plus20 = sev_age + 20
+    can_plus20 = (plus20 >= 60) & (plus20 <= max_lump_age) & (plus20 != base)
+    lump_slots = [(np.where(can_plus20, np.minimum(base, plus20), base), np.ones(n, dtype=bool)),
+                  (np.where(can_plus20, np.maximum(base, plus20), base), can_plus20)]
+    start60 = [(np.full(n, 60, dtype=np.int64), np.ones(n, dtype=bool))]
+    dc_mode = "lump" if pattern in ("A", "B") else "pension"
+    ideco_mode = "lump" if pattern in ("A", "C") else "pension"
+    dc_slots = lump_slots if dc_mode == "lump" else start60
+    ideco_slots = lump_slots if ideco_mode == "lump" else start60
+
+    best_net_seen = np.full(n, -np.inf)
+    best_eff_seen = np.full(n, np.inf)
+    have = np.zeros(n, dtype=bool)
+    best = {k: np.zeros(n) for k in ("totalGross", "totalTax", "totalNet", "eff")}
+    best_dc = np.full(n, NO_AGE, dtype=np.int64)
+    best_ideco = np.full(n, NO_AGE, dtype=np.int64)
+    eff_first = sev_age <= 59
+
+    for dc_age, dc_ok in dc_slots:
+        for ideco_age, ideco_ok in ideco_slots:
+            valid = dc_ok & ideco_ok
+            res = _evaluate(c, ctx, dc_mode, ideco_mode, dc_age, ideco_age)
+            net = res["totalNet"]
+            eff = _eff(res["totalGross"], res["totalTax"])
+            best_net_seen = np.where(valid, np.maximum(best_net_seen, net), best_net_seen)
+            best_eff_seen = np.where(valid, np.minimum(best_eff_seen, eff), best_eff_seen)
+
+            def guard(x_net, x_eff):
+                return (x_net >= best_net_seen * (1 - 0.001)) & (x_eff <= best_eff_seen + 0.002)
+
+            n_ok = guard(net, eff)
+            b_ok = guard(best["totalNet"], best["eff"])
+            d_eff = np.abs(eff - best["eff"]) > 1e-5
+            d_net = np.abs(net - best["totalNet"]) > 1e-5
+            new_max = np.maximum(dc_age, ideco_age)
+            old_max = np.maximum(best_dc, best_ideco)
+            new_sum = dc_age + ideco_age
+            old_sum = best_dc + best_ideco
+            wins = np.select(
+                [~have,
+                 n_ok != b_ok,
+                 eff_first & d_eff, eff_first & d_net,
+                 ~eff_first & d_net, ~eff_first & d_eff,
+                 new_max != old_max, new_sum != old_sum],
+                [True,
+                 n_ok,
+                 eff < best["eff"], net > best["totalNet"],
+                 net > best["totalNet"], eff < best["eff"],
+                 new_max < old_max, new_sum < old_sum],
+                False,
+            )
+            take = valid & wins
+            for k in ("totalGross", "totalTax", "totalNet"):
+                best[k] = np.where(take, res[k], best[k])
+            best["eff"] = np.where(take, eff, best["eff"])
+            best_dc = np.where(take, dc_age, best_dc)
+            best_ideco = np.where(take, ideco_age, best_ideco)
+            have |= take
+
+    out = {k: best[k] for k in ("totalGross", "totalTax", "totalNet")}
+    out["dcLumpAge"] = best_dc if dc_mode == "lump" else np.full(n, NO_AGE, dtype=np.int64)
+    out["idecoLumpAge"] = best_ideco if ideco_mode == "lump" else np.full(n, NO_AGE, dtype=np.int64)
+    out["dcPensionStartAge"] = best_dc if dc_mode == "pension" else np.full(n, NO_AGE, dtype=np.int64)
+    out["idecoPensionStartAge"] = best_ideco if ideco_mode == "pension" else np.full(n, NO_AGE, dtype=np.int64)
+    return out
+
+
+def _pick_best(gross: np.ndarray, tax: np.ndarray, net: np.ndarray) -> np.ndarray:
+    # core.pick_best_strategy over the (N, 4) strategy columns -> index of the best strategy
+    eff = _eff(gross, tax)
+    idx = np.zeros(gross.shape[0], dtype=np.int64)
+    rows = np.arange(gross.shape[0])
+    for j in range(1, gross.shape[1]):
+        best_eff = eff[rows, idx]
+        best_net = net[rows, idx]
+        take = np.where(np.abs(eff[:, j] - best_eff) > 0.005, eff[:, j] < best_eff, net[:, j] > best_net)
+        idx = np.where(take, j, idx)
+    return idx
+
+
+def _context(c: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    # per-chunk invariants of every candidate: public pension, service-period coverage masks, pension age grid
+    yos = c["serviceYears"]
+    sev_age = c["severanceReceiveAge"]
+    starts = np.concatenate([sev_age - yos, c["dcStartAge"], c["idecoStartAge"], sev_age, c["dcEndAge"], c["idecoEndAge"]])
+    grid = np.arange(starts.min(), starts.max() + 1, dtype=np.int64)
+    return {
+        "public": public_pension(c["avgSalary"], yos, c["pensionExemption"], c["retirementAge"]),
+        "sev_cov": _coverage(sev_age - yos, sev_age, grid),
+        "dc_cov": _coverage(c["dcStartAge"], c["dcEndAge"], grid),
+        "ideco_cov": _coverage(c["idecoStartAge"], c["idecoEndAge"], grid),
+        "pension_ages": np.arange(60, max(60, int(c["endAge"].max())), dtype=np.int64),
+    }
+
+
+def _calculate_chunk(c: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    ctx = _context(c)
+    per = [_optimize(c, ctx, code) for code in STRATEGY_CODES]
+    out = {k: np.stack([p[k] for p in per], axis=1) for k in per[0]}
+    out["publicPensionAnnual"] = ctx["public"]
+    out["bestIndex"] = _pick_best(out["totalGross"], out["totalTax"], out["totalNet"])
+    return out
+
+
+def evaluate_paths(input_: Mapping[str, Any], plan: Sequence[Optional[tuple]], dc_fv: Mapping[int, np.ndarray],
+                   ideco_fv: Mapping[int, np.ndarray], paths: int) -> Dict[str, np.ndarray]:
+    # One input under `paths` alternative DC/iDeCo balance paths (e.g. montecarlo).
+    # plan: per strategy (dc_mode, ideco_mode, dc_age, ideco_age) of a fixed candidate, or None;
+    # dc_fv/ideco_fv: age -> (paths,) balances at that age (core.evaluate_candidate with these future values).
+    # Returns totalGross/totalTax/totalNet of shape (paths, len(plan)) (NaN where plan is None) and
+    # bestIndex (paths,) over the planned strategies (core.pick_best_strategy; -1 when none is planned).
+    record = dict(input_, severanceReceiveAge=input_.get("severanceReceiveAge", input_["retirementAge"]))
+    cols = _normalize_columns({k: np.full(paths, record[k]) for k in INT_FIELDS + FLOAT_FIELDS + BOOL_FIELDS})
+    ctx = _context(cols)
+    gross = np.full((paths, len(plan)), np.nan)
+    tax = np.full((paths, len(plan)), np.nan)
+    for j, p in enumerate(plan):
+        if p is None:
+            continue
+        dc_mode, ideco_mode, dc_age, ideco_age = p
+        res = _evaluate(cols, ctx, dc_mode, ideco_mode, np.full(paths, dc_age, dtype=np.int64),
+                        np.full(paths, ideco_age, dtype=np.int64), dc_fv[dc_age], ideco_fv[ideco_age])
+        gross[:, j] = res["totalGross"]
+        tax[:, j] = res["totalTax"]
+    net = gross - tax
+    valid = [j for j, p in enumerate(plan) if p is not None]
+    best = np.full(paths, -1, dtype=np.int64)
+    if valid:
+        best = np.array(valid)[_pick_best(gross[:, valid], tax[:, valid], net[:, valid])]
+    return {"totalGross": gross, "totalTax": tax, "totalNet": net, "bestIndex": best}
+
+
+def calculate_all_batch(columns: Mapping[str, Any], chunk_size: int = 20000) -> Dict[str, Any]:
+    # Columnar calculate_all.
+    # columns: field name -> 1-D array (INT_FIELDS / FLOAT_FIELDS / BOOL_FIELDS; severanceReceiveAge optional).
+    # Returns arrays of shape (N, 4) in STRATEGY_CODES order for totalGross/totalTax/totalNet and the
+    # chosen candidate ages (NO_AGE where the strategy has no such age), plus publicPensionAnnual (N,),
+    # bestIndex (N,) and bestCode (N,).
+    cols = _normalize_columns(columns)
+    n = len(cols["currentAge"])
+    chunk_size = max(1, int(chunk_size))
+    parts: List[Dict[str, np.ndarray]] = []
+    for lo in range(0, n, chunk_size):
+        parts.append(_calculate_chunk({k: v[lo:lo + chunk_size] for k, v in cols.items()}))
+    if not parts:
+        empty4 = np.zeros((0, 4))
+        parts.append({"totalGross": empty4, "totalTax": empty4, "totalNet": empty4,
+                      "dcLumpAge": empty4.astype(np.int64), "idecoLumpAge": empty4.astype(np.int64),
+                      "dcPensionStartAge": empty4.astype(np.int64), "idecoPensionStartAge": empty4.astype(np.int64),
+                      "publicPensionAnnual": np.zeros(0), "bestIndex": np.zeros(0, dtype=np.int64)})
+    out: Dict[str, Any] = {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+    out["bestCode"] = np.array(STRATEGY_CODES)[out["bestIndex"]]
+    out["codes"] = STRATEGY_CODES
+    return out
@@ -0,0 +1,154 @@
+# batch_cli.py
+# Command-line batch runner: streams employee records (CSV or JSONL, io_json key schema)
+# through validations.validate_input + core.calculate_all on a process pool.
+#
+#   python batch_cli.py employees.csv -o results.jsonl --errors errors.jsonl --workers 8
+#
+# Output is JSONL in input order: {"index": n, "result": <calculate_all result>}.
+# Invalid rows go to the error stream: {"index": n, "errors": [...], "input": {...}}.
+# Records are read and dispatched in chunks with a bounded number of chunks in flight,
+# so memory stays flat regardless of input size.
+
+from __future__ import annotations
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+import argparse
+import csv
+import itertools
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from core import calculate_all
+from io_json import normalize_input_dict
+from validations import validate_input
+
+Record = Tuple[int, Dict[str, Any]]
+
+
+def read_records(stream: TextIO, fmt: str) -> Iterator[Dict[str, Any]]:
+    # fmt: "csv" | "jsonl". Each JSONL line may be a bare input dict or the export_input_json payload.
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            yield dict(row)
+    elif fmt == "jsonl":
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                # 壊れた行も位置を保ったままエラーストリームへ回す
+                yield {"_parseError": str(e), "_line": line}
+    else:
+        raise ValueError(f"unknown format: {fmt}")
+
+
+def process_record(index: int, raw: Dict[str, Any], search: str = "standard") -> Tuple[bool, str]:
+    # -> (ok, JSON line)
+    try:
+        if not isinstance(raw, dict) or "_parseError" in raw:
+            raise ValueError(raw.get("_parseError") if isinstance(raw, dict) else "JSON形式が不正です。")
+        input_ = normalize_input_dict(raw)
+        errs = validate_input(input_)
+        if errs:
+            return False, json.dumps({"index": index, "errors": errs, "input": raw}, ensure_ascii=False)
+        result = calculate_all(input_, search=search)
+        return True, json.dumps({"index": index, "result": result}, ensure_ascii=False)
+    except Exception as e:
+        return False, json.dumps({"index": index, "errors": [f"{type(e).__name__}: {e}"], "input": raw},
+                                 ensure_ascii=False, default=str)
+
+
+def process_chunk(chunk: List[Record], search: str = "standard") -> List[Tuple[bool, str]]:
+    return [process_record(i, raw, search) for i, raw in chunk]
+
+
+def chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    # consecutive lists of up to `size` items (lazy; shared with batch_pdf / golden)
+    it = iter(items)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run(records: Iterable[Dict[str, Any]], out: TextIO, err: TextIO, workers: int = 0,
+        chunk_size: int = 200, max_in_flight: Optional[int] = None) -> Dict[str, Any]:
+    # workers <= 1 runs in-process; otherwise chunks are dispatched to a ProcessPoolExecutor
+    # and written back in submission (= input) order.
+    started = time.perf_counter()
+    n_ok = 0
+    n_err = 0
+
+    def emit(results: List[Tuple[bool, str]]):
+        nonlocal n_ok, n_err
+        for ok, line in results:
+            if ok:
+                out.write(line + "\n")
+                n_ok += 1
+            else:
+                err.write(line + "\n")
+                n_err += 1
+
+    batches = chunks(enumerate(records), max(1, int(chunk_size)))
+    if workers <= 1:
+        for chunk in batches:
+            emit(process_chunk(chunk))
+    else:
+        limit = max_in_flight or workers * 2
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending: deque = deque()
+            for chunk in batches:
+                pending.append(pool.submit(process_chunk, chunk))
+                if len(pending) >= limit:
+                    emit(pending.popleft().result())
+            while pending:
+                emit(pending.popleft().result())
+    out.flush()
+    err.flush()
+    elapsed = time.perf_counter() - started
+    total = n_ok + n_err
+    return {"records": total, "ok": n_ok, "errors": n_err, "seconds": elapsed,
+            "recordsPerSecond": (total / elapsed) if elapsed > 0 else 0.0}
+
+
+def detect_format(path: str, fmt: Optional[str]) -> str:
+    # explicit --format, otherwise from the extension (.csv -> csv, anything else -> jsonl)
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="退職金・年金受取最適化シミュレーター 一括計算（CSV/JSONL → JSONL）")
+    p.add_argument("input", help="入力ファイル（.csv / .jsonl、'-' で標準入力）")
+    p.add_argument("-o", "--output", default="-", help="結果JSONLの出力先（既定：標準出力）")
+    p.add_argument("--errors", default=None, help="入力エラー行の出力先（既定：標準エラー出力）")
+    p.add_argument("--format", choices=("csv", "jsonl"), default=None, help="入力形式（既定：拡張子から判定）")
+    p.add_argument("--workers", type=int, default=0, help="プロセス数（0/1 はプロセスプールを使わない）")
+    p.add_argument("--chunk-size", type=int, default=200, help="1回の投入あたりのレコード数")
+    p.add_argument("-v", "--verbose", action="store_true", help="処理件数と所要時間を標準エラー出力に表示")
+    args = p.parse_args(argv)
+
+    fmt = detect_format(args.input, args.format)
+    src = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8", newline="")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    err = sys.stderr if args.errors is None else open(args.errors, "w", encoding="utf-8")
+    try:
+        summary = run(read_records(src, fmt), out, err, workers=args.workers, chunk_size=args.chunk_size)
+    finally:
+        for f in (src, out, err):
+            if f not in (sys.stdin, sys.stdout, sys.stderr):
+                f.close()
+    if args.verbose:
+        print(f"{summary['records']} records ({summary['errors']} errors) in {summary['seconds']:.1f}s "
+              f"({summary['recordsPerSecond']:.0f} records/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+# batch_pdf.py
+# Cohort PDF reports: one export_pdf report per employee, rendered on a process pool and streamed
+# into a ZIP archive (or a directory) as chunks complete.
+#
+#   python batch_pdf.py employees.csv -o reports.zip --workers 8 -v          # raw inputs (batch_cli format)
+#   python batch_pdf.py results.jsonl -o reports/ --errors errors.jsonl      # batch_cli output (precomputed)
+#
+# - Each record is a raw input (validated + calculate_all in the worker), a calculate_all result
+#   ({"input", "strategies", "best"}) or a batch_cli output line ({"index", "result"}).
+# - Fonts are registered once per worker process (pool initializer; export_pdf caches the registration).
+# - At most max_in_flight chunks are pending and each finished chunk is written and dropped,
+#   so memory is bounded by the chunks in flight, not by the cohort size.
+# - Entries are named {index:06d}.pdf, or {index:06d}_{name_field value}.pdf when name_field is given.
+
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Optional, TextIO, Tuple
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_cli import Record, chunks, detect_format, read_records
+from core import calculate_all
+from export_pdf import register_japanese_font, render_pdf
+from io_json import normalize_input_dict
+from validations import validate_input
+
+# (index, file name, PDF bytes or None, pages, error JSON line or None)
+Rendered = Tuple[int, str, Optional[bytes], int, Optional[str]]
+
+
+def _entry_name(index: int, raw: Dict[str, Any], name_field: Optional[str]) -> str:
+    label = str(raw.get(name_field, "")).strip() if (name_field and isinstance(raw, dict)) else ""
+    label = re.sub(r'[\\/:*?"<>|\s]+', "_", label)[:64]
+    return f"{index:06d}_{label}.pdf" if label else f"{index:06d}.pdf"
+
+
+def _result_of(raw: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    # -> (calculate_all result, errors)
+    if not isinstance(raw, dict) or "_parseError" in raw:
+        raise ValueError(raw.get("_parseError") if isinstance(raw, dict) else "JSON形式が不正です。")
+    if isinstance(raw.get("result"), dict):
+        raw = raw["result"]
+    if "strategies" in raw and "best" in raw and "input" in raw:
+        return raw, []
+    input_ = normalize_input_dict(raw)
+    errs = validate_input(input_)
+    return (None, errs) if errs else (calculate_all(input_), [])
+
+
+def render_record(index: int, raw: Dict[str, Any], name_field: Optional[str] = None) -> Rendered:
+    name = _entry_name(index, raw, name_field)
+    try:
+        result, errs = _result_of(raw)
+        if errs:
+            return index, name, None, 0, json.dumps({"index": index, "errors": errs, "input": raw}, ensure_ascii=False)
+        pdf, pages = render_pdf(result["input"], result["strategies"], result["best"])
+        return index, name, pdf, pages, None
+    except Exception as e:
+        return index, name, None, 0, json.dumps({"index": index, "errors": [f"{type(e).__name__}: {e}"], "input": raw},
+                                                ensure_ascii=False, default=str)
+
+
+def render_chunk(chunk: List[Record], name_field: Optional[str] = None) -> List[Rendered]:
+    return [render_record(i, raw, name_field) for i, raw in chunk]
+
+
+def _init_worker() -> None:
+    register_japanese_font()
+
+
+class _ZipSink:
+    def __init__(self, path: str):
+        # PDFs are already compressed; ZIP_STORED avoids spending the pool's throughput twice
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+
+    def write(self, name: str, data: bytes) -> None:
+        self._zip.writestr(name, data)
+
+    def close(self) -> None:
+        self._zip.close()
+
+
+class _DirSink:
+    def __init__(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        self._dir = path
+
+    def write(self, name: str, data: bytes) -> None:
+        with open(os.path.join(self._dir, name), "wb") as f:
+            f.write(data)
+
+    def close(self) -> None:
+        pass
+
+
+def open_sink(path: str):
+    # *.zip -> ZIP archive, anything else -> directory
+    return _ZipSink(path) if path.lower().endswith(".zip") else _DirSink(path)
+
+
+def run(records: Iterable[Dict[str, Any]], output: str, err: TextIO, workers: int = 0, chunk_size: int = 20,
+        max_in_flight: Optional[int] = None, name_field: Optional[str] = None) -> Dict[str, Any]:
+    # workers <= 1 renders in-process; entries are written in input order either way.
+    started = time.perf_counter()
+    n_ok = n_err = n_pages = n_bytes = 0
+    sink = open_sink(output)
+
+    def emit(rendered: List[Rendered]):
+        nonlocal n_ok, n_err, n_pages, n_bytes
+        for _, name, pdf, pages, error in rendered:
+            if pdf is None:
+                err.write(error + "\n")
+                n_err += 1
+                continue
+            sink.write(name, pdf)
+            n_ok += 1
+            n_pages += pages
+            n_bytes += len(pdf)
+
+    try:
+        batches = chunks(enumerate(records), max(1, int(chunk_size)))
+        if workers <= 1:
+            _init_worker()
+            for chunk in batches:
+                emit(render_chunk(chunk, name_field))
+        else:
+            limit = max_in_flight or workers * 2
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                pending: deque = deque()
+                for chunk in batches:
+                    pending.append(pool.submit(render_chunk, chunk, name_field))
+                    if len(pending) >= limit:
+                        emit(pending.popleft().result())
+                while pending:
+                    emit(pending.popleft().result())
+    finally:
+        sink.close()
+        err.flush()
+    elapsed = time.perf_counter() - started
+    return {"records": n_ok + n_err, "ok": n_ok, "errors": n_err, "pages": n_pages, "bytes": n_bytes,
+            "seconds": elapsed, "pagesPerSecond": (n_pages / elapsed) if elapsed > 0 else 0.0}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="退職金・年金受取最適化シミュレーター PDF一括作成（CSV/JSONL → ZIP/フォルダ）")
+    p.add_argument("input", help="入力ファイル（.csv / .jsonl、'-' で標準入力）。入力dict・calculate_all結果・batch_cli出力のいずれも可")
+    p.add_argument("-o", "--output", required=True, help="出力先（.zip ならZIP、それ以外はフォルダ）")
+    p.add_argument("--errors", default=None, help="エラー行の出力先（既定：標準エラー出力）")
+    p.add_argument("--format", choices=("csv", "jsonl"), default=None, help="入力形式（既定：拡張子から判定）")
+    p.add_argument("--workers", type=int, default=0, help="プロセス数（0/1 はプロセスプールを使わない）")
+    p.add_argument("--chunk-size", type=int, default=20, help="1回の投入あたりのレコード数")
+    p.add_argument("--name-field", default=None, help="ファイル名に付ける入力項目（例：employeeId）")
+    p.add_argument("-v", "--verbose", action="store_true", help="件数・ページ数・所要時間を標準エラー出力に表示")
+    args = p.parse_args(argv)
+
+    fmt = detect_format(args.input, args.format)
+    src = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8", newline="")
+    err = sys.stderr if args.errors is None else open(args.errors, "w", encoding="utf-8")
+    try:
+        summary = run(read_records(src, fmt), args.output, err, workers=args.workers, chunk_size=args.chunk_size,
+                      name_field=args.name_field)
+    finally:
+        for f in (src, err):
+            if f not in (sys.stdin, sys.stderr):
+                f.close()
+    if args.verbose:
+        print(f"{summary['ok']} PDFs / {summary['pages']} pages ({summary['errors']} errors) in "
+              f"{summary['seconds']:.1f}s ({summary['pagesPerSecond']:.1f} pages/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+# bench.py
+# Benchmarks for the core hot paths with regression thresholds.
+#
+#   python bench.py -o bench.json                          # run, write machine-readable results
+#   python bench.py --save-baseline bench_baseline.json    # store a baseline for this machine
+#   python bench.py --baseline bench_baseline.json --threshold 0.25   # exit 1 on >25% slowdowns
+#
+# Each benchmark reports the median seconds per call over --repeat rounds; a round runs the
+# call enough times to last about --min-time seconds. "counters" records the CalcCache memo
+# hits/misses of one calculate_all per profile and search mode (not compared against the baseline).
+
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+import core
+from validations import validate_input
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    # 50歳で退職・退職金受取（FIRE層、19年ルール固定年齢）
+    "early_retiree_50": {
+        "currentAge": 45, "retirementAge": 50, "joinAge": 23, "severanceReceiveAge": 50, "severancePay": 1500,
+        "dcCurrentBalance": 600, "dcMonthlyContribution": 2.0, "dcReturnRate": 0.03,
+        "idecoStartAge": 30, "idecoCurrentBalance": 250, "idecoMonthlyContribution": 2.3, "idecoReturnRate": 0.04,
+        "avgSalary": 42, "pensionExemption": False, "idecoContinueContribution": True,
+    },
+    "standard_60": {
+        "currentAge": 50, "retirementAge": 60, "joinAge": 22, "severanceReceiveAge": 60, "severancePay": 2200,
+        "dcCurrentBalance": 900, "dcMonthlyContribution": 2.75, "dcReturnRate": 0.03,
+        "idecoStartAge": 35, "idecoCurrentBalance": 300, "idecoMonthlyContribution": 2.3, "idecoReturnRate": 0.03,
+        "avgSalary": 48, "pensionExemption": False, "idecoContinueContribution": False,
+    },
+    "standard_65": {
+        "currentAge": 55, "retirementAge": 65, "joinAge": 22, "severanceReceiveAge": 60, "severancePay": 2500,
+        "dcCurrentBalance": 1200, "dcMonthlyContribution": 2.75, "dcReturnRate": 0.02,
+        "idecoStartAge": 40, "idecoCurrentBalance": 350, "idecoMonthlyContribution": 2.3, "idecoReturnRate": 0.03,
+        "avgSalary": 52, "pensionExemption": False, "idecoContinueContribution": False,
+    },
+    "large_dc": {
+        "currentAge": 40, "retirementAge": 60, "joinAge": 22, "severanceReceiveAge": 60, "severancePay": 3000,
+        "dcCurrentBalance": 4500, "dcMonthlyContribution": 5.5, "dcReturnRate": 0.05,
+        "idecoStartAge": 25, "idecoCurrentBalance": 1200, "idecoMonthlyContribution": 2.3, "idecoReturnRate": 0.05,
+        "avgSalary": 62, "pensionExemption": False, "idecoContinueContribution": False,
+    },
+    # 国民年金免除あり（iDeCo追加拠出なし）
+    "exemption_55": {
+        "currentAge": 50, "retirementAge": 55, "joinAge": 25, "severanceReceiveAge": 55, "severancePay": 1200,
+        "dcCurrentBalance": 500, "dcMonthlyContribution": 1.5, "dcReturnRate": 0.02,
+        "idecoStartAge": 40, "idecoCurrentBalance": 150, "idecoMonthlyContribution": 1.0, "idecoReturnRate": 0.02,
+        "avgSalary": 38, "pensionExemption": True, "idecoContinueContribution": False,
+    },
+}
+
+
+def profile_input(name: str) -> Dict[str, Any]:
+    # PROFILES entry completed the same way the app does (validate_input fills serviceYears/endAge/DC/iDeCo ages)
+    input_ = dict(PROFILES[name])
+    errs = validate_input(input_)
+    if errs:
+        raise ValueError(f"{name}: {errs}")
+    return input_
+
+
+def _time_call(fn: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, float]:
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    rounds = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - started) / number)
+    return {"median": statistics.median(rounds), "min": min(rounds), "number": number, "repeat": repeat}
+
+
+def _benchmarks(profile_names: List[str], include_pdf: bool) -> List[Tuple[str, Callable[[], Any]]]:
+    out: List[Tuple[str, Callable[[], Any]]] = []
+    strategy_fns = [("A", core.calculate_strategy_a), ("B", core.calculate_strategy_b),
+                    ("C", core.calculate_strategy_c), ("D", core.calculate_strategy_d)]
+    for name in profile_names:
+        inp = profile_input(name)
+        yos = int(inp["serviceYears"])
+        ppa = core.calculate_public_pension(inp["avgSalary"], yos, bool(inp["pensionExemption"]), int(inp["retirementAge"]))
+        fv_args = (inp["dcCurrentBalance"], inp["dcMonthlyContribution"], inp["dcReturnRate"],
+                   int(inp["currentAge"]), 75, int(inp["dcEndAge"]))
+        cand = {"dcMode": "lump", "idecoMode": "pension", "dcLumpAge": 60, "idecoLumpAge": None,
+                "dcPensionStartAge": None, "idecoPensionStartAge": 60}
+        meta = {"name": "bench", "code": "B", "describe": lambda c, _: ""}
+        out.append((f"{name}/calculate_future_value[reference]",
+                    lambda a=fv_args: core.calculate_future_value(*a, engine="reference")))
+        out.append((f"{name}/calculate_future_value[closed_form]",
+                    lambda a=fv_args: core.calculate_future_value(*a, engine="closed_form")))
+        out.append((f"{name}/evaluate_candidate",
+                    lambda i=inp, p=ppa, y=yos: core.evaluate_candidate(i, p, y, cand, meta)))
+        for code, fn in strategy_fns:
+            out.append((f"{name}/calculate_strategy_{code.lower()}",
+                        lambda f=fn, i=inp, p=ppa, y=yos: f(i, p, y, core.CalcCache())))
+        out.append((f"{name}/calculate_all", lambda i=inp: core.calculate_all(i)))
+        out.append((f"{name}/calculate_all[full]", lambda i=inp: core.calculate_all(i, search="full")))
+        if include_pdf:
+            from export_pdf import make_pdf_bytes
+            res = core.calculate_all(inp)
+            out.append((f"{name}/make_pdf_bytes",
+                        lambda r=res: make_pdf_bytes(r["input"], r["strategies"], r["best"])))
+    return out
+
+
+def _counters(profile_names: List[str]) -> Dict[str, Dict[str, int]]:
+    out: Dict[str, Dict[str, int]] = {}
+    for name in profile_names:
+        inp = profile_input(name)
+        for search in core.SEARCH_MODES:
+            stats = core.calculate_all(inp, search=search)["cacheStats"]
+            out[f"{name}/calculate_all[{search}]"] = {k: v for k, v in stats.items() if k != "maxsize"}
+    return out
+
+
+def run_benchmarks(profile_names: Optional[List[str]] = None, repeat: int = 5, min_time: float = 0.05,
+                   include_pdf: bool = True, name_filter: Optional[str] = None) -> Dict[str, Any]:
+    names = profile_names or list(PROFILES)
+    if include_pdf:
+        try:
+            import export_pdf  # noqa: F401  (reportlab is optional for benchmarking)
+        except ImportError:
+            include_pdf = False
+    results: Dict[str, Dict[str, float]] = {}
+    for bench_name, fn in _benchmarks(names, include_pdf):
+        if name_filter and name_filter not in bench_name:
+            continue
+        results[bench_name] = _time_call(fn, repeat, min_time)
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "futureValueEngine": core.get_future_value_engine(),
+        "results": results,
+        "counters": _counters(names),
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    # -> one row per benchmark present in both; "regressed" when median grew by more than threshold (0.25 = +25%)
+    rows = []
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or base["median"] <= 0:
+            continue
+        ratio = cur["median"] / base["median"]
+        rows.append({"name": name, "baseline": base["median"], "current": cur["median"], "ratio": ratio,
+                     "regressed": ratio > 1 + threshold})
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="core hot-path benchmarks")
+    p.add_argument("-o", "--output", help="write results JSON here")
+    p.add_argument("--baseline", help="baseline JSON to compare against")
+    p.add_argument("--save-baseline", help="write results as a new baseline")
+    p.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown ratio (0.25 = +25%%)")
+    p.add_argument("--profile", action="append", choices=sorted(PROFILES), help="limit to profile(s)")
+    p.add_argument("--filter", help="only benchmarks whose name contains this")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--min-time", type=float, default=0.05)
+    p.add_argument("--no-pdf", action="store_true", help="skip make_pdf_bytes")
+    args = p.parse_args(argv)
+
+    current = run_benchmarks(args.profile, repeat=args.repeat, min_time=args.min_time,
+                             include_pdf=not args.no_pdf, name_filter=args.filter)
+    for name, r in current["results"].items():
+        print(f"{name:60s} {r['median']*1e6:12.1f} us")
+    for name, c in current["counters"].items():
+        print(f"{name:60s} retirement tax memo {c['retirementTaxHits']}/{c['retirementTaxHits'] + c['retirementTaxMisses']} hits")
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2, ensure_ascii=False)
+    if not args.baseline:
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(current, baseline, args.threshold)
+    regressed = [r for r in rows if r["regressed"]]
+    for r in regressed:
+        print(f"REGRESSION {r['name']}: {r['baseline']*1e6:.1f} us -> {r['current']*1e6:.1f} us (x{r['ratio']:.2f})")
+    print(f"{len(rows)} compared, {len(regressed)} regressed (threshold +{args.threshold*100:.0f}%)")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,11 +4,27 @@
 # Mapping comments keep JS function names and intent.
 
 from __future__ import annotations
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 import math
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the ndarray paths (batch / cohort evaluation)
+    np = None
 
 Number = float
 
+# Shape of the calculate_all result (keys of the result / strategies / _search). Bump on any change so
+# persisted results (result_cache) are not served in the old shape.
+RESULT_SCHEMA = 2
+
 def safe_number(value: Any, default_value: Number = 0) -> Number:
     # JS: safeNumber(value, defaultValue=0)
     try:
@@ -21,14 +37,174 @@ def safe_number(value: Any, default_value: Number = 0) -> Number:
     except Exception:
         return default_value
 
+def _is_array(x: Any) -> bool:
+    return np is not None and isinstance(x, np.ndarray)
+
+def _parse_flag(value: Any) -> bool:
+    # same reading as validations.validate_input ("0"/"false"/"no"/"none"/"" are False)
+    if isinstance(value, str):
+        v = value.strip().lower()
+        return v != "" and v not in ("0", "false", "no", "none")
+    return bool(value)
+
+class SimulationInput:
+    # Parsed, immutable input record: every field converted once (ints via int(safe_number()),
+    # floats via safe_number(), flags via _parse_flag()). Attribute names are the input dict keys,
+    # and record["key"] / record.get("key") keep dict-style access working.
+    # Hashable (key()) so it can index caches; to_dict() gives back the plain input dict.
+    INT_FIELDS = ("currentAge", "retirementAge", "joinAge", "serviceYears", "severanceReceiveAge",
+                  "dcStartAge", "dcEndAge", "idecoStartAge", "idecoEndAge", "endAge")
+    FLOAT_FIELDS = ("severancePay", "dcCurrentBalance", "dcMonthlyContribution", "dcReturnRate",
+                    "idecoCurrentBalance", "idecoMonthlyContribution", "idecoReturnRate", "avgSalary")
+    BOOL_FIELDS = ("pensionExemption", "idecoContinueContribution")
+    FIELDS = INT_FIELDS + FLOAT_FIELDS + BOOL_FIELDS
+    __slots__ = FIELDS
+
+    def __init__(self, **values: Any):
+        unknown = set(values) - set(self.FIELDS)
+        if unknown:
+            raise TypeError(f"unknown input fields: {sorted(unknown)}")
+        for k in self.INT_FIELDS:
+            object.__setattr__(self, k, int(values.get(k, 0)))
+        for k in self.FLOAT_FIELDS:
+            object.__setattr__(self, k, float(values.get(k, 0.0)))
+        for k in self.BOOL_FIELDS:
+            object.__setattr__(self, k, bool(values.get(k, False)))
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "SimulationInput":
+        # missing severanceReceiveAge falls back to retirementAge (as core always did); other missing fields are 0
+        values: Dict[str, Any] = {}
+        for k in cls.INT_FIELDS:
+            values[k] = int(safe_number(d.get(k), 0))
+        if d.get("severanceReceiveAge") is None:
+            values["severanceReceiveAge"] = values["retirementAge"]
+        for k in cls.FLOAT_FIELDS:
+            values[k] = safe_number(d.get(k), 0.0)
+        for k in cls.BOOL_FIELDS:
+            values[k] = _parse_flag(d.get(k, False))
+        return cls(**values)
+
+    @classmethod
+    def coerce(cls, input_: Any) -> "SimulationInput":
+        return input_ if isinstance(input_, cls) else cls.from_dict(input_)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("SimulationInput is immutable; use replace()")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("SimulationInput is immutable")
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.FIELDS
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.FIELDS
+
+    def key(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, k) for k in self.FIELDS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self.FIELDS}
+
+    def replace(self, **changes: Any) -> "SimulationInput":
+        return SimulationInput(**dict(self.to_dict(), **changes))
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, SimulationInput) and self.key() == other.key()
+
+    def __hash__(self) -> int:
+        return hash(self.key())
+
+    def __repr__(self) -> str:
+        return "SimulationInput(" + ", ".join(f"{k}={getattr(self, k)!r}" for k in self.FIELDS) + ")"
+
+    def __reduce__(self):
+        return (_simulation_input_from_values, (self.to_dict(),))
+
+def _simulation_input_from_values(values: Dict[str, Any]) -> SimulationInput:
+    return SimulationInput(**values)
+
+class Metrics:
+    # Hot-path counters/timers collected by collect_metrics() (calculate_all(..., metrics=True)).
+    # Values are keyed (group, name); snapshot() nests them as {group: {name: value}}.
+    __slots__ = ("values", "started")
+
+    def __init__(self):
+        self.values: Dict[Tuple[str, str], Number] = {}
+        self.started = time.perf_counter()
+
+    def add(self, group: str, name: str, amount: Number = 1) -> None:
+        key = (group, name)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for (group, name), value in sorted(self.values.items()):
+            out.setdefault(group, {})[name] = value
+        out["totalSeconds"] = time.perf_counter() - self.started
+        return out
+
+# Instrumentation is off unless a collect_metrics() block is active in some thread;
+# the hooks below cost one global load + branch while _metrics_on == 0.
+_metrics_on = 0
+_metrics_lock = threading.Lock()
+_metrics_local = threading.local()
+
+@contextmanager
+def collect_metrics() -> Iterator[Metrics]:
+    # Collect metrics for the calculations run in this thread inside the block (nested blocks each get their own).
+    global _metrics_on
+    m = Metrics()
+    prev = getattr(_metrics_local, "current", None)
+    _metrics_local.current = m
+    with _metrics_lock:
+        _metrics_on += 1
+    try:
+        yield m
+    finally:
+        _metrics_local.current = prev
+        with _metrics_lock:
+            _metrics_on -= 1
+
+def _metric(group: str, name: str, amount: Number = 1) -> None:
+    m = getattr(_metrics_local, "current", None)
+    if m is not None:
+        m.add(group, name, amount)
+
 def calculate_retirement_deduction(years: Number) -> Number:
     # JS: calculateRetirementDeduction(years)
+    if _is_array(years):
+        return np.where(years <= 20, np.maximum(40 * years, 80), 800 + 70 * (years - 20))
     if years <= 20:
         return max(40 * years, 80)
     return 800 + 70 * (years - 20)
 
-def calculate_future_value(current_balance: Number, monthly_contribution: Number, annual_rate: Number,
-                           current_age: int, target_age: int, contribution_end_age: int) -> Number:
+FUTURE_VALUE_ENGINES = ("reference", "closed_form")
+_future_value_engine = "reference"
+
+def set_future_value_engine(engine: str) -> str:
+    # Switch the engine used by calculate_future_value; returns the previous one.
+    global _future_value_engine
+    if engine not in FUTURE_VALUE_ENGINES:
+        raise ValueError(f"unknown future value engine: {engine}")
+    prev = _future_value_engine
+    _future_value_engine = engine
+    return prev
+
+def get_future_value_engine() -> str:
+    return _future_value_engine
+
+def _future_value_reference(current_balance: Number, monthly_contribution: Number, annual_rate: Number,
+                            current_age: int, target_age: int, contribution_end_age: int) -> Number:
     # JS: calculateFutureValue(currentBalance, monthlyContribution, annualRate, currentAge, targetAge, contributionEndAge)
     balance = safe_number(current_balance, 0.0)
     monthly_rate = safe_number(annual_rate, 0.0) / 12.0
@@ -39,6 +215,75 @@ def calculate_future_value(current_balance: Number, monthly_contribution: Number
                 balance += safe_number(monthly_contribution, 0.0)
     return balance
 
+def _future_value_closed_form(current_balance: Number, monthly_contribution: Number, annual_rate: Number,
+                              current_age: int, target_age: int, contribution_end_age: int) -> Number:
+    # Same balance as the monthly loop, as two geometric series:
+    #   phase 1: contributing months (age < contribution_end_age)
+    #   phase 2: growth-only months up to target_age
+    balance = safe_number(current_balance, 0.0)
+    contribution = safe_number(monthly_contribution, 0.0)
+    monthly_rate = safe_number(annual_rate, 0.0) / 12.0
+    start = int(current_age)
+    end = int(target_age)
+    if end <= start:
+        return balance
+    if monthly_rate <= -1:
+        return _future_value_reference(current_balance, monthly_contribution, annual_rate,
+                                       current_age, target_age, contribution_end_age)
+    n1 = 12 * max(0, min(end, int(contribution_end_age)) - start)
+    n2 = 12 * (end - start) - n1
+    if monthly_rate == 0:
+        return balance + contribution * n1
+    log_growth = math.log1p(monthly_rate)
+    growth1_minus_one = math.expm1(n1 * log_growth)
+    balance = balance * (1 + growth1_minus_one) + contribution * growth1_minus_one / monthly_rate
+    return balance * math.exp(n2 * log_growth)
+
+def calculate_future_value(current_balance: Number, monthly_contribution: Number, annual_rate: Number,
+                           current_age: int, target_age: int, contribution_end_age: int,
+                           engine: Optional[str] = None) -> Number:
+    # JS: calculateFutureValue(...)
+    # engine: "reference" (monthly loop, bit-compatible with JS) / "closed_form" (geometric series).
+    # None follows the process-wide setting (set_future_value_engine).
+    if _metrics_on:
+        _metric("futureValue", "calls")
+        if (engine or _future_value_engine) != "closed_form":
+            _metric("futureValue", "monthsIterated", 12 * max(0, int(target_age) - int(current_age)))
+    if (engine or _future_value_engine) == "closed_form":
+        return _future_value_closed_form(current_balance, monthly_contribution, annual_rate,
+                                         current_age, target_age, contribution_end_age)
+    return _future_value_reference(current_balance, monthly_contribution, annual_rate,
+                                   current_age, target_age, contribution_end_age)
+
+def check_future_value_drift(cases: Optional[Iterable[Tuple[Number, Number, Number, int, int, int]]] = None) -> Dict[str, Any]:
+    # Compare closed_form against reference over a sweep of
+    # (balance, contribution, rate, currentAge, targetAge, contributionEndAge) tuples.
+    if cases is None:
+        cases = (
+            (b, c, r, cur, tgt, cend)
+            for b in (0.0, 123.4, 2500.0)
+            for c in (0.0, 0.5, 5.5)
+            for r in (0.0, 0.001, 0.01, 0.03, 0.07, -0.02)
+            for cur in (20, 35, 50, 59)
+            for tgt in (60, 65, 75, 90)
+            for cend in (cur, 55, 60, 65)
+        )
+    n = 0
+    max_abs = 0.0
+    max_rel = 0.0
+    worst = None
+    for case in cases:
+        ref = _future_value_reference(*case)
+        fast = _future_value_closed_form(*case)
+        diff = abs(fast - ref)
+        rel = diff / abs(ref) if ref != 0 else diff
+        n += 1
+        if worst is None or rel > max_rel:
+            worst = {"case": case, "reference": ref, "closedForm": fast}
+        max_abs = max(max_abs, diff)
+        max_rel = max(max_rel, rel)
+    return {"cases": n, "maxAbsDrift": max_abs, "maxRelDrift": max_rel, "worst": worst}
+
 def calculate_public_pension(avg_salary: Number, years_of_service: int, exemption: bool, retirement_age: int) -> Number:
     # JS: calculatePublicPension(avgSalary, yearsOfService, exemption, retirementAge)
     months_of_service = years_of_service * 12
@@ -53,41 +298,97 @@ def calculate_public_pension(avg_salary: Number, years_of_service: int, exemptio
     basic_pension = full_basic_pension * basic_years / 40
     return employee_pension + basic_pension
 
+# Tax brackets as data: (upper bound inclusive, rate, offset), sorted by upper bound.
+# A value x falls in the first bracket whose bound is >= x (bisect_left / searchsorted side="left").
+INCOME_TAX_BRACKETS = (  # 円単位. tax = income_yen * rate - offset
+    (1949000, 0.05, 0),
+    (3299000, 0.10, 97500),
+    (6949000, 0.20, 427500),
+    (8999000, 0.23, 636000),
+    (17999000, 0.33, 1536000),
+    (39999000, 0.40, 2796000),
+    (math.inf, 0.45, 4796000),
+)
+PENSION_DEDUCTION_BRACKETS_65 = (  # 万円. deduction = total * rate + offset
+    (330, 0.0, 110),
+    (410, 0.25, 27.5),
+    (770, 0.15, 68.5),
+    (1000, 0.05, 145.5),
+    (math.inf, 0.0, 195.5),
+)
+PENSION_DEDUCTION_BRACKETS_UNDER_65 = (
+    (130, 0.0, 60),
+    (410, 0.25, 27.5),
+    (770, 0.15, 68.5),
+    (1000, 0.05, 145.5),
+    (math.inf, 0.0, 195.5),
+)
+
+class BracketTable:
+    # Compiled bracket table: threshold/rate/offset columns for bisect (scalar) and searchsorted (ndarray).
+    def __init__(self, brackets):
+        self.thresholds = tuple(float(t) for t, _, _ in brackets)
+        self.rates = tuple(float(r) for _, r, _ in brackets)
+        self.offsets = tuple(float(o) for _, _, o in brackets)
+        if np is not None:
+            self.thresholds_arr = np.array(self.thresholds)
+            self.rates_arr = np.array(self.rates)
+            self.offsets_arr = np.array(self.offsets)
+
+    def index(self, x: Number) -> int:
+        return bisect_left(self.thresholds, x)
+
+    def index_array(self, x):
+        return np.searchsorted(self.thresholds_arr, x, side="left")
+
+_INCOME_TAX_TABLE = BracketTable(INCOME_TAX_BRACKETS)
+_PENSION_DEDUCTION_TABLE_65 = BracketTable(PENSION_DEDUCTION_BRACKETS_65)
+_PENSION_DEDUCTION_TABLE_UNDER_65 = BracketTable(PENSION_DEDUCTION_BRACKETS_UNDER_65)
+
 def calculate_income_tax(income: Number) -> Number:
     # JS: calculateIncomeTax(income) (復興税込 2.1%上乗せ)
+    if _metrics_on:
+        _metric("taxCalls", "incomeTax")
+    if _is_array(income):
+        income_yen = income * 10000
+        i = _INCOME_TAX_TABLE.index_array(income_yen)
+        tax = income_yen * _INCOME_TAX_TABLE.rates_arr[i] - _INCOME_TAX_TABLE.offsets_arr[i]
+        return np.where(income <= 0, 0.0, np.maximum(0.0, tax * 1.021) / 10000)
     if income <= 0:
         return 0.0
     income_yen = income * 10000
-    if income_yen <= 1949000:
-        tax = income_yen * 0.05
-    elif income_yen <= 3299000:
-        tax = income_yen * 0.10 - 97500
-    elif income_yen <= 6949000:
-        tax = income_yen * 0.20 - 427500
-    elif income_yen <= 8999000:
-        tax = income_yen * 0.23 - 636000
-    elif income_yen <= 17999000:
-        tax = income_yen * 0.33 - 1536000
-    elif income_yen <= 39999000:
-        tax = income_yen * 0.40 - 2796000
-    else:
-        tax = income_yen * 0.45 - 4796000
+    i = _INCOME_TAX_TABLE.index(income_yen)
+    tax = income_yen * _INCOME_TAX_TABLE.rates[i] - _INCOME_TAX_TABLE.offsets[i]
     return max(0.0, tax * 1.021) / 10000
 
 def calculate_resident_tax_general(income: Number) -> Number:
     # JS: calculateResidentTaxGeneral(income)
+    if _metrics_on:
+        _metric("taxCalls", "residentTaxGeneral")
+    if _is_array(income):
+        return np.where(income <= 0, 0.0, income * 0.10 + 0.5)
     if income <= 0:
         return 0.0
     return income * 0.10 + 0.5
 
 def calculate_resident_tax_retirement(income: Number) -> Number:
     # JS: calculateResidentTaxRetirement(income)
+    if _metrics_on:
+        _metric("taxCalls", "residentTaxRetirement")
+    if _is_array(income):
+        return np.where(income <= 0, 0.0, income * 0.10)
     if income <= 0:
         return 0.0
     return income * 0.10
 
 def calculate_retirement_tax(amount: Number, deduction: Number) -> Number:
     # JS: calculateRetirementTax(amount, deduction)
+    if _metrics_on:
+        _metric("taxCalls", "retirementTax")
+    if _is_array(amount) or _is_array(deduction):
+        taxable_income = (amount - deduction) / 2
+        tax = calculate_income_tax(taxable_income) + calculate_resident_tax_retirement(taxable_income)
+        return np.where(amount <= deduction, 0.0, tax)
     if amount <= deduction:
         return 0.0
     taxable_income = (amount - deduction) / 2
@@ -95,31 +396,32 @@ def calculate_retirement_tax(amount: Number, deduction: Number) -> Number:
 
 def calculate_pension_deduction(total_pension: Number, age: int) -> Number:
     # JS: calculatePensionDeduction(totalPension, age)
-    if age >= 65:
-        if total_pension <= 330:
-            return 110
-        elif total_pension <= 410:
-            return total_pension * 0.25 + 27.5
-        elif total_pension <= 770:
-            return total_pension * 0.15 + 68.5
-        elif total_pension <= 1000:
-            return total_pension * 0.05 + 145.5
-        else:
-            return 195.5
-    else:
-        if total_pension <= 130:
-            return 60
-        elif total_pension <= 410:
-            return total_pension * 0.25 + 27.5
-        elif total_pension <= 770:
-            return total_pension * 0.15 + 68.5
-        elif total_pension <= 1000:
-            return total_pension * 0.05 + 145.5
-        else:
-            return 195.5
+    if _metrics_on:
+        _metric("taxCalls", "pensionDeduction")
+    if _is_array(total_pension) or _is_array(age):
+        total_pension = np.asarray(total_pension, dtype=np.float64)
+        t65 = _PENSION_DEDUCTION_TABLE_65
+        tu = _PENSION_DEDUCTION_TABLE_UNDER_65
+        i65 = t65.index_array(total_pension)
+        iu = tu.index_array(total_pension)
+        return np.where(np.asarray(age) >= 65,
+                        total_pension * t65.rates_arr[i65] + t65.offsets_arr[i65],
+                        total_pension * tu.rates_arr[iu] + tu.offsets_arr[iu])
+    table = _PENSION_DEDUCTION_TABLE_65 if age >= 65 else _PENSION_DEDUCTION_TABLE_UNDER_65
+    i = table.index(total_pension)
+    return total_pension * table.rates[i] + table.offsets[i]
 
 def calculate_pension_tax(total_yearly_pension: Number, age: int) -> Number:
     # JS: calculatePensionTax(totalYearlyPension, age)
+    # ndarray inputs (e.g. one row per age 60..endAge, or one per employee) are evaluated in one call.
+    if _metrics_on:
+        _metric("taxCalls", "pensionTax")
+    if _is_array(total_yearly_pension) or _is_array(age):
+        total_yearly_pension = np.asarray(total_yearly_pension, dtype=np.float64)
+        deduction = calculate_pension_deduction(total_yearly_pension, age)
+        taxable_income = np.maximum(0.0, total_yearly_pension - deduction - 48)
+        tax = calculate_income_tax(taxable_income) + calculate_resident_tax_general(taxable_income)
+        return np.where(taxable_income <= 0, 0.0, tax)
     deduction = calculate_pension_deduction(total_yearly_pension, age)
     taxable_income = max(0.0, total_yearly_pension - deduction - 48)
     if taxable_income <= 0:
@@ -135,6 +437,128 @@ def calculate_pmt(principal: Number, annual_rate: Number, years: int) -> Number:
     power = (1 + r) ** n
     return principal * r * power / (power - 1)
 
+class PensionTaxMemo(OrderedDict):
+    # {(yearly, age >= 65): calculate_pension_tax}, LRU bounded by maxsize (see _pension_tax_memo)
+    def __init__(self, maxsize: int = 1 << 16):
+        super().__init__()
+        self.maxsize = max(1, int(maxsize))
+
+class CalcCache:
+    # Bounded LRU memo for calculate_future_value / calculate_pmt, keyed on normalized numeric tuples.
+    # calculate_all owns one per calculation; get_shared_calc_cache() returns the process-wide one.
+    # hits/misses/size count the future value / annuity entries only; retirement taxes, pension taxes and
+    # cashflows have their own LRU stores (maxsize each) and counters.
+    # pension_tax: PensionTaxMemo shared by every optimize_strategy run that uses this cache (LRU, maxsize).
+    # cashflows: {cashflow_key(): PensionCashflow}, LRU bounded by maxsize like _data (candidates differing only
+    # in lump-sum ages share one).
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = max(1, int(maxsize))
+        self.hits = 0
+        self.misses = 0
+        self.retirement_tax_hits = 0
+        self.retirement_tax_misses = 0
+        self.cashflow_hits = 0
+        self.cashflow_misses = 0
+        self._data: "OrderedDict[Tuple[Any, ...], Number]" = OrderedDict()
+        self._rtax: "OrderedDict[Tuple[Any, ...], Tuple[Number, Number]]" = OrderedDict()
+        self.pension_tax = PensionTaxMemo(self.maxsize)
+        self.cashflows: "OrderedDict[Tuple[Any, ...], PensionCashflow]" = OrderedDict()
+
+    def _get(self, key: Tuple[Any, ...], compute) -> Number:
+        data = self._data
+        if key in data:
+            data.move_to_end(key)
+            self.hits += 1
+            return data[key]
+        self.misses += 1
+        value = compute()
+        data[key] = value
+        if len(data) > self.maxsize:
+            data.popitem(last=False)
+        return value
+
+    def future_value(self, current_balance: Number, monthly_contribution: Number, annual_rate: Number,
+                     current_age: int, target_age: int, contribution_end_age: int) -> Number:
+        key = ("fv", safe_number(current_balance, 0.0), safe_number(monthly_contribution, 0.0),
+               safe_number(annual_rate, 0.0), int(current_age), int(target_age), int(contribution_end_age),
+               _future_value_engine)
+        return self._get(key, lambda: calculate_future_value(current_balance, monthly_contribution, annual_rate,
+                                                             current_age, target_age, contribution_end_age))
+
+    def pmt(self, principal: Number, annual_rate: Number, years: int) -> Number:
+        key = ("pmt", float(principal), float(annual_rate), int(years))
+        return self._get(key, lambda: calculate_pmt(principal, annual_rate, years))
+
+    def retirement_tax(self, event: "LumpEvent", previous: Optional["LumpEvent"]) -> Tuple[Number, Number]:
+        # (deduction, calculate_retirement_tax) of a merged lump event, memoized on its signature:
+        # amount, merged spans, and the previous event's spans when the 20-year window applies
+        # (merged events carry no kind, so age gap and spans are all the deduction depends on).
+        if event.spans is None:
+            deduction = _event_deduction(event, previous)
+            return deduction, calculate_retirement_tax(event.amount, deduction)
+        near = previous is not None and event.age - previous.age < 20
+        key = (event.amount, event.spans, previous.spans if near else None)
+        store = self._rtax
+        value = store.get(key)
+        if _metrics_on:
+            _metric("memo", "retirementTaxHits" if value is not None else "retirementTaxMisses")
+        if value is not None:
+            store.move_to_end(key)
+            self.retirement_tax_hits += 1
+            return value
+        self.retirement_tax_misses += 1
+        value = store[key] = _retirement_tax_uncached(event, previous)
+        if len(store) > self.maxsize:
+            store.popitem(last=False)
+        return value
+
+    def pension_cashflow(self, input_: "SimulationInput", public_pension_annual: Number, options: Any,
+                         tax_memo: Optional[PensionTaxMemo] = None) -> "PensionCashflow":
+        # build_pension_cashflow memoized on everything it reads (see cashflow_key); callers never mutate it
+        key = cashflow_key(input_, public_pension_annual, options)
+        cashflows = self.cashflows
+        cashflow = cashflows.get(key)
+        if _metrics_on:
+            _metric("memo", "cashflowHits" if cashflow is not None else "cashflowMisses")
+        if cashflow is not None:
+            cashflows.move_to_end(key)
+            self.cashflow_hits += 1
+            return cashflow
+        self.cashflow_misses += 1
+        cashflow = cashflows[key] = build_pension_cashflow(input_, public_pension_annual, options, tax_memo)
+        if len(cashflows) > self.maxsize:
+            cashflows.popitem(last=False)
+        return cashflow
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize,
+                "retirementTaxHits": self.retirement_tax_hits, "retirementTaxMisses": self.retirement_tax_misses,
+                "retirementTaxSize": len(self._rtax),
+                "cashflowHits": self.cashflow_hits, "cashflowMisses": self.cashflow_misses}
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._rtax.clear()
+        self.pension_tax.clear()
+        self.cashflows.clear()
+        self.cashflow_hits = 0
+        self.cashflow_misses = 0
+        self.hits = 0
+        self.misses = 0
+        self.retirement_tax_hits = 0
+        self.retirement_tax_misses = 0
+
+_shared_calc_cache = CalcCache(maxsize=8192)
+
+def get_shared_calc_cache() -> CalcCache:
+    return _shared_calc_cache
+
+def _future_value(cache: Optional[CalcCache], *args) -> Number:
+    return cache.future_value(*args) if cache is not None else calculate_future_value(*args)
+
+def _pmt(cache: Optional[CalcCache], *args) -> Number:
+    return cache.pmt(*args) if cache is not None else calculate_pmt(*args)
+
 def merge_intervals(intervals: List[Dict[str, Number]]) -> List[Dict[str, Number]]:
     # JS: mergeIntervals(intervals)
     if not intervals:
@@ -203,155 +627,355 @@ def adjusted_deduction_with_19_year_rule(current_event: Dict[str, Any], previous
     overlap_deduction = calculate_retirement_deduction(overlap_years)
     return max(0.0, base_deduction - overlap_deduction)
 
-def build_lump_events(input_: Dict[str, Any], years_of_service: int, options: Dict[str, Any]) -> List[Dict[str, Any]]:
-    # JS: buildLumpEvents(input, yearsOfService, options)
-    events: List[Dict[str, Any]] = []
-    severance_age = int(input_.get("severanceReceiveAge", input_["retirementAge"]))
-    events.append({
-        "kind": "severance",
-        "age": severance_age,
-        "items": [{"item": "退職一時金", "age": severance_age, "amount": safe_number(input_["severancePay"], 0.0)}],
-        "amount": safe_number(input_["severancePay"], 0.0),
-        "periods": [{"startAge": severance_age - years_of_service, "endAge": severance_age}]
-    })
+Span = Tuple[int, int]
+
+@lru_cache(maxsize=4096)
+def _merge_spans(periods: Tuple[Span, ...]) -> Tuple[Span, ...]:
+    # merge_intervals on (startAge, endAge) tuples -> merged (s, e) tuples.
+    # Memoized: the same service periods recur across candidates and sweep points.
+    if not periods:
+        return ()
+    spans = sorted((min(a, b), max(a, b)) for a, b in periods if max(a, b) > min(a, b))
+    merged = [spans[0]]
+    for s, e in spans[1:]:
+        last_s, last_e = merged[-1]
+        if s <= last_e:
+            merged[-1] = (last_s, max(last_e, e))
+        else:
+            merged.append((s, e))
+    return tuple(merged)
+
+def _overlap_spans(a: Tuple[Span, ...], b: Tuple[Span, ...]) -> Number:
+    # overlap_length_years on already merged spans
+    i = 0
+    j = 0
+    overlap = 0.0
+    while i < len(a) and j < len(b):
+        s = max(a[i][0], b[j][0])
+        e = min(a[i][1], b[j][1])
+        if e > s:
+            overlap += (e - s)
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return overlap
+
+class LumpEvent:
+    # One merged lump-sum event of build_lump_events (all receipts at the same age).
+    # items: (item, age, amount) tuples; periods: (startAge, endAge) tuples;
+    # spans/years: merged periods and their union length, computed once here
+    # (None when every period is empty; the deduction then fails like merge_intervals does).
+    __slots__ = ("age", "amount", "items", "periods", "spans", "years")
+
+    def __init__(self, age: int, amount: Number, items: Tuple[Tuple[str, int, Number], ...], periods: Tuple[Span, ...]):
+        self.age = age
+        self.amount = amount
+        self.items = items
+        self.periods = periods
+        self.spans = _merge_spans(periods) if any(a != b for a, b in periods) else None
+        self.years = sum((e - s) for s, e in self.spans) if self.spans is not None else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"age": self.age, "amount": self.amount,
+                "periods": [{"startAge": s, "endAge": e} for s, e in self.periods],
+                "items": [{"item": item, "age": age, "amount": amount} for item, age, amount in self.items]}
+
+def _lump_events(input_: SimulationInput, years_of_service: int, options: Any) -> List[LumpEvent]:
+    # build_lump_events as LumpEvent objects (same order, same amount accumulation)
+    severance_age = input_.severanceReceiveAge
+    raw = [(severance_age, input_.severancePay, ("退職一時金", severance_age, input_.severancePay),
+            (severance_age - years_of_service, severance_age))]
     if options.get("dcMode") == "lump":
         age = int(options["dcLumpAge"])
         amount = safe_number(options.get("dcLumpAmount"), 0.0)
-        events.append({
-            "kind": "dc",
-            "age": age,
-            "items": [{"item": "企業型DC一時金", "age": age, "amount": amount}],
-            "amount": amount,
-            "periods": [{"startAge": int(input_["dcStartAge"]), "endAge": int(input_["dcEndAge"])}]
-        })
+        raw.append((age, amount, ("企業型DC一時金", age, amount), (input_.dcStartAge, input_.dcEndAge)))
     if options.get("idecoMode") == "lump":
         age = int(options["idecoLumpAge"])
         amount = safe_number(options.get("idecoLumpAmount"), 0.0)
-        events.append({
-            "kind": "ideco",
-            "age": age,
-            "items": [{"item": "iDeCo一時金", "age": age, "amount": amount}],
-            "amount": amount,
-            "periods": [{"startAge": int(input_["idecoStartAge"]), "endAge": int(input_["idecoEndAge"])}]
-        })
-    m: Dict[int, Dict[str, Any]] = {}
-    for ev in events:
-        key = int(ev["age"])
-        if key not in m:
-            m[key] = {"age": key, "amount": 0.0, "periods": [], "items": []}
-        agg = m[key]
-        agg["amount"] += safe_number(ev["amount"], 0.0)
-        agg["periods"].extend(ev["periods"])
-        agg["items"].extend(ev["items"])
-    out = list(m.values())
-    out.sort(key=lambda x: x["age"])
-    return out
+        raw.append((age, amount, ("iDeCo一時金", age, amount), (input_.idecoStartAge, input_.idecoEndAge)))
+    if len(raw) == 1:
+        age, amount, item, period = raw[0]
+        return [LumpEvent(int(age), 0.0 + amount, (item,), (period,))]
+    by_age: Dict[int, List[Any]] = {}
+    for age, amount, item, period in raw:
+        agg = by_age.get(int(age))
+        if agg is None:
+            agg = by_age[int(age)] = [0.0, [], []]
+        agg[0] += amount
+        agg[1].append(item)
+        agg[2].append(period)
+    return [LumpEvent(age, amount, tuple(items), tuple(periods))
+            for age, (amount, items, periods) in sorted(by_age.items())]
 
-def calc_pension_totals(input_: Dict[str, Any], public_pension_annual: Number, options: Dict[str, Any]) -> Dict[str, Number]:
-    # JS: calcPensionTotals(input, publicPensionAnnual, options)
-    end_age = int(input_["endAge"])
-    total_gross = 0.0
-    total_tax = 0.0
+def _event_deduction(current: LumpEvent, previous: Optional[LumpEvent]) -> Number:
+    # adjusted_deduction_with_19_year_rule on merged events, reusing their merged spans.
+    # Merged events carry no "kind", so retirement_rule_threshold_years() is always 20.
+    if current.spans is None:
+        raise IndexError("lump event without any non-empty period")
+    base_deduction = calculate_retirement_deduction(current.years)
+    if previous is None:
+        return base_deduction
+    if current.age - previous.age >= 20:
+        return base_deduction
+    if previous.spans is None:
+        raise IndexError("lump event without any non-empty period")
+    overlap_deduction = calculate_retirement_deduction(_overlap_spans(previous.spans, current.spans))
+    return max(0.0, base_deduction - overlap_deduction)
+
+def _retirement_tax_uncached(event: LumpEvent, previous: Optional[LumpEvent]) -> Tuple[Number, Number]:
+    deduction = _event_deduction(event, previous)
+    return deduction, calculate_retirement_tax(event.amount, deduction)
+
+def _retirement_tax(cache: Optional[CalcCache], event: LumpEvent, previous: Optional[LumpEvent]) -> Number:
+    return (cache.retirement_tax(event, previous) if cache is not None else _retirement_tax_uncached(event, previous))[1]
+
+def build_lump_events(input_: Dict[str, Any], years_of_service: int, options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # JS: buildLumpEvents(input, yearsOfService, options)
+    return [ev.to_dict() for ev in _lump_events(SimulationInput.coerce(input_), years_of_service, options)]
+
+def _seq_sum(values: Iterable[Number]) -> Number:
+    # left-to-right accumulation, i.e. the same rounding as the JS "+=" loops (builtin sum may compensate)
+    total = 0.0
+    for v in values:
+        total += v
+    return total
+
+def _pension_tax_memo(memo: PensionTaxMemo, yearly: Number, age: int) -> Number:
+    # calculate_pension_tax depends on age only through age >= 65 (deduction table)
+    key = (yearly, age >= 65)
+    tax = memo.get(key)
+    if tax is None:
+        tax = memo[key] = calculate_pension_tax(yearly, age)
+        if len(memo) > memo.maxsize:
+            memo.popitem(last=False)
+    else:
+        memo.move_to_end(key)
+    return tax
+
+class PensionCashflow:
+    # Per-age pension cashflow of one candidate, ages start_age..end_age-1 (60..endAge-1),
+    # computed once and shared by the totals, the 60-65 / 65+ bands and the UI breakdown.
+    # yearly gross = public + DC + iDeCo; tax = calculate_pension_tax(gross, age) where gross > 0.
+    __slots__ = ("start_age", "end_age", "public", "dc", "ideco", "gross", "tax", "net", "_totals")
+
+    def __init__(self, start_age: int, end_age: int, public: "array", dc: "array", ideco: "array",
+                 gross: "array", tax: "array"):
+        self.start_age = start_age
+        self.end_age = end_age
+        self.public = public
+        self.dc = dc
+        self.ideco = ideco
+        self.gross = gross
+        self.tax = tax
+        self.net = array("d", (g - t for g, t in zip(gross, tax)))
+        self._totals: Optional[Dict[str, Number]] = None
+
+    def _slice(self, col: "array", s: int, e: int) -> "array":
+        # ages outside start_age..end_age-1 carry no pension (all start ages are >= 60)
+        lo = max(s, self.start_age) - self.start_age
+        hi = min(e, self.end_age) - self.start_age
+        return col[lo:hi] if hi > lo else array("d")
+
+    def totals(self) -> Dict[str, Number]:
+        # JS: calcPensionTotals (ages with gross <= 0 are skipped); summed once per cashflow (CalcCache shares them)
+        if self._totals is None:
+            total_gross = _seq_sum(g for g in self.gross if g > 0)
+            total_tax = _seq_sum(t for g, t in zip(self.gross, self.tax) if g > 0)
+            self._totals = {"totalGross": total_gross, "totalTax": total_tax, "totalNet": total_gross - total_tax}
+        return dict(self._totals)
+
+    def band(self, start_age: int, end_age: int) -> Dict[str, Number]:
+        # JS: band(startAge, endAge) inside evaluateCandidate
+        s = max(0, int(start_age))
+        e = max(s, min(int(end_age), self.end_age))
+        years = e - s
+        if years <= 0:
+            return {"grossMonthly": 0.0, "netMonthly": 0.0}
+        gross_sum = _seq_sum(self._slice(self.gross, s, e))
+        tax_sum = _seq_sum(self._slice(self.tax, s, e))
+        return {"grossMonthly": gross_sum/(years*12), "netMonthly": (gross_sum-tax_sum)/(years*12)}
+
+    def components(self, start_age: int, end_age: int) -> Dict[str, float]:
+        # build_pension_component_monthly
+        s = max(0, int(start_age))
+        e = max(s, min(int(end_age), self.end_age))
+        years = e - s
+        if years <= 0:
+            return {"years": 0, "publicM": 0.0, "dcM": 0.0, "idecoM": 0.0, "totalM": 0.0}
+        public_sum = _seq_sum(self._slice(self.public, s, e))
+        dc_sum = _seq_sum(self._slice(self.dc, s, e))
+        ideco_sum = _seq_sum(self._slice(self.ideco, s, e))
+        return {"years": years, "publicM": public_sum / (years*12), "dcM": dc_sum / (years*12),
+                "idecoM": ideco_sum / (years*12), "totalM": (public_sum+dc_sum+ideco_sum) / (years*12)}
+
+    @classmethod
+    def from_timeline(cls, timeline: Dict[str, List[Number]]) -> "PensionCashflow":
+        ages = timeline.get("ages") or []
+        start = int(ages[0]) if ages else 60
+        cols = [array("d", timeline.get(k) or []) for k in ("public", "dc", "ideco", "gross", "tax")]
+        return cls(start, start + len(ages), *cols)
+
+    def timeline(self) -> Dict[str, List[Number]]:
+        # year-by-year columns for charts (JSON friendly)
+        return {"ages": list(range(self.start_age, self.end_age)), "public": list(self.public), "dc": list(self.dc),
+                "ideco": list(self.ideco), "gross": list(self.gross), "tax": list(self.tax), "net": list(self.net)}
+
+def build_pension_cashflow(input_: Dict[str, Any], public_pension_annual: Number, options: Dict[str, Any],
+                           tax_memo: Optional[PensionTaxMemo] = None) -> PensionCashflow:
+    # tax_memo: shared {(yearly, age >= 65): tax} across candidates (calculate_pension_tax depends on age only there)
+    end_age = max(60, SimulationInput.coerce(input_).endAge)
+    dc_pension = options.get("dcMode") == "pension"
+    ideco_pension = options.get("idecoMode") == "pension"
+    dc_start = int(options["dcPensionStartAge"]) if dc_pension else 0
+    ideco_start = int(options["idecoPensionStartAge"]) if ideco_pension else 0
+    dc_annual = safe_number(options.get("dcPensionAnnual"), 0.0)
+    ideco_annual = safe_number(options.get("idecoPensionAnnual"), 0.0)
+    public = array("d")
+    dc = array("d")
+    ideco = array("d")
+    gross = array("d")
+    tax = array("d")
     for age in range(60, end_age):
+        p = public_pension_annual if age >= 65 else 0.0
+        d = dc_annual if dc_pension and age >= dc_start else 0.0
+        i = ideco_annual if ideco_pension and age >= ideco_start else 0.0
         yearly = 0.0
-        if age >= 65:
-            yearly += public_pension_annual
-        if options.get("dcMode") == "pension" and age >= int(options["dcPensionStartAge"]):
-            yearly += safe_number(options.get("dcPensionAnnual"), 0.0)
-        if options.get("idecoMode") == "pension" and age >= int(options["idecoPensionStartAge"]):
-            yearly += safe_number(options.get("idecoPensionAnnual"), 0.0)
-        if yearly <= 0:
-            continue
-        total_gross += yearly
-        total_tax += calculate_pension_tax(yearly, age)
-    return {"totalGross": total_gross, "totalTax": total_tax, "totalNet": total_gross - total_tax}
+        yearly += p
+        yearly += d
+        yearly += i
+        if yearly > 0:
+            t = _pension_tax_memo(tax_memo, yearly, age) if tax_memo is not None else calculate_pension_tax(yearly, age)
+        else:
+            t = 0.0
+        public.append(p)
+        dc.append(d)
+        ideco.append(i)
+        gross.append(yearly)
+        tax.append(t)
+    return PensionCashflow(60, end_age, public, dc, ideco, gross, tax)
 
-def evaluate_candidate(input_: Dict[str, Any], public_pension_annual: Number, years_of_service: int,
-                       candidate: Dict[str, Any], meta: Dict[str, Any]) -> Dict[str, Any]:
-    # JS: evaluateCandidate(...)
+def cashflow_key(input_: SimulationInput, public_pension_annual: Number, options: Any) -> Tuple[Any, ...]:
+    # every input of build_pension_cashflow: endAge, public pension, and the annuities with their start ages
+    dc_pension = options.get("dcMode") == "pension"
+    ideco_pension = options.get("idecoMode") == "pension"
+    return (input_.endAge, public_pension_annual,
+            int(options["dcPensionStartAge"]) if dc_pension else None,
+            safe_number(options.get("dcPensionAnnual"), 0.0) if dc_pension else None,
+            int(options["idecoPensionStartAge"]) if ideco_pension else None,
+            safe_number(options.get("idecoPensionAnnual"), 0.0) if ideco_pension else None)
+
+def _pension_cashflow(cache: Optional[CalcCache], input_: SimulationInput, public_pension_annual: Number,
+                      options: Any, tax_memo: Optional[PensionTaxMemo]) -> PensionCashflow:
+    if cache is None:
+        return build_pension_cashflow(input_, public_pension_annual, options, tax_memo)
+    return cache.pension_cashflow(input_, public_pension_annual, options, tax_memo)
+
+def calc_pension_totals(input_: Dict[str, Any], public_pension_annual: Number, options: Dict[str, Any]) -> Dict[str, Number]:
+    # JS: calcPensionTotals(input, publicPensionAnnual, options)
+    return build_pension_cashflow(input_, public_pension_annual, options).totals()
+
+class CandidateOptions:
+    # evaluateCandidate "options" (receive modes/ages, lump amounts, annuities) as a slotted record.
+    # options["key"] / options.get("key") work as on the former dict; to_dict() gives that dict.
+    __slots__ = ("dcMode", "idecoMode", "dcLumpAge", "idecoLumpAge", "dcLumpAmount", "idecoLumpAmount",
+                 "dcPensionStartAge", "idecoPensionStartAge", "dcPensionAnnual", "idecoPensionAnnual")
+
+    def __init__(self, dcMode=None, idecoMode=None, dcLumpAge=None, idecoLumpAge=None, dcLumpAmount=0.0,
+                 idecoLumpAmount=0.0, dcPensionStartAge=None, idecoPensionStartAge=None, dcPensionAnnual=0.0,
+                 idecoPensionAnnual=0.0):
+        self.dcMode = dcMode
+        self.idecoMode = idecoMode
+        self.dcLumpAge = dcLumpAge
+        self.idecoLumpAge = idecoLumpAge
+        self.dcLumpAmount = dcLumpAmount
+        self.idecoLumpAmount = idecoLumpAmount
+        self.dcPensionStartAge = dcPensionStartAge
+        self.idecoPensionStartAge = idecoPensionStartAge
+        self.dcPensionAnnual = dcPensionAnnual
+        self.idecoPensionAnnual = idecoPensionAnnual
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+def candidate_options(input_: Dict[str, Any], candidate: Dict[str, Any],
+                      cache: Optional[CalcCache] = None) -> CandidateOptions:
+    # evaluateCandidate前半：候補の一時金額・年金年額（options）
+    input_ = SimulationInput.coerce(input_)
     dc_lump_amount = 0.0
     if candidate.get("dcMode") == "lump":
-        dc_lump_amount = calculate_future_value(
-            input_["dcCurrentBalance"], input_["dcMonthlyContribution"], input_["dcReturnRate"],
-            int(input_["currentAge"]), int(candidate["dcLumpAge"]), int(input_["dcEndAge"])
+        dc_lump_amount = _future_value(cache,
+            input_.dcCurrentBalance, input_.dcMonthlyContribution, input_.dcReturnRate,
+            input_.currentAge, int(candidate["dcLumpAge"]), input_.dcEndAge
         )
     ideco_lump_amount = 0.0
     if candidate.get("idecoMode") == "lump":
-        ideco_lump_amount = calculate_future_value(
-            input_["idecoCurrentBalance"], input_["idecoMonthlyContribution"], input_["idecoReturnRate"],
-            int(input_["currentAge"]), int(candidate["idecoLumpAge"]), int(input_["idecoEndAge"])
+        ideco_lump_amount = _future_value(cache,
+            input_.idecoCurrentBalance, input_.idecoMonthlyContribution, input_.idecoReturnRate,
+            input_.currentAge, int(candidate["idecoLumpAge"]), input_.idecoEndAge
         )
     dc_pension_annual = 0.0
     if candidate.get("dcMode") == "pension":
-        bal = calculate_future_value(
-            input_["dcCurrentBalance"], input_["dcMonthlyContribution"], input_["dcReturnRate"],
-            int(input_["currentAge"]), int(candidate["dcPensionStartAge"]), int(input_["dcEndAge"])
+        bal = _future_value(cache,
+            input_.dcCurrentBalance, input_.dcMonthlyContribution, input_.dcReturnRate,
+            input_.currentAge, int(candidate["dcPensionStartAge"]), input_.dcEndAge
         )
-        years = max(1, int(input_["endAge"]) - int(candidate["dcPensionStartAge"]))
-        dc_pension_annual = calculate_pmt(bal, input_["dcReturnRate"], years)
+        years = max(1, input_.endAge - int(candidate["dcPensionStartAge"]))
+        dc_pension_annual = _pmt(cache, bal, input_.dcReturnRate, years)
     ideco_pension_annual = 0.0
     if candidate.get("idecoMode") == "pension":
-        bal = calculate_future_value(
-            input_["idecoCurrentBalance"], input_["idecoMonthlyContribution"], input_["idecoReturnRate"],
-            int(input_["currentAge"]), int(candidate["idecoPensionStartAge"]), int(input_["idecoEndAge"])
+        bal = _future_value(cache,
+            input_.idecoCurrentBalance, input_.idecoMonthlyContribution, input_.idecoReturnRate,
+            input_.currentAge, int(candidate["idecoPensionStartAge"]), input_.idecoEndAge
         )
-        years = max(1, int(input_["endAge"]) - int(candidate["idecoPensionStartAge"]))
-        ideco_pension_annual = calculate_pmt(bal, input_["idecoReturnRate"], years)
-    options = {
-        "dcMode": candidate.get("dcMode"),
-        "idecoMode": candidate.get("idecoMode"),
-        "dcLumpAge": candidate.get("dcLumpAge"),
-        "idecoLumpAge": candidate.get("idecoLumpAge"),
-        "dcLumpAmount": dc_lump_amount,
-        "idecoLumpAmount": ideco_lump_amount,
-        "dcPensionStartAge": candidate.get("dcPensionStartAge"),
-        "idecoPensionStartAge": candidate.get("idecoPensionStartAge"),
-        "dcPensionAnnual": dc_pension_annual,
-        "idecoPensionAnnual": ideco_pension_annual,
-    }
-    lump_events = build_lump_events(input_, years_of_service, options)
+        years = max(1, input_.endAge - int(candidate["idecoPensionStartAge"]))
+        ideco_pension_annual = _pmt(cache, bal, input_.idecoReturnRate, years)
+    return CandidateOptions(
+        candidate.get("dcMode"), candidate.get("idecoMode"), candidate.get("dcLumpAge"), candidate.get("idecoLumpAge"),
+        dc_lump_amount, ideco_lump_amount, candidate.get("dcPensionStartAge"), candidate.get("idecoPensionStartAge"),
+        dc_pension_annual, ideco_pension_annual,
+    )
+
+def evaluate_candidate(input_: Dict[str, Any], public_pension_annual: Number, years_of_service: int,
+                       candidate: Dict[str, Any], meta: Dict[str, Any],
+                       cache: Optional[CalcCache] = None,
+                       tax_memo: Optional[PensionTaxMemo] = None) -> Dict[str, Any]:
+    # JS: evaluateCandidate(...)
+    if _metrics_on:
+        _metric("evaluateCandidate", meta["code"])
+    input_ = SimulationInput.coerce(input_)
+    options = candidate_options(input_, candidate, cache)
+    dc_pension_annual = options.dcPensionAnnual
+    ideco_pension_annual = options.idecoPensionAnnual
     total_lump_gross = 0.0
     total_lump_tax = 0.0
     lumpsum_breakdown: List[Dict[str, Any]] = []
     prev = None
-    for ev in lump_events:
-        deduction = adjusted_deduction_with_19_year_rule(ev, prev)
-        tax = calculate_retirement_tax(ev["amount"], deduction)
-        for item in ev["items"]:
-            ratio = (item["amount"] / ev["amount"]) if ev["amount"] > 0 else 0.0
+    for ev in _lump_events(input_, years_of_service, options):
+        tax = _retirement_tax(cache, ev, prev)
+        for item, age, amount in ev.items:
+            ratio = (amount / ev.amount) if ev.amount > 0 else 0.0
             item_tax = tax * ratio
-            item_net = item["amount"] - item_tax
-            lumpsum_breakdown.append({"item": item["item"], "age": int(item["age"]), "amount": item["amount"], "tax": item_tax, "net": item_net})
-        total_lump_gross += ev["amount"]
+            lumpsum_breakdown.append({"item": item, "age": int(age), "amount": amount, "tax": item_tax, "net": amount - item_tax})
+        total_lump_gross += ev.amount
         total_lump_tax += tax
         prev = ev
-    pension_totals = calc_pension_totals(input_, public_pension_annual, options)
+    cashflow = _pension_cashflow(cache, input_, public_pension_annual, options, tax_memo)
+    pension_totals = cashflow.totals()
     total_gross = total_lump_gross + pension_totals["totalGross"]
     total_tax = total_lump_tax + pension_totals["totalTax"]
     total_net = total_gross - total_tax
 
-    def band(start_age: int, end_age: int):
-        s = max(0, int(start_age))
-        e = max(s, min(int(end_age), int(input_["endAge"])))
-        years = e - s
-        if years <= 0:
-            return {"grossMonthly": 0.0, "netMonthly": 0.0}
-        gross_sum = 0.0
-        tax_sum = 0.0
-        for age in range(s, e):
-            yearly = 0.0
-            if age >= 65:
-                yearly += public_pension_annual
-            if candidate.get("dcMode") == "pension" and age >= int(candidate["dcPensionStartAge"]):
-                yearly += dc_pension_annual
-            if candidate.get("idecoMode") == "pension" and age >= int(candidate["idecoPensionStartAge"]):
-                yearly += ideco_pension_annual
-            gross_sum += yearly
-            tax_sum += calculate_pension_tax(yearly, age) if yearly > 0 else 0.0
-        return {"grossMonthly": gross_sum/(years*12), "netMonthly": (gross_sum-tax_sum)/(years*12)}
-
-    b60 = band(60, 65)
-    b65 = band(65, int(input_["endAge"]))
+    b60 = cashflow.band(60, 65)
+    b65 = cashflow.band(65, input_.endAge)
 
     strategy = {
         "name": meta["name"],
@@ -368,16 +992,86 @@ def evaluate_candidate(input_: Dict[str, Any], public_pension_annual: Number, ye
         "monthlyIncome60to65": b60["grossMonthly"],
         "monthlyIncome65plus": b65["grossMonthly"],
         "_candidate": candidate,
+        "_pensionAnnual": {"dc": dc_pension_annual, "ideco": ideco_pension_annual},
+        "pensionTimeline": cashflow.timeline(),
     }
-    return {"strategy": strategy, "options": options}
+    return {"strategy": strategy, "options": options, "cashflow": cashflow}
+
+def _candidate_bounds(input_: Dict[str, Any], public_pension_annual: Number, options: Dict[str, Any],
+                      memo: PensionTaxMemo) -> Tuple[Number, Number]:
+    # Cheap (upper bound of totalNet, lower bound of effective tax rate) from candidate_options().
+    # Lump taxes are bounded below by 0 (no lump events are built); pension totals are aggregated
+    # per age segment (between 65 / DC start / iDeCo start the yearly amount and the tax are constant).
+    # A relative slack covers the different summation order.
+    input_ = SimulationInput.coerce(input_)
+    gross = input_.severancePay + options["dcLumpAmount"] + options["idecoLumpAmount"]
+    tax = 0.0
+    end_age = input_.endAge
+    cuts = {60, 65, end_age}
+    if options.get("dcMode") == "pension":
+        cuts.add(int(options["dcPensionStartAge"]))
+    if options.get("idecoMode") == "pension":
+        cuts.add(int(options["idecoPensionStartAge"]))
+    cuts = sorted(c for c in cuts if 60 <= c <= end_age)
+    for seg_start, seg_end in zip(cuts, cuts[1:]):
+        yearly = 0.0
+        if seg_start >= 65:
+            yearly += public_pension_annual
+        if options.get("dcMode") == "pension" and seg_start >= int(options["dcPensionStartAge"]):
+            yearly += options["dcPensionAnnual"]
+        if options.get("idecoMode") == "pension" and seg_start >= int(options["idecoPensionStartAge"]):
+            yearly += options["idecoPensionAnnual"]
+        if yearly <= 0:
+            continue
+        gross += yearly * (seg_end - seg_start)
+        tax += _pension_tax_memo(memo, yearly, seg_start) * (seg_end - seg_start)
+    slack = 1e-10 * (abs(gross) + abs(tax) + 1.0)
+    net_ub = gross - tax + 2 * slack
+    eff_lb = (tax - slack) / (gross + slack) if gross > slack else 0.0
+    return net_ub, eff_lb
+
+def _candidate_totals(input_: Dict[str, Any], public_pension_annual: Number, years_of_service: int,
+                      options: Dict[str, Any], memo: PensionTaxMemo,
+                      cache: Optional[CalcCache] = None) -> Dict[str, Number]:
+    # totalGross/totalTax/totalNet of evaluate_candidate without the breakdown and bands.
+    # Same operations in the same order, so the totals are bit-identical.
+    input_ = SimulationInput.coerce(input_)
+    total_lump_gross = 0.0
+    total_lump_tax = 0.0
+    prev = None
+    for ev in _lump_events(input_, years_of_service, options):
+        total_lump_tax += _retirement_tax(cache, ev, prev)
+        total_lump_gross += ev.amount
+        prev = ev
+    pension = _pension_cashflow(cache, input_, public_pension_annual, options, memo).totals()
+    total_gross = total_lump_gross + pension["totalGross"]
+    total_tax = total_lump_tax + pension["totalTax"]
+    return {"totalGross": total_gross, "totalTax": total_tax, "totalNet": total_gross - total_tax}
+
+SEARCH_MODES = ("standard", "full")
+
+# progress(pattern_or_code, done, total, finished_strategy_or_None)
+Progress = Callable[[str, int, int, Optional[Dict[str, Any]]], None]
 
 def optimize_strategy(input_: Dict[str, Any], public_pension_annual: Number, years_of_service: int,
-                      pattern: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+                      pattern: str, meta: Dict[str, Any], cache: Optional[CalcCache] = None,
+                      search: str = "standard",
+                      collect: Optional[List[Tuple[Dict[str, Any], Dict[str, Number]]]] = None,
+                      progress: Optional[Progress] = None,
+                      hints: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
     # JS: optimizeStrategy(...)
+    # search="full": every lump-sum age 60..max_lump_age and pension start age 60..min(max_receive_age, endAge-1),
+    # with branch-and-bound pruning (see consider()); the winner is the same as folding update() over the whole grid.
+    # collect: list that receives (candidate, totals) of every candidate (pruning is off), e.g. for pareto.py.
+    # progress: called as progress(pattern, done, total, None) after each candidate; an exception it raises
+    # (e.g. jobs.JobCancelled) aborts the search.
+    # hints: candidates expected to win (e.g. the previous result's _candidate, see hints_from_result); full search
+    # only. See warm_start(): the answer is still the fold's, hints only decide how much of the grid is evaluated.
+    started = time.perf_counter() if _metrics_on else 0.0
+    input_ = SimulationInput.coerce(input_)
     max_receive_age = 75
-    retire_age = int(input_["retirementAge"])
-    sev_age = int(input_.get("severanceReceiveAge", retire_age))
-    max_lump_age = min(max_receive_age, int(input_["endAge"]))
+    sev_age = input_.severanceReceiveAge
+    max_lump_age = min(max_receive_age, input_.endAge)
 
     if sev_age <= 54:
         fixed_age = sev_age + 20
@@ -393,14 +1087,23 @@ def optimize_strategy(input_: Dict[str, Any], public_pension_annual: Number, yea
 
     pension_start_ages = [60]
 
+    if search == "full":
+        dc_lump_ages = list(range(60, max_lump_age + 1)) or [60]
+        ideco_lump_ages = list(dc_lump_ages)
+        pension_start_ages = list(range(60, max(60, min(max_receive_age, input_.endAge - 1)) + 1))
+    elif search != "standard":
+        raise ValueError(f"unknown search mode: {search}")
+    n_candidates = 0
+    n_pruned = 0
+
     best_net_seen = float("-inf")
     best_eff_seen = float("inf")
     best = None
 
     def eff(s): return (s["totalTax"]/s["totalGross"]) if s["totalGross"]>0 else 1.0
+    NET_TOL = 0.001
+    TAX_TOL_PT = 0.002
     def guard(res):
-        NET_TOL = 0.001
-        TAX_TOL_PT = 0.002
         return (res["strategy"]["totalNet"] >= best_net_seen*(1-NET_TOL)) and (eff(res["strategy"]) <= best_eff_seen + TAX_TOL_PT)
 
     def priority_key(res):
@@ -419,6 +1122,10 @@ def optimize_strategy(input_: Dict[str, Any], public_pension_annual: Number, yea
         b_ok = guard(best_res)
         if n_ok != b_ok:
             return n_ok
+        return outranks(new_res, best_res)
+
+    def outranks(new_res, best_res):
+        # better() once both pass guard(); True here means outranks(best_res, new_res) is False
         nn = new_res["strategy"]["totalNet"]
         bn = best_res["strategy"]["totalNet"]
         ne = eff(new_res["strategy"])
@@ -441,6 +1148,102 @@ def optimize_strategy(input_: Dict[str, Any], public_pension_annual: Number, yea
         if better(res, best):
             best = res
 
+    pension_tax_memo = cache.pension_tax if cache is not None else PensionTaxMemo()
+
+    def can_prune(options) -> bool:
+        # Skipping is exact: the candidate cannot move best_net_seen/best_eff_seen (so later guard()
+        # results are unchanged), and while the current best passes guard() the candidate either
+        # fails guard() or loses the first better() criterion by more than its tolerance.
+        if best is None or not guard(best):
+            return False
+        net_ub, eff_lb = _candidate_bounds(input_, public_pension_annual, options, pension_tax_memo)
+        if net_ub > best_net_seen or eff_lb < best_eff_seen:
+            return False
+        if net_ub < best_net_seen*(1-NET_TOL) or eff_lb > best_eff_seen + TAX_TOL_PT:
+            return True
+        if sev_age <= 59:
+            return eff_lb - eff(best["strategy"]) > 1e-5
+        return best["strategy"]["totalNet"] - net_ub > 1e-5
+
+    exact: Dict[int, Dict[str, Any]] = {}   # full: candidate index -> {"strategy": totals, "options", "candidate"}
+    option_memo: Dict[int, CandidateOptions] = {}
+
+    def options_of(i, cand):
+        options = option_memo.get(i)
+        if options is None:
+            options = option_memo[i] = candidate_options(input_, cand, cache)
+        return options
+
+    def totals_of(i, cand):
+        res = exact.get(i)
+        if res is None:
+            if _metrics_on:
+                _metric("candidateTotals", pattern)
+            options = options_of(i, cand)
+            totals = _candidate_totals(input_, public_pension_annual, years_of_service, options, pension_tax_memo,
+                                       cache)
+            res = exact[i] = {"strategy": totals, "options": options, "candidate": cand}
+        return res
+
+    def consider(i, cand):
+        # full: bound -> exact totals only (enough for better()/guard()); the winner is materialized at the end.
+        nonlocal n_candidates
+        n_candidates += 1
+        if search != "full":
+            res = evaluate_candidate(input_, public_pension_annual, years_of_service, cand, meta, cache,
+                                     pension_tax_memo)
+            if collect is not None:
+                collect.append((cand, res["strategy"]))
+            update(res)
+            return
+        if collect is None and i not in exact and can_prune(options_of(i, cand)):
+            return
+        res = totals_of(i, cand)
+        if collect is not None:
+            collect.append((cand, res["strategy"]))
+        update(res)
+
+    def warm_start(hinted):
+        # The fold's winner without folding: w = the best hint wins in any candidate order if
+        #  (1) w passes guard() with the final best_net_seen/best_eff_seen (guard only tightens over time), and
+        #  (2) w outranks every candidate able to pass guard() once w is seen (net >= net(w)*(1-NET_TOL),
+        #      eff <= eff(w)+TAX_TOL_PT): such a best is displaced by w, and none of them displaces w.
+        # Bounds settle most candidates; the rest get exact totals. None -> not proven, fold as usual.
+        w = None
+        for i in hinted:
+            res = totals_of(i, cands[i])
+            if w is None or outranks(res, w):
+                w = res
+        wn = w["strategy"]["totalNet"]
+        we = eff(w["strategy"])
+        if wn*(1-NET_TOL) > wn:
+            return None
+        for done, cand in enumerate(cands, 1):
+            if progress is not None:
+                progress(pattern, done, len(cands), None)
+            i = done - 1
+            if cand is w["candidate"]:
+                continue
+            if i not in exact:
+                net_ub, eff_lb = _candidate_bounds(input_, public_pension_annual, options_of(i, cand),
+                                                   pension_tax_memo)
+                if net_ub*(1-NET_TOL) <= wn and eff_lb + TAX_TOL_PT >= we:
+                    if net_ub < wn*(1-NET_TOL) or eff_lb > we + TAX_TOL_PT:
+                        continue
+                    if (eff_lb - we > 1e-5) if sev_age <= 59 else (wn - net_ub > 1e-5):
+                        continue
+            x = totals_of(i, cand)
+            xn = x["strategy"]["totalNet"]
+            xe = eff(x["strategy"])
+            if xn*(1-NET_TOL) > wn or xe + TAX_TOL_PT < we:
+                return None
+            if xn < wn*(1-NET_TOL) or xe > we + TAX_TOL_PT:
+                continue
+            if not outranks(w, x):
+                return None
+        return w
+
+    cands: List[Dict[str, Any]] = []
     if pattern=="A":
         dc_candidates = ([plus20_age] + dc_lump_ages) if can_plus20 else list(dc_lump_ages)
         ideco_candidates = ([plus20_age] + ideco_lump_ages) if can_plus20 else list(ideco_lump_ages)
@@ -450,7 +1253,7 @@ def optimize_strategy(input_: Dict[str, Any], public_pension_annual: Number, yea
             for ideco_age in ideco_candidates:
                 cand={"dcMode":"lump","idecoMode":"lump","dcLumpAge":dc_age,"idecoLumpAge":ideco_age,
                       "dcPensionStartAge":None,"idecoPensionStartAge":None}
-                update(evaluate_candidate(input_, public_pension_annual, years_of_service, cand, meta))
+                cands.append(cand)
     elif pattern=="B":
         dc_candidates = ([plus20_age] + dc_lump_ages) if can_plus20 else list(dc_lump_ages)
         dc_candidates = sorted(set([a for a in dc_candidates if a >= 60]))
@@ -458,7 +1261,7 @@ def optimize_strategy(input_: Dict[str, Any], public_pension_annual: Number, yea
             for ideco_start in pension_start_ages:
                 cand={"dcMode":"lump","idecoMode":"pension","dcLumpAge":dc_age,"idecoLumpAge":None,
                       "dcPensionStartAge":None,"idecoPensionStartAge":ideco_start}
-                update(evaluate_candidate(input_, public_pension_annual, years_of_service, cand, meta))
+                cands.append(cand)
     elif pattern=="C":
         ideco_candidates = ([plus20_age] + ideco_lump_ages) if can_plus20 else list(ideco_lump_ages)
         ideco_candidates = sorted(set([a for a in ideco_candidates if a >= 60]))
@@ -466,39 +1269,78 @@ def optimize_strategy(input_: Dict[str, Any], public_pension_annual: Number, yea
             for ideco_age in ideco_candidates:
                 cand={"dcMode":"pension","idecoMode":"lump","dcLumpAge":None,"idecoLumpAge":ideco_age,
                       "dcPensionStartAge":dc_start,"idecoPensionStartAge":None}
-                update(evaluate_candidate(input_, public_pension_annual, years_of_service, cand, meta))
+                cands.append(cand)
     else:
         for dc_start in pension_start_ages:
             for ideco_start in pension_start_ages:
                 cand={"dcMode":"pension","idecoMode":"pension","dcLumpAge":None,"idecoLumpAge":None,
                       "dcPensionStartAge":dc_start,"idecoPensionStartAge":ideco_start}
-                update(evaluate_candidate(input_, public_pension_annual, years_of_service, cand, meta))
+                cands.append(cand)
 
-    return best["strategy"] if best else {"name":meta["name"],"code":meta["code"],"description":"計算できませんでした",
+    hinted = [i for i, c in enumerate(cands) if c in hints] if (hints and search == "full" and collect is None) else []
+    warm = warm_start(hinted) if hinted else None
+    if warm is not None:
+        best = warm
+        n_candidates = len(cands)
+        n_pruned = n_candidates - len(exact)
+    else:
+        for done, cand in enumerate(cands, 1):
+            consider(done - 1, cand)
+            if progress is not None:
+                progress(pattern, done, len(cands), None)
+        n_pruned = n_candidates - len(exact) if search == "full" else 0
+
+    if search == "full" and best:
+        best = evaluate_candidate(input_, public_pension_annual, years_of_service, best["candidate"], meta, cache,
+                                  pension_tax_memo)
+    search_stats = {"mode": search, "candidates": n_candidates, "evaluated": n_candidates - n_pruned, "pruned": n_pruned}
+    if hinted:
+        search_stats["warmStart"] = warm is not None
+    if _metrics_on:
+        _metric("optimizeStrategySeconds", pattern, time.perf_counter() - started)
+    if best:
+        return dict(best["strategy"], _search=search_stats)
+    return {"name":meta["name"],"code":meta["code"],"description":"計算できませんでした",
                                          "lumpsum":[], "totalGross":0.0,"totalTax":0.0,"totalNet":0.0,
                                          "monthlyIncome60to65Gross":0.0,"monthlyIncome60to65Net":0.0,
                                          "monthlyIncome65plusGross":0.0,"monthlyIncome65plusNet":0.0,
-                                         "_candidate":None}
+                                         "_candidate":None, "_pensionAnnual":None, "pensionTimeline":None,
+                                         "_search":search_stats}
 
-def calculate_strategy_a(input_, public_pension_annual, years_of_service):
+def calculate_strategy_a(input_, public_pension_annual, years_of_service, cache=None, search="standard", collect=None,
+                         progress=None, hints=None):
     meta={"name":"戦略A：一時金集中型","code":"A",
           "describe":lambda c,_: f"退職金は退職時。DCは{c['dcLumpAge']}歳、iDeCoは{c['idecoLumpAge']}歳に一時金受取（19年ルール・年齢優先で最適化）"}
-    return optimize_strategy(input_, public_pension_annual, years_of_service, "A", meta)
+    return optimize_strategy(input_, public_pension_annual, years_of_service, "A", meta, cache, search, collect,
+                             progress, hints)
 
-def calculate_strategy_b(input_, public_pension_annual, years_of_service):
+def calculate_strategy_b(input_, public_pension_annual, years_of_service, cache=None, search="standard", collect=None,
+                         progress=None, hints=None):
     meta={"name":"戦略B：分散型①","code":"B",
           "describe":lambda c,_: f"退職金は退職時。DCは{c['dcLumpAge']}歳に一時金、iDeCoは{c['idecoPensionStartAge']}歳から年金受取（19年ルール・年齢優先で最適化）"}
-    return optimize_strategy(input_, public_pension_annual, years_of_service, "B", meta)
+    return optimize_strategy(input_, public_pension_annual, years_of_service, "B", meta, cache, search, collect,
+                             progress, hints)
 
-def calculate_strategy_c(input_, public_pension_annual, years_of_service):
+def calculate_strategy_c(input_, public_pension_annual, years_of_service, cache=None, search="standard", collect=None,
+                         progress=None, hints=None):
     meta={"name":"戦略C：分散型②","code":"C",
           "describe":lambda c,_: f"退職金は退職時。DCは{c['dcPensionStartAge']}歳から年金、iDeCoは{c['idecoLumpAge']}歳に一時金受取（19年ルール・年齢優先で最適化）"}
-    return optimize_strategy(input_, public_pension_annual, years_of_service, "C", meta)
+    return optimize_strategy(input_, public_pension_annual, years_of_service, "C", meta, cache, search, collect,
+                             progress, hints)
 
-def calculate_strategy_d(input_, public_pension_annual, years_of_service):
+def calculate_strategy_d(input_, public_pension_annual, years_of_service, cache=None, search="standard", collect=None,
+                         progress=None, hints=None):
     meta={"name":"戦略D：年金集中型","code":"D",
           "describe":lambda c,_: f"退職金は退職時。DCは{c['dcPensionStartAge']}歳から、iDeCoは{c['idecoPensionStartAge']}歳から年金受取（年齢優先で最適化）"}
-    return optimize_strategy(input_, public_pension_annual, years_of_service, "D", meta)
+    return optimize_strategy(input_, public_pension_annual, years_of_service, "D", meta, cache, search, collect,
+                             progress, hints)
+
+def hints_from_result(result: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # warm-start hints for calculate_all/optimize_strategy: each strategy's winning _candidate of a previous result
+    # (optimize_strategy only uses the ones on its own grid)
+    if not result:
+        return []
+    return [s["_candidate"] for s in result.get("strategies") or [] if s.get("_candidate")]
 
 def pick_best_strategy(strategies: List[Dict[str, Any]]) -> Dict[str, Any]:
     best = strategies[0]
@@ -514,50 +1356,72 @@ def pick_best_strategy(strategies: List[Dict[str, Any]]) -> Dict[str, Any]:
     return best
 
 def build_pension_component_monthly(candidate: Dict[str, Any], input_: Dict[str, Any], public_pension_annual: float,
-                                   start_age: int, end_age: int) -> Dict[str, float]:
-    s = max(0, int(start_age))
-    e = max(s, min(int(end_age), int(input_["endAge"])))
-    years = e - s
-    if years <= 0:
+                                   start_age: int, end_age: int, cache: Optional[CalcCache] = None,
+                                   pension_annual: Optional[Dict[str, float]] = None,
+                                   cashflow: Optional[PensionCashflow] = None) -> Dict[str, float]:
+    # cashflow: the candidate's PensionCashflow (e.g. PensionCashflow.from_timeline(strategy["pensionTimeline"])).
+    # pension_annual: strategy["_pensionAnnual"] of the same candidate; reused instead of recomputing the annuities.
+    if cashflow is not None:
+        return cashflow.components(start_age, end_age)
+    if int(end_age) <= int(start_age):
         return {"years": 0, "publicM": 0.0, "dcM": 0.0, "idecoM": 0.0, "totalM": 0.0}
+    input_ = SimulationInput.coerce(input_)
 
     dc_annual = 0.0
-    if candidate.get("dcMode") == "pension":
-        bal = calculate_future_value(input_["dcCurrentBalance"], input_["dcMonthlyContribution"], input_["dcReturnRate"],
-                                     int(input_["currentAge"]), int(candidate["dcPensionStartAge"]), int(input_["dcEndAge"]))
-        yrs = max(1, int(input_["endAge"]) - int(candidate["dcPensionStartAge"]))
-        dc_annual = calculate_pmt(bal, input_["dcReturnRate"], yrs)
+    if candidate.get("dcMode") == "pension" and pension_annual is not None:
+        dc_annual = safe_number(pension_annual.get("dc"), 0.0)
+    elif candidate.get("dcMode") == "pension":
+        bal = _future_value(cache, input_.dcCurrentBalance, input_.dcMonthlyContribution, input_.dcReturnRate,
+                            input_.currentAge, int(candidate["dcPensionStartAge"]), input_.dcEndAge)
+        yrs = max(1, input_.endAge - int(candidate["dcPensionStartAge"]))
+        dc_annual = _pmt(cache, bal, input_.dcReturnRate, yrs)
 
     ideco_annual = 0.0
-    if candidate.get("idecoMode") == "pension":
-        bal = calculate_future_value(input_["idecoCurrentBalance"], input_["idecoMonthlyContribution"], input_["idecoReturnRate"],
-                                     int(input_["currentAge"]), int(candidate["idecoPensionStartAge"]), int(input_["idecoEndAge"]))
-        yrs = max(1, int(input_["endAge"]) - int(candidate["idecoPensionStartAge"]))
-        ideco_annual = calculate_pmt(bal, input_["idecoReturnRate"], yrs)
-
-    public_sum = 0.0; dc_sum = 0.0; ideco_sum = 0.0
-    for age in range(s, e):
-        if age >= 65:
-            public_sum += public_pension_annual
-        if candidate.get("dcMode") == "pension" and age >= int(candidate["dcPensionStartAge"]):
-            dc_sum += dc_annual
-        if candidate.get("idecoMode") == "pension" and age >= int(candidate["idecoPensionStartAge"]):
-            ideco_sum += ideco_annual
-
-    public_m = public_sum / (years*12)
-    dc_m = dc_sum / (years*12)
-    ideco_m = ideco_sum / (years*12)
-    total_m = (public_sum+dc_sum+ideco_sum) / (years*12)
-    return {"years": years, "publicM": public_m, "dcM": dc_m, "idecoM": ideco_m, "totalM": total_m}
-
-def calculate_all(input_: Dict[str, Any]) -> Dict[str, Any]:
-    years_of_service = int(input_["serviceYears"])
-    public_pension_annual = calculate_public_pension(input_["avgSalary"], years_of_service, bool(input_["pensionExemption"]), int(input_["retirementAge"]))
-    strategies = [
-        calculate_strategy_a(input_, public_pension_annual, years_of_service),
-        calculate_strategy_b(input_, public_pension_annual, years_of_service),
-        calculate_strategy_c(input_, public_pension_annual, years_of_service),
-        calculate_strategy_d(input_, public_pension_annual, years_of_service),
-    ]
+    if candidate.get("idecoMode") == "pension" and pension_annual is not None:
+        ideco_annual = safe_number(pension_annual.get("ideco"), 0.0)
+    elif candidate.get("idecoMode") == "pension":
+        bal = _future_value(cache, input_.idecoCurrentBalance, input_.idecoMonthlyContribution, input_.idecoReturnRate,
+                            input_.currentAge, int(candidate["idecoPensionStartAge"]), input_.idecoEndAge)
+        yrs = max(1, input_.endAge - int(candidate["idecoPensionStartAge"]))
+        ideco_annual = _pmt(cache, bal, input_.idecoReturnRate, yrs)
+
+    options = {
+        "dcMode": candidate.get("dcMode"), "idecoMode": candidate.get("idecoMode"),
+        "dcPensionStartAge": candidate.get("dcPensionStartAge"), "idecoPensionStartAge": candidate.get("idecoPensionStartAge"),
+        "dcPensionAnnual": dc_annual, "idecoPensionAnnual": ideco_annual,
+    }
+    return build_pension_cashflow(input_, public_pension_annual, options, PensionTaxMemo()).components(start_age, end_age)
+
+def calculate_all(input_: Dict[str, Any], cache: Optional[CalcCache] = None, search: str = "standard",
+                  metrics: bool = False, public_pension_annual: Optional[Number] = None,
+                  progress: Optional[Progress] = None,
+                  hints: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    # cache: None -> per-calculation CalcCache; pass get_shared_calc_cache() to share across calls.
+    # search: "standard" (JS v4.4 candidates) / "full" (every age, see optimize_strategy).
+    # metrics: add a "metrics" block (call counts, months iterated, seconds per pattern; see Metrics).
+    # public_pension_annual: calculate_public_pension() result for this input if already known (e.g. sweeps).
+    # progress: see optimize_strategy; also called as progress(code, total, total, strategy) when a strategy is done.
+    # hints: warm-start candidates (hints_from_result(previous result)); same result, less of the full grid evaluated.
+    if metrics:
+        with collect_metrics() as m:
+            result = calculate_all(input_, cache, search, public_pension_annual=public_pension_annual,
+                                   progress=progress, hints=hints)
+        result["metrics"] = m.snapshot()
+        return result
+    if cache is None:
+        cache = CalcCache()
+    # parsed once here; every core function below works on the record
+    record = SimulationInput.coerce(input_)
+    years_of_service = record.serviceYears
+    if public_pension_annual is None:
+        public_pension_annual = calculate_public_pension(record.avgSalary, years_of_service, record.pensionExemption, record.retirementAge)
+    strategies = []
+    for fn in (calculate_strategy_a, calculate_strategy_b, calculate_strategy_c, calculate_strategy_d):
+        strategy = fn(record, public_pension_annual, years_of_service, cache, search, None, progress, hints)
+        strategies.append(strategy)
+        if progress is not None:
+            n = strategy["_search"]["candidates"]
+            progress(strategy["code"], n, n, strategy)
     best = pick_best_strategy(strategies)
-    return {"input": input_, "publicPensionAnnual": public_pension_annual, "strategies": strategies, "best": best}
+    return {"input": input_.to_dict() if isinstance(input_, SimulationInput) else input_, "publicPensionAnnual": public_pension_annual, "strategies": strategies, "best": best,
+            "cacheStats": cache.stats()}
@@ -1,6 +1,7 @@
 # export_pdf.py
 from __future__ import annotations
-from typing import Any, Dict, List
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
 import io
 
 from reportlab.lib.pagesizes import A4
@@ -12,7 +13,10 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfbase.cidfonts import UnicodeCIDFont
 
-def _register_japanese_font() -> str:
+@lru_cache(maxsize=1)
+def register_japanese_font() -> str:
+    # reportlab のフォント登録はプロセス単位なので1回で十分（TTFの読み込みが重い）。
+    # 一括出力のワーカー起動時にも呼んで先に済ませる（batch_pdf）
     try:
         pdfmetrics.registerFont(TTFont("NotoSansJP", "assets/fonts/NotoSansJP-Regular.ttf"))
         return "NotoSansJP"
@@ -24,7 +28,11 @@ def _register_japanese_font() -> str:
             return "Helvetica"
 
 def make_pdf_bytes(input_: Dict[str, Any], strategies: List[Dict[str, Any]], best: Dict[str, Any]) -> bytes:
-    font_name = _register_japanese_font()
+    return render_pdf(input_, strategies, best)[0]
+
+def render_pdf(input_: Dict[str, Any], strategies: List[Dict[str, Any]], best: Dict[str, Any]) -> Tuple[bytes, int]:
+    # -> (PDF bytes, page count)
+    font_name = register_japanese_font()
     buf = io.BytesIO()
     c = canvas.Canvas(buf, pagesize=A4)
     w, h = A4
@@ -147,5 +155,6 @@ def make_pdf_bytes(input_: Dict[str, Any], strategies: List[Dict[str, Any]], bes
         y = draw_row(y, r, header=False)
 
     c.showPage()
+    pages = c.getPageNumber() - 1
     c.save()
-    return buf.getvalue()
+    return buf.getvalue(), pages
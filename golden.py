@@ -0,0 +1,383 @@
+# golden.py
+# Golden-corpus equivalence checks: freeze calculate_all outputs over a sampled input domain, then diff
+# alternative engines (caches, closed-form future values, NumPy batch, unpruned full search) against them.
+#
+#   python golden.py generate -n 2000 --seed 1 -o golden.jsonl.gz --workers 8
+#   python golden.py check golden.jsonl.gz --engine closed-form --workers 8
+#   python golden.py check golden.jsonl.gz --engine full-unpruned --search full --tol totalNet=0:1e-6
+#   python golden.py check golden.jsonl.gz --engine warm-start --search full
+#
+# - Cases are sampled across the validate_input domain (ages 20-75, retirement/severance ages at the
+#   limits, zero balances/contributions/rates, exemption, endAge 61-100, serviceYears 0).
+# - Each case stores fingerprint() of the result per search mode: best code, public pension, and per
+#   strategy the totals, monthly incomes and _candidate (modes and ages); or {"error": <exception type>}
+#   where calculate_all raises (e.g. serviceYears=0 -> IndexError in the retirement deduction).
+# - Fields an engine does not produce (e.g. monthly incomes from batch.calculate_all_batch) are not compared.
+# - Numbers are compared with per-field (abs, rel) tolerances (math.isclose); everything else must be equal.
+# - On mismatches the simplest failing input is shrunk (numbers toward 0 / rounder values while the engine
+#   still disagrees with calculate_all) and printed.
+
+from __future__ import annotations
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import argparse
+import gzip
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import core
+from batch_cli import chunks
+from validations import validate_input
+
+STRATEGY_CODES = ("A", "B", "C", "D")
+CANDIDATE_KEYS = ("dcMode", "idecoMode", "dcLumpAge", "idecoLumpAge", "dcPensionStartAge", "idecoPensionStartAge")
+AMOUNT_KEYS = ("totalGross", "totalTax", "totalNet", "monthlyIncome60to65Gross", "monthlyIncome60to65Net",
+               "monthlyIncome65plusGross", "monthlyIncome65plusNet")
+
+Fingerprint = Dict[str, Any]
+Tolerance = Dict[str, Tuple[float, float]]  # field suffix (after the last ".") -> (abs_tol, rel_tol)
+
+
+def sample_input(rnd: random.Random) -> Dict[str, Any]:
+    cur = rnd.randint(20, 75)
+    ret = rnd.choice([cur, rnd.randint(cur, 75), 60, 65]) if cur <= 60 else rnd.randint(cur, 75)
+    ret = max(ret, cur)
+    join = rnd.choice([ret, rnd.randint(15, ret), rnd.randint(18, min(ret, 30))])
+    sev = rnd.choice([min(ret, 60), ret, rnd.randint(cur, ret)])
+    cont = rnd.random() < 0.25
+    money = lambda hi: rnd.choice([0.0, round(rnd.uniform(0, hi)), round(rnd.uniform(0, hi), 1)])
+    return {
+        "currentAge": cur, "retirementAge": ret, "joinAge": join, "severanceReceiveAge": max(cur, min(sev, ret)),
+        "severancePay": money(5000), "dcCurrentBalance": money(5000),
+        "dcMonthlyContribution": rnd.choice([0.0, 0.5, 1.0, 2.0, 2.75, 5.5]),
+        "dcReturnRate": rnd.choice([0.0, 0.01, 0.02, 0.03, 0.05, round(rnd.uniform(0, 0.08), 3)]),
+        "idecoStartAge": rnd.randint(min(20, cur), cur), "idecoCurrentBalance": money(1500),
+        "idecoMonthlyContribution": rnd.choice([0.0, 0.5, 1.2, 2.0, 2.3, 6.8]),
+        "idecoReturnRate": rnd.choice([0.0, 0.01, 0.03, 0.05, round(rnd.uniform(0, 0.08), 3)]),
+        "avgSalary": rnd.choice([rnd.randint(9, 65), round(rnd.uniform(9, 65), 1)]),
+        "pensionExemption": rnd.random() < 0.15, "idecoContinueContribution": cont,
+        "endAge": 90 if rnd.random() < 0.8 else rnd.randint(61, 100),
+    }
+
+
+def sample_corpus(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    # n inputs accepted by validate_input (with its derived fields filled in), deterministic per seed
+    rnd = random.Random(seed)
+    out: List[Dict[str, Any]] = []
+    while len(out) < n:
+        inp = sample_input(rnd)
+        if inp["pensionExemption"]:
+            inp["idecoContinueContribution"] = False
+        if not validate_input(inp):
+            out.append(inp)
+    return out
+
+
+def fingerprint(result: Dict[str, Any]) -> Fingerprint:
+    fp: Fingerprint = {"best": result["best"]["code"], "bestNet": result["best"]["totalNet"],
+                       "bestTax": result["best"]["totalTax"], "publicPensionAnnual": result["publicPensionAnnual"]}
+    for s in result["strategies"]:
+        for k in AMOUNT_KEYS:
+            fp[f"{s['code']}.{k}"] = s[k]
+        cand = s.get("_candidate") or {}
+        for k in CANDIDATE_KEYS:
+            fp[f"{s['code']}.{k}"] = cand.get(k)
+    return fp
+
+
+def _guarded(fn: Callable[[], Fingerprint]) -> Fingerprint:
+    try:
+        return fn()
+    except Exception as e:
+        return {"error": type(e).__name__}
+
+
+# ---- engines: (inputs, search) -> fingerprints ----
+
+def _engine_reference(inputs: List[Dict[str, Any]], search: str) -> List[Fingerprint]:
+    return [_guarded(lambda i=inp: fingerprint(core.calculate_all(dict(i), search=search))) for inp in inputs]
+
+
+def _engine_shared_cache(inputs: List[Dict[str, Any]], search: str) -> List[Fingerprint]:
+    cache = core.CalcCache(maxsize=8192)
+    return [_guarded(lambda i=inp: fingerprint(core.calculate_all(dict(i), cache, search))) for inp in inputs]
+
+
+def _engine_closed_form(inputs: List[Dict[str, Any]], search: str) -> List[Fingerprint]:
+    previous = core.get_future_value_engine()
+    core.set_future_value_engine("closed_form")
+    try:
+        return _engine_reference(inputs, search)
+    finally:
+        core.set_future_value_engine(previous)
+
+
+def _calculate_unpruned(inp: Dict[str, Any]) -> Dict[str, Any]:
+    # calculate_all(search="full") with branch-and-bound off (collect= makes optimize_strategy visit every candidate)
+    rec = core.SimulationInput.coerce(inp)
+    ppa = core.calculate_public_pension(rec.avgSalary, rec.serviceYears, rec.pensionExemption, rec.retirementAge)
+    cache = core.CalcCache()
+    strategies = [fn(rec, ppa, rec.serviceYears, cache, "full", []) for fn in
+                  (core.calculate_strategy_a, core.calculate_strategy_b, core.calculate_strategy_c, core.calculate_strategy_d)]
+    return {"publicPensionAnnual": ppa, "strategies": strategies, "best": core.pick_best_strategy(strategies)}
+
+
+def _engine_full_unpruned(inputs: List[Dict[str, Any]], search: str) -> List[Fingerprint]:
+    return [_guarded(lambda i=inp: fingerprint(_calculate_unpruned(dict(i)))) for inp in inputs]
+
+
+def _warm_started(inp: Dict[str, Any], search: str) -> Dict[str, Any]:
+    # calculate_all with the winners of a neighbouring input (avgSalary/severancePay nudged) as warm-start hints
+    previous = dict(inp, avgSalary=inp["avgSalary"] + 1, severancePay=inp["severancePay"] * 1.02)
+    try:
+        hints = core.hints_from_result(core.calculate_all(previous, search=search))
+    except Exception:
+        hints = []
+    return core.calculate_all(dict(inp), search=search, hints=hints)
+
+
+def _engine_warm_start(inputs: List[Dict[str, Any]], search: str) -> List[Fingerprint]:
+    return [_guarded(lambda i=inp: fingerprint(_warm_started(i, search))) for inp in inputs]
+
+
+def _engine_vectorized(inputs: List[Dict[str, Any]], search: str) -> List[Fingerprint]:
+    # batch.calculate_all_batch: totals, candidate ages, public pension and the best strategy's totals.
+    # The best code is left out (batch may pick a different one among strategies tied within its tolerance)
+    # and cases where calculate_all raises are reported as such (batch counts empty periods as 0 years).
+    from batch import NO_AGE, calculate_all_batch, records_to_columns
+    ref = _engine_reference(inputs, search)
+    ok = [k for k, fp in enumerate(ref) if "error" not in fp]
+    out = calculate_all_batch(records_to_columns([inputs[k] for k in ok]))
+    fps: List[Fingerprint] = list(ref)
+    for row, k in enumerate(ok):
+        best = int(out["bestIndex"][row])
+        fp: Fingerprint = {"bestNet": float(out["totalNet"][row, best]), "bestTax": float(out["totalTax"][row, best]),
+                           "publicPensionAnnual": float(out["publicPensionAnnual"][row])}
+        for j, code in enumerate(STRATEGY_CODES):
+            for key in ("totalGross", "totalTax", "totalNet"):
+                fp[f"{code}.{key}"] = float(out[key][row, j])
+            for key in ("dcLumpAge", "idecoLumpAge", "dcPensionStartAge", "idecoPensionStartAge"):
+                age = int(out[key][row, j])
+                fp[f"{code}.{key}"] = None if age == NO_AGE else age
+        fps[k] = fp
+    return fps
+
+
+EXACT: Tolerance = {}
+CLOSE: Tolerance = {k: (1e-6, 1e-9) for k in AMOUNT_KEYS + ("bestNet", "bestTax", "publicPensionAnnual")}
+
+# name -> (engine, search modes it can be checked in, default tolerance)
+ENGINES: Dict[str, Tuple[Callable[[List[Dict[str, Any]], str], List[Fingerprint]], Tuple[str, ...], Tolerance]] = {
+    "reference": (_engine_reference, core.SEARCH_MODES, EXACT),
+    "shared-cache": (_engine_shared_cache, core.SEARCH_MODES, EXACT),
+    "closed-form": (_engine_closed_form, core.SEARCH_MODES, CLOSE),
+    "full-unpruned": (_engine_full_unpruned, ("full",), EXACT),
+    "warm-start": (_engine_warm_start, ("full",), EXACT),
+    "vectorized": (_engine_vectorized, ("standard",), CLOSE),
+}
+
+
+def diff(expected: Fingerprint, actual: Fingerprint, tol: Tolerance) -> List[Dict[str, Any]]:
+    # -> [{"field", "expected", "actual"}] for every field of expected that actual has and that differs
+    out = []
+    for field, exp in expected.items():
+        if field not in actual:
+            continue
+        act = actual[field]
+        abs_tol, rel_tol = tol.get(field.rsplit(".", 1)[-1], (0.0, 0.0))
+        if isinstance(exp, float) and isinstance(act, (int, float)) and not isinstance(act, bool):
+            same = math.isclose(exp, act, rel_tol=rel_tol, abs_tol=abs_tol) or (math.isnan(exp) and math.isnan(act))
+        else:
+            same = exp == act
+        if not same:
+            out.append({"field": field, "expected": exp, "actual": act})
+    if "error" in actual and "error" not in expected:
+        out.append({"field": "error", "expected": None, "actual": actual["error"]})
+    return out
+
+
+# ---- golden files (gzip when the name ends with .gz) ----
+
+def _open(path: str, mode: str):
+    return gzip.open(path, mode + "t", encoding="utf-8") if path.endswith(".gz") else open(path, mode, encoding="utf-8")
+
+
+def read_golden(path: str) -> Iterator[Dict[str, Any]]:
+    with _open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _freeze_chunk(args) -> List[Dict[str, Any]]:
+    cases, searches = args
+    return [dict(case, **{s: fp for s, fp in zip(searches, [_engine_reference([case["input"]], s)[0] for s in searches])})
+            for case in cases]
+
+
+def _map(fn: Callable[[Any], Any], jobs: Iterable[Any], workers: int) -> Iterator[Any]:
+    if workers <= 1:
+        return map(fn, jobs)
+    pool = ProcessPoolExecutor(max_workers=workers)
+
+    def results():
+        with pool:
+            yield from pool.map(fn, jobs)
+    return results()
+
+
+def generate(path: str, n: int, seed: int = 0, searches: Sequence[str] = core.SEARCH_MODES, workers: int = 0,
+             chunk_size: int = 50) -> int:
+    # writes n cases {"id", "input", <search>: fingerprint} and returns n
+    cases = ({"id": k, "input": inp} for k, inp in enumerate(sample_corpus(n, seed)))
+    jobs = ((chunk, tuple(searches)) for chunk in chunks(cases, chunk_size))
+    written = 0
+    with _open(path, "w") as f:
+        for chunk in _map(_freeze_chunk, jobs, workers):
+            for case in chunk:
+                f.write(json.dumps(case, ensure_ascii=False) + "\n")
+                written += 1
+    return written
+
+
+def _check_chunk(args) -> Tuple[int, List[Dict[str, Any]]]:
+    cases, engine, search, tol = args
+    fn = ENGINES[engine][0]
+    actual = fn([c["input"] for c in cases], search)
+    bad = []
+    for case, fp in zip(cases, actual):
+        d = diff(case[search], fp, tol)
+        if d:
+            bad.append({"id": case["id"], "input": case["input"], "diffs": d})
+    return len(cases), bad
+
+
+def check(path: str, engine: str, search: str = "standard", tol: Optional[Tolerance] = None, workers: int = 0,
+          chunk_size: int = 50, limit: Optional[int] = None) -> Dict[str, Any]:
+    # -> {"engine", "search", "cases", "mismatches": [{"id", "input", "diffs"}], "seconds"}
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine: {engine}")
+    if search not in ENGINES[engine][1]:
+        raise ValueError(f"engine {engine} cannot be checked with search={search}")
+    started = time.perf_counter()
+    tolerance = dict(ENGINES[engine][2], **(tol or {}))
+    cases = (c for c in read_golden(path) if search in c)
+    if limit is not None:
+        cases = itertools.islice(cases, limit)
+    jobs = ((chunk, engine, search, tolerance) for chunk in chunks(cases, chunk_size))
+    n = 0
+    mismatches: List[Dict[str, Any]] = []
+    for count, bad in _map(_check_chunk, jobs, workers):
+        n += count
+        mismatches.extend(bad)
+    return {"engine": engine, "search": search, "cases": n, "mismatches": mismatches,
+            "seconds": time.perf_counter() - started}
+
+
+def _simpler_values(key: str, value: Any) -> List[Any]:
+    if isinstance(value, bool):
+        return [False] if value else []
+    if isinstance(value, float):
+        cands = [0.0, float(round(value)), float(round(value, -1)), round(value / 2, 3)]
+        if key.endswith("Rate"):
+            cands = [0.0, round(value, 2)]
+        return [c for c in dict.fromkeys(cands) if c != value]
+    return []
+
+
+def shrink(inp: Dict[str, Any], engine: str, search: str, tol: Optional[Tolerance] = None,
+           max_rounds: int = 3) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    # greedily simplify the numbers/flags of a failing input while the engine still disagrees with calculate_all
+    fn = ENGINES[engine][0]
+    tolerance = dict(ENGINES[engine][2], **(tol or {}))
+
+    def failing(candidate: Dict[str, Any]) -> List[Dict[str, Any]]:
+        trial = dict(candidate)
+        if validate_input(trial):
+            return []
+        return diff(_engine_reference([trial], search)[0], fn([trial], search)[0], tolerance)
+
+    current = dict(inp)
+    diffs = failing(current)
+    if not diffs:
+        return current, diffs
+    for _ in range(max_rounds):
+        changed = False
+        for key in sorted(current):
+            for value in _simpler_values(key, current[key]):
+                d = failing(dict(current, **{key: value}))
+                if d:
+                    current[key], diffs, changed = value, d, True
+                    break
+        if not changed:
+            break
+    return current, diffs
+
+
+def _complexity(inp: Dict[str, Any]) -> Tuple[int, float]:
+    nums = [abs(float(v)) for v in inp.values() if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    return sum(1 for v in nums if v != 0), sum(nums)
+
+
+def _parse_tol(items: Optional[List[str]]) -> Tolerance:
+    # "totalNet=1e-6:1e-9" -> {"totalNet": (abs, rel)}
+    tol: Tolerance = {}
+    for item in items or []:
+        field, _, spec = item.partition("=")
+        abs_tol, _, rel_tol = spec.partition(":")
+        tol[field.strip()] = (float(abs_tol or 0), float(rel_tol or 0))
+    return tol
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="calculate_all の golden corpus 作成・別エンジンとの一致確認")
+    sub = p.add_subparsers(dest="command", required=True)
+    g = sub.add_parser("generate", help="入力を生成して現在の calculate_all の結果を保存")
+    g.add_argument("-o", "--output", required=True, help="出力先（.jsonl / .jsonl.gz）")
+    g.add_argument("-n", type=int, default=2000)
+    g.add_argument("--seed", type=int, default=0)
+    g.add_argument("--search", default=",".join(core.SEARCH_MODES), help="保存する探索モード（カンマ区切り）")
+    g.add_argument("--workers", type=int, default=0)
+    c = sub.add_parser("check", help="golden corpus とエンジンの結果を比較（不一致があれば終了コード1）")
+    c.add_argument("golden")
+    c.add_argument("--engine", choices=sorted(ENGINES), default="reference")
+    c.add_argument("--search", choices=core.SEARCH_MODES, default="standard")
+    c.add_argument("--tol", action="append", help="項目ごとの許容誤差 field=abs:rel（例：totalNet=1e-6:1e-9）")
+    c.add_argument("--limit", type=int, default=None, help="先頭N件のみ")
+    c.add_argument("--workers", type=int, default=0)
+    c.add_argument("--no-shrink", action="store_true", help="不一致入力の最小化をしない")
+    args = p.parse_args(argv)
+
+    if args.command == "generate":
+        searches = [s.strip() for s in args.search.split(",") if s.strip()]
+        n = generate(args.output, args.n, args.seed, searches, args.workers)
+        print(f"{n} cases -> {args.output}", file=sys.stderr)
+        return 0
+
+    tol = _parse_tol(args.tol)
+    report = check(args.golden, args.engine, args.search, tol, args.workers, limit=args.limit)
+    bad = report["mismatches"]
+    print(f"{args.engine} [{args.search}]: {report['cases']} cases, {len(bad)} mismatches ({report['seconds']:.1f}s)")
+    if not bad:
+        return 0
+    fields: Dict[str, int] = {}
+    for m in bad:
+        for d in m["diffs"]:
+            fields[d["field"]] = fields.get(d["field"], 0) + 1
+    print("fields: " + ", ".join(f"{k} x{v}" for k, v in sorted(fields.items(), key=lambda kv: -kv[1])[:10]))
+    simplest = min(bad, key=lambda m: _complexity(m["input"]))
+    inp, diffs = (simplest["input"], simplest["diffs"]) if args.no_shrink else \
+        shrink(simplest["input"], args.engine, args.search, tol)
+    print(f"minimal failing input (case {simplest['id']}):")
+    print(json.dumps(inp, ensure_ascii=False, sort_keys=True))
+    for d in (diffs or simplest["diffs"])[:10]:
+        print(f"  {d['field']}: expected {d['expected']!r}, got {d['actual']!r}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+# incremental.py
+# Incremental recalculation of calculate_all between consecutive inputs of one session.
+#
+# - DEPENDENCIES records which input fields (and upstream nodes) every intermediate depends on;
+#   invalidated(changed) walks it in topological order, so e.g. avgSalary only dirties
+#   publicPension -> pensionTotals -> strategies -> best, and idecoReturnRate leaves the severance /
+#   DC future values and the lump-sum deductions of DC-only events untouched.
+# - Node values live in one CalcCache owned by the calculator (future values / annuities, retirement
+#   taxes per lump event, pension cashflows per annuity set), keyed on every number they are computed from:
+#   a stale entry is never hit again, so invalidation needs no purge and the LRU drops it eventually.
+#   publicPension is kept as a value and passed back to calculate_all when it is still valid.
+# - strategies/best are reused as a whole only when nothing they depend on changed (e.g. a field that
+#   is only read by validate_input); otherwise the search reruns against the warm node stores, with the
+#   previous winners as warm-start hints (core.hints_from_result; full search).
+# - Results are bit-identical to calculate_all: every reused value comes from the same function with
+#   the same arguments.
+# - result_cache (a result_cache.ResultCache) is looked up first; a hit becomes the new baseline (adopt()),
+#   so the next diff is taken against the input actually shown. The stored payload leaves out the
+#   session-specific "incremental" / "cacheStats" blocks (result_cache.TRANSIENT_KEYS).
+
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Optional, Set
+import threading
+import time
+
+from core import (CalcCache, Progress, SimulationInput, calculate_all, calculate_public_pension,
+                  get_future_value_engine, hints_from_result)
+
+# node -> input fields / upstream nodes it is computed from (insertion order is topological)
+DEPENDENCIES: Dict[str, tuple] = {
+    "publicPension": ("avgSalary", "serviceYears", "pensionExemption", "retirementAge"),
+    "candidateAges": ("severanceReceiveAge", "endAge"),
+    "dcFutureValue": ("dcCurrentBalance", "dcMonthlyContribution", "dcReturnRate", "currentAge", "dcEndAge",
+                      "candidateAges"),
+    "idecoFutureValue": ("idecoCurrentBalance", "idecoMonthlyContribution", "idecoReturnRate", "currentAge",
+                         "idecoEndAge", "candidateAges"),
+    "annuities": ("dcFutureValue", "idecoFutureValue", "dcReturnRate", "idecoReturnRate", "endAge"),
+    "lumpEvents": ("severancePay", "severanceReceiveAge", "serviceYears", "dcStartAge", "dcEndAge", "idecoStartAge",
+                   "idecoEndAge", "dcFutureValue", "idecoFutureValue"),
+    "deductions": ("lumpEvents",),
+    "pensionTotals": ("publicPension", "annuities", "endAge"),
+    "strategies": ("candidateAges", "deductions", "pensionTotals"),
+    "best": ("strategies",),
+}
+NODES = tuple(DEPENDENCIES)
+
+
+def changed_fields(previous: Any, current: Any) -> List[str]:
+    # SimulationInput fields whose parsed values differ (derived fields such as serviceYears included)
+    a, b = SimulationInput.coerce(previous), SimulationInput.coerce(current)
+    return [k for k in SimulationInput.FIELDS if a[k] != b[k]]
+
+
+def invalidated(changed: Iterable[str]) -> List[str]:
+    # nodes to recompute after `changed` input fields, in topological order
+    dirty: Set[str] = set(changed)
+    out: List[str] = []
+    for node, deps in DEPENDENCIES.items():
+        if any(d in dirty for d in deps):
+            dirty.add(node)
+            out.append(node)
+    return out
+
+
+class IncrementalCalculator:
+    # One per session (e.g. st.session_state): calculate_all(input_) recomputes only what the fields
+    # changed since the previous call invalidate, and adds result["incremental"]:
+    # {changed, recomputed, reused, lookups (node-store hits/misses of this call), seconds}.
+    # A different search mode or future value engine starts over. Calls are serialized (one CalcCache).
+    def __init__(self, maxsize: int = 8192, result_cache: Any = None):
+        self.cache = CalcCache(maxsize=maxsize)
+        self.result_cache = result_cache
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.cache.clear()
+        self.record: Optional[SimulationInput] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.public_pension_annual: Optional[float] = None
+        self._options: Optional[tuple] = None
+
+    def calculate_all(self, input_: Dict[str, Any], search: str = "standard", changed: Optional[Iterable[str]] = None,
+                      progress: Optional[Progress] = None) -> Dict[str, Any]:
+        # changed: fields known to have changed (added to the ones found by comparing with the previous input)
+        if self.result_cache is None:
+            return self._calculate(input_, search, changed, progress)
+        computed = []
+
+        def compute():
+            computed.append(True)
+            return self._calculate(input_, search, changed, progress)
+
+        result = self.result_cache.get_or_compute(input_, compute, search=search, engine=get_future_value_engine())
+        if not computed:
+            self.adopt(input_, result, search)
+        return result
+
+    def adopt(self, input_: Dict[str, Any], result: Dict[str, Any], search: str = "standard") -> None:
+        # take a result computed elsewhere (result cache hit) as the baseline of the next call
+        with self._lock:
+            record = SimulationInput.coerce(input_)
+            options = (search, get_future_value_engine())
+            if self._options != options:
+                self.reset()
+            fields = changed_fields(self.record, record) if self.record is not None else list(SimulationInput.FIELDS)
+            result["incremental"] = {"changed": fields, "recomputed": [], "reused": list(NODES), "lookups": {},
+                                     "seconds": 0.0, "resultCacheHit": True}
+            self.record, self.result, self._options = record, result, options
+            self.public_pension_annual = result["publicPensionAnnual"]
+
+    def _calculate(self, input_: Dict[str, Any], search: str, changed: Optional[Iterable[str]],
+                   progress: Optional[Progress]) -> Dict[str, Any]:
+        with self._lock:
+            started = time.perf_counter()
+            record = SimulationInput.coerce(input_)
+            options = (search, get_future_value_engine())
+            if self.result is None or self._options != options:
+                self.reset()
+                fields = list(SimulationInput.FIELDS)
+                dirty = list(NODES)
+            else:
+                fields = changed_fields(self.record, record)
+                fields += [k for k in (changed or ()) if k not in fields]
+                dirty = invalidated(fields)
+            before = self.cache.stats()
+            ppa = self.public_pension_annual
+            if "publicPension" in dirty:
+                ppa = calculate_public_pension(record.avgSalary, record.serviceYears, record.pensionExemption,
+                                               record.retirementAge)
+            if "strategies" in dirty:
+                result = calculate_all(input_, self.cache, search, public_pension_annual=ppa, progress=progress,
+                                       hints=hints_from_result(self.result))
+            else:
+                result = dict(self.result, input=input_.to_dict() if isinstance(input_, SimulationInput) else input_)
+                if progress is not None:
+                    for strategy in result["strategies"]:
+                        n = strategy["_search"]["candidates"]
+                        progress(strategy["code"], n, n, strategy)
+            after = self.cache.stats()
+            result["incremental"] = {
+                "changed": fields, "recomputed": dirty, "reused": [n for n in NODES if n not in dirty],
+                "lookups": {
+                    "hits": after["hits"] - before["hits"], "misses": after["misses"] - before["misses"],
+                    "retirementTaxHits": after["retirementTaxHits"] - before["retirementTaxHits"],
+                    "retirementTaxMisses": after["retirementTaxMisses"] - before["retirementTaxMisses"],
+                    "cashflowHits": after["cashflowHits"] - before["cashflowHits"],
+                    "cashflowMisses": after["cashflowMisses"] - before["cashflowMisses"],
+                },
+                "seconds": time.perf_counter() - started,
+            }
+            # committed only after a successful calculation (an exception leaves the previous state)
+            self.record, self.result, self._options, self.public_pension_annual = record, result, options, ppa
+            return result
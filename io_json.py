@@ -2,6 +2,8 @@ from __future__ import annotations
 from typing import Any, Dict
 import json
 
+from core import SimulationInput
+
 APP_VERSION = "v4.4-streamlit-port"
 
 def export_input_json(input_internal: Dict[str, Any]) -> str:
@@ -20,6 +22,33 @@ def _normalize_input(d: Dict[str, Any]) -> Dict[str, Any]:
         d["idecoContinueContribution"] = False
     return d
 
+# 入力項目の型は core.SimulationInput の一覧を正とする
+INT_KEYS = SimulationInput.INT_FIELDS
+FLOAT_KEYS = SimulationInput.FLOAT_FIELDS
+BOOL_KEYS = SimulationInput.BOOL_FIELDS
+
+def coerce_input_types(d: Dict[str, Any]) -> Dict[str, Any]:
+    # CSV等の文字列値をUI（render_input_form）と同じ型に揃える。変換できない値はそのまま残し、validate_inputで検出させる。
+    for k in INT_KEYS:
+        if k in d and isinstance(d[k], str):
+            v = d[k].strip()
+            try:
+                d[k] = 0 if v == "" else int(float(v))
+            except ValueError:
+                pass
+    for k in FLOAT_KEYS:
+        if k in d and isinstance(d[k], str):
+            v = d[k].strip()
+            try:
+                d[k] = 0.0 if v == "" else float(v)
+            except ValueError:
+                pass
+    for k in BOOL_KEYS:
+        if k in d and isinstance(d[k], str):
+            v = d[k].strip().lower()
+            d[k] = (v != "" and v not in ("0", "false", "no", "none"))
+    return d
+
 def import_input_json(raw: str) -> Dict[str, Any]:
     obj = json.loads(raw)
     if isinstance(obj, dict) and "input" in obj and isinstance(obj["input"], dict):
@@ -27,3 +56,25 @@ def import_input_json(raw: str) -> Dict[str, Any]:
     if isinstance(obj, dict):
         return _normalize_input(obj)
     raise ValueError("JSON形式が不正です。")
+
+def normalize_input_dict(d: Dict[str, Any]) -> Dict[str, Any]:
+    # import_input_json の dict 版（CSV行・JSONL行など）。型もUI入力と同じに揃える。
+    if "input" in d and isinstance(d["input"], dict):
+        d = d["input"]
+    return coerce_input_types(_normalize_input(dict(d)))
+
+def canonical_input_json(input_internal: Dict[str, Any]) -> str:
+    # export_input_json と同じ payload（app_version + input）を、キー順・数値型を揃えた1行JSONにする。
+    # 同じ入力なら同じ文字列になるため、結果キャッシュのキーに使う。
+    d = coerce_input_types(dict(input_internal))
+    for k in INT_KEYS:
+        if k in d and isinstance(d[k], (int, float)) and not isinstance(d[k], bool):
+            d[k] = int(d[k])
+    for k in FLOAT_KEYS:
+        if k in d and isinstance(d[k], (int, float)) and not isinstance(d[k], bool):
+            d[k] = float(d[k])
+    for k in BOOL_KEYS:
+        if k in d:
+            d[k] = bool(d[k])
+    payload = json.loads(export_input_json(d))
+    return json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
@@ -0,0 +1,94 @@
+# jobs.py
+# Long calculations off the Streamlit script thread.
+#
+# - CalculationJob runs fn(progress) on a daemon thread; the session keeps the job object in
+#   st.session_state and every rerun only reads snapshot(), so the work is started once per submit.
+# - progress is core.calculate_all's callback: per-candidate counts (pattern, done, total, None) and
+#   each finished strategy (code, total, total, strategy), from which the best-so-far is picked.
+# - cancel() is cooperative: the next progress call raises JobCancelled inside the worker.
+# - A thread rather than a process: progress, cancellation and the partial strategies are shared in memory
+#   without pickling; the pure-Python search yields the GIL regularly, so reruns keep rendering.
+
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional
+import threading
+import time
+
+from core import pick_best_strategy
+
+STAGES = 4  # strategies A-D per calculate_all
+
+RUNNING, DONE, CANCELLED, FAILED = "running", "done", "cancelled", "failed"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class CalculationJob:
+    def __init__(self, fn: Callable[[Callable[..., None]], Any], stages: int = STAGES):
+        self._fn = fn
+        self._stages = max(1, int(stages))
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.status = RUNNING
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.pattern: Optional[str] = None
+        self.done = 0
+        self.total = 0
+        self.finished: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+
+    def start(self) -> "CalculationJob":
+        self._thread = threading.Thread(target=self._run, name="calculation-job", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        try:
+            result = self._fn(self.progress)
+            status, error = DONE, None
+        except JobCancelled:
+            result, status, error = None, CANCELLED, None
+        except Exception as e:  # surfaced in the page instead of killing the thread silently
+            result, status, error = None, FAILED, f"{type(e).__name__}: {e}"
+        with self._lock:
+            self.result, self.status, self.error = result, status, error
+            self.ended = time.perf_counter()
+
+    def progress(self, pattern: str, done: int, total: int, strategy: Optional[Dict[str, Any]] = None) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled()
+        with self._lock:
+            self.pattern, self.done, self.total = pattern, done, total
+            if strategy is not None:
+                self.finished.append(strategy)
+                self.done = self.total = 0  # counted in finished from now on
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self.status == RUNNING
+
+    def snapshot(self) -> Dict[str, Any]:
+        # -> status, fraction (0..1), pattern/done/total of the running strategy, bestSoFar, seconds
+        with self._lock:
+            n_finished = len(self.finished)
+            current = self.done / self.total if self.total else 0.0
+            fraction = 1.0 if self.status == DONE else min(1.0, (n_finished + current) / self._stages)
+            return {
+                "status": self.status, "fraction": fraction, "pattern": self.pattern,
+                "done": self.done, "total": self.total, "cancelRequested": self._cancel.is_set(),
+                "bestSoFar": pick_best_strategy(self.finished) if self.finished else None,
+                "finished": n_finished, "error": self.error,
+                "seconds": (self.ended or time.perf_counter()) - self.started,
+            }
@@ -0,0 +1,287 @@
+# loadtest.py
+# Load generation: replays a corpus of realistic inputs at increasing concurrency and records
+# latency histograms, throughput and CPU/RSS, so runs can be compared for sizing and regressions.
+#
+#   python loadtest.py --target session --concurrency 1,2,4,8 --duration 5 -o load.json
+#   python loadtest.py --target http --url http://127.0.0.1:8765 --concurrency 1,8,32 -o load_api.json
+#   python loadtest.py --compare load_before.json load.json
+#
+# Targets:
+#   core     calculate_all per request, on threads of this process
+#   session  calculate_all + the result page HTML (ui.build_results_html) per request, on threads of
+#            this process: Streamlit runs every session as a thread of one process, so this is what
+#            one `streamlit run app.py` instance has to absorb per submit
+#   http     POST /calculate against api_server.py (asyncio clients); CPU/RSS of the server and each
+#            pool worker come from its /stats
+# Each concurrency level runs for --duration seconds (after --warmup seconds not recorded).
+
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import bisect
+import itertools
+import json
+import platform
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from api_server import percentile, process_usage, request_json
+from core import calculate_all
+from io_json import normalize_input_dict
+from validations import validate_input
+
+# latency histogram bucket upper bounds (ms); the last bucket is open-ended
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def make_corpus(n: int = 200, seed: int = 0) -> List[Dict[str, Any]]:
+    # n validated inputs spread over ages, service years, severance and DC/iDeCo profiles (deterministic per seed)
+    rnd = random.Random(seed)
+    out: List[Dict[str, Any]] = []
+    while len(out) < n:
+        cur = rnd.randint(25, 64)
+        ret = rnd.randint(max(cur, 50), 70)
+        join = rnd.randint(18, min(cur, 35))
+        years = ret - join
+        inp = {
+            "currentAge": cur, "retirementAge": ret, "joinAge": join,
+            "severanceReceiveAge": min(ret, 60) if rnd.random() < 0.8 else rnd.randint(cur, ret),
+            "severancePay": round(years * rnd.uniform(20, 90)),
+            "dcCurrentBalance": round((cur - join) * rnd.uniform(5, 60)),
+            "dcMonthlyContribution": rnd.choice([0.5, 1.0, 2.0, 2.75, 4.0, 5.5]),
+            "dcReturnRate": rnd.choice([0.01, 0.02, 0.03, 0.04, 0.05]),
+            "idecoStartAge": rnd.randint(min(join + 1, cur), cur),
+            "idecoCurrentBalance": round(rnd.uniform(0, 800)),
+            "idecoMonthlyContribution": rnd.choice([0.5, 1.0, 1.2, 2.0, 2.3]),
+            "idecoReturnRate": rnd.choice([0.01, 0.02, 0.03, 0.04, 0.05]),
+            "avgSalary": rnd.randint(25, 65),
+            "pensionExemption": rnd.random() < 0.1,
+            "idecoContinueContribution": rnd.random() < 0.3,
+        }
+        if not validate_input(inp):
+            out.append(inp)
+    return out
+
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    # JSONL of input dicts / export_input_json payloads; invalid rows are skipped
+    corpus = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                inp = normalize_input_dict(json.loads(line))
+                if not validate_input(inp):
+                    corpus.append(inp)
+    return corpus
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    def add(self, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            self.latencies.append(seconds)
+            if not ok:
+                self.errors += 1
+
+    def summary(self, seconds: float, concurrency: int) -> Dict[str, Any]:
+        lat = sorted(self.latencies)
+        hist = [0] * (len(BUCKETS_MS) + 1)
+        for v in lat:
+            hist[bisect.bisect_left(BUCKETS_MS, v * 1000)] += 1
+        return {
+            "concurrency": concurrency, "requests": len(lat), "errors": self.errors, "seconds": seconds,
+            "throughput": len(lat) / seconds if seconds > 0 else 0.0,
+            "latencyMs": {q: percentile(lat, p) * 1000 for q, p in (("p50", 50), ("p90", 90), ("p99", 99))}
+                         | {"max": (lat[-1] * 1000) if lat else 0.0},
+            "histogram": {"bucketsMs": list(BUCKETS_MS), "counts": hist},
+        }
+
+
+def _session_request(inp: Dict[str, Any]) -> None:
+    res = calculate_all(inp)
+    _render(res["strategies"], res["best"], res["input"], res["publicPensionAnnual"])
+
+
+def _render(*args) -> None:
+    import ui  # streamlit is imported lazily: the core target does not need it
+    ui.build_results_html(*args)
+
+
+TARGETS: Dict[str, Callable[[Dict[str, Any]], Any]] = {"core": calculate_all, "session": _session_request}
+
+
+def _usage_delta(before: List[Dict[str, Any]], after: List[Dict[str, Any]], seconds: float) -> List[Dict[str, Any]]:
+    # per process: CPU seconds used during the step, CPU utilisation and RSS at the end
+    prev = {p["pid"]: p for p in before}
+    out = []
+    for p in after:
+        b = prev.get(p["pid"], {})
+        cpu = (p["cpuSeconds"] - b.get("cpuSeconds", 0.0)) if p.get("cpuSeconds") is not None else None
+        out.append({"pid": p["pid"], "role": p.get("role", "process"), "cpuSeconds": cpu,
+                    "cpuUtilization": (cpu / seconds) if (cpu is not None and seconds > 0) else None,
+                    "rssBytes": p.get("rssBytes")})
+    return out
+
+
+def _run_level(fn: Callable[[Dict[str, Any]], Any], corpus: List[Dict[str, Any]], concurrency: int,
+               duration: float, warmup: float) -> Dict[str, Any]:
+    inputs = itertools.cycle(corpus)
+    lock = threading.Lock()
+    rec = Recorder()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+
+    def worker():
+        while True:
+            with lock:
+                inp = next(inputs)
+            t0 = time.perf_counter()
+            if t0 >= deadline:
+                return
+            ok = True
+            try:
+                fn(inp)
+            except Exception:
+                ok = False
+            if t0 >= measure_from:
+                rec.add(time.perf_counter() - t0, ok)
+
+    usage: List[Dict[str, Any]] = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(worker) for _ in range(concurrency)]
+        time.sleep(max(0.0, measure_from - time.perf_counter()))
+        usage = [dict(process_usage(), role="loadtest")]
+        for f in futures:
+            f.result()
+    elapsed = time.perf_counter() - measure_from
+    return dict(rec.summary(elapsed, concurrency),
+                processes=_usage_delta(usage, [dict(process_usage(), role="loadtest")], elapsed))
+
+
+async def _run_level_http(host: str, port: int, corpus: List[Dict[str, Any]], concurrency: int,
+                          duration: float, warmup: float) -> Dict[str, Any]:
+    inputs = itertools.cycle(corpus)
+    rec = Recorder()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+
+    async def client():
+        while True:
+            t0 = time.perf_counter()
+            if t0 >= deadline:
+                return
+            try:
+                status, _ = await request_json(host, port, "POST", "/calculate", next(inputs))
+                ok = status == 200
+            except (OSError, ValueError, asyncio.IncompleteReadError):
+                ok = False
+            if t0 >= measure_from:
+                rec.add(time.perf_counter() - t0, ok)
+
+    tasks = [asyncio.create_task(client()) for _ in range(concurrency)]
+    await asyncio.sleep(max(0.0, measure_from - time.perf_counter()))
+    before = (await request_json(host, port, "GET", "/stats"))[1].get("processes", [])
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - measure_from
+    after = (await request_json(host, port, "GET", "/stats"))[1].get("processes", [])
+    return dict(rec.summary(elapsed, concurrency), processes=_usage_delta(before, after, elapsed))
+
+
+def run(target: str, levels: List[int], corpus: List[Dict[str, Any]], duration: float = 5.0, warmup: float = 1.0,
+        url: Optional[str] = None) -> Dict[str, Any]:
+    # -> {"target", "python", "machine", "corpus", "levels": [per-concurrency summary]}
+    results = []
+    if target == "http":
+        parts = urlsplit(url or "http://127.0.0.1:8765")
+        host, port = parts.hostname or "127.0.0.1", parts.port or 80
+
+        async def ramp():
+            return [await _run_level_http(host, port, corpus, c, duration, warmup) for c in levels]
+        results = asyncio.run(ramp())
+    else:
+        fn = TARGETS[target]
+        results = [_run_level(fn, corpus, c, duration, warmup) for c in levels]
+    return {"target": target, "url": url if target == "http" else None, "python": platform.python_version(),
+            "machine": platform.machine(), "corpus": len(corpus), "duration": duration, "levels": results}
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # -> one row per concurrency level present in both: throughput and p99 ratios (after / before)
+    prev = {lv["concurrency"]: lv for lv in before.get("levels", [])}
+    rows = []
+    for lv in after.get("levels", []):
+        b = prev.get(lv["concurrency"])
+        if not b:
+            continue
+        rows.append({
+            "concurrency": lv["concurrency"],
+            "throughput": (b["throughput"], lv["throughput"]),
+            "throughputRatio": lv["throughput"] / b["throughput"] if b["throughput"] > 0 else None,
+            "p99Ms": (b["latencyMs"]["p99"], lv["latencyMs"]["p99"]),
+            "p99Ratio": lv["latencyMs"]["p99"] / b["latencyMs"]["p99"] if b["latencyMs"]["p99"] > 0 else None,
+        })
+    return rows
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"target={report['target']} corpus={report['corpus']} duration={report['duration']}s")
+    print(f"{'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'errors':>7}  cpu% / RSS MB per process")
+    for lv in report["levels"]:
+        procs = "  ".join(f"{p['role']}:{(p['cpuUtilization'] or 0) * 100:.0f}%/{(p['rssBytes'] or 0) / 2**20:.0f}"
+                          for p in lv.get("processes", []))
+        lat = lv["latencyMs"]
+        print(f"{lv['concurrency']:>5} {lv['throughput']:>9.1f} {lat['p50']:>9.1f} {lat['p90']:>9.1f} "
+              f"{lat['p99']:>9.1f} {lv['errors']:>7}  {procs}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="負荷試験（同時実行数を段階的に上げてレイテンシ・スループット・CPU/RSS を計測）")
+    p.add_argument("--target", choices=("core", "session", "http"), default="session")
+    p.add_argument("--url", default="http://127.0.0.1:8765", help="--target http の api_server.py")
+    p.add_argument("--concurrency", default="1,2,4,8", help="カンマ区切りの同時実行数")
+    p.add_argument("--duration", type=float, default=5.0, help="各段階の計測秒数")
+    p.add_argument("--warmup", type=float, default=1.0, help="各段階の計測前の助走秒数")
+    p.add_argument("--corpus", default=None, help="入力JSONL（既定：乱数で生成）")
+    p.add_argument("--corpus-size", type=int, default=200)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("-o", "--output", help="結果JSONの出力先")
+    p.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="2つの結果JSONを比較して終了")
+    args = p.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0], "r", encoding="utf-8") as f:
+            before = json.load(f)
+        with open(args.compare[1], "r", encoding="utf-8") as f:
+            after = json.load(f)
+        for r in compare(before, after):
+            print(f"conc {r['concurrency']:>4}: req/s {r['throughput'][0]:.1f} -> {r['throughput'][1]:.1f} "
+                  f"(x{r['throughputRatio'] or 0:.2f})  p99 {r['p99Ms'][0]:.1f} -> {r['p99Ms'][1]:.1f} ms "
+                  f"(x{r['p99Ratio'] or 0:.2f})")
+        return 0
+
+    corpus = load_corpus(args.corpus) if args.corpus else make_corpus(args.corpus_size, args.seed)
+    if not corpus:
+        print("有効な入力がありません。", file=sys.stderr)
+        return 2
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    report = run(args.target, levels, corpus, args.duration, args.warmup, args.url)
+    _print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
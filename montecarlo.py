@@ -0,0 +1,155 @@
+# montecarlo.py
+# Stochastic DC/iDeCo returns: distribution of net totals of strategies A-D.
+#
+# - The candidate of each strategy (receive ages/modes) is the deterministic core.calculate_all choice;
+#   only the balances are random.
+# - Monthly gross returns are lognormal with E[growth] = 1 + mean/12 (the monthly compounding of
+#   core.calculate_future_value) and log-volatility volatility/sqrt(12). volatility=0 reproduces
+#   the deterministic balances.
+# - DC and iDeCo share the same shocks (same market, different means).
+# - Annuities are converted at the assumed dcReturnRate/idecoReturnRate (calculate_pmt) from the simulated
+#   balance at the start age; lump sums and taxes follow batch.evaluate_paths (= core.evaluate_candidate).
+# - Paths are simulated chunk by chunk (memory ~ chunk_size); each chunk has its own child seed,
+#   so results do not depend on the number of workers.
+#
+#   python montecarlo.py input.json --paths 100000 --volatility 0.15 --seed 1 --workers 4
+
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import json
+import math
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import batch
+from core import calculate_all
+from io_json import normalize_input_dict
+from validations import validate_input
+
+PERCENTILES = (5, 50, 95)
+
+
+def _plan(input_: Dict[str, Any], strategies: List[Dict[str, Any]]) -> List[Optional[Tuple[str, str, int, int]]]:
+    # per strategy: (dc_mode, ideco_mode, dc_age, ideco_age) of the chosen candidate, None if there is none
+    plan = []
+    for s in strategies:
+        cand = s.get("_candidate")
+        if not cand:
+            plan.append(None)
+            continue
+        dc_age = cand["dcLumpAge"] if cand["dcMode"] == "lump" else cand["dcPensionStartAge"]
+        ideco_age = cand["idecoLumpAge"] if cand["idecoMode"] == "lump" else cand["idecoPensionStartAge"]
+        plan.append((cand["dcMode"], cand["idecoMode"], int(dc_age), int(ideco_age)))
+    return plan
+
+
+def simulate_balances(balance: float, contribution: float, mean: float, volatility: float,
+                      current_age: int, contribution_end_age: int, ages: List[int], z: np.ndarray) -> Dict[int, np.ndarray]:
+    # z: (months, paths) standard normal shocks from current_age. Returns {age: balances at the start of that age}.
+    # Same update order as _future_value_reference: grow, then contribute while age < contribution_end_age.
+    sigma = volatility / math.sqrt(12.0)
+    mu = math.log1p(mean / 12.0) - 0.5 * sigma * sigma if mean / 12.0 > -1 else -math.inf
+    n = z.shape[1]
+    b = np.full(n, float(balance))
+    out: Dict[int, np.ndarray] = {}
+    wanted = sorted(set(int(a) for a in ages))
+    age = int(current_age)
+    for target in wanted:
+        while age < target:
+            row = (age - int(current_age)) * 12
+            growth = np.exp(mu + sigma * z[row:row + 12])
+            for m in range(12):
+                b *= growth[m]
+                if age < int(contribution_end_age):
+                    b += contribution
+            age += 1
+        out[target] = b.copy()
+    return out
+
+
+def _simulate_chunk(args) -> Dict[str, np.ndarray]:
+    input_, plan, n, seed, volatility, dc_mean, ideco_mean = args
+    rng = np.random.default_rng(seed)
+    cur = int(input_["currentAge"])
+    dc_ages = [p[2] for p in plan if p]
+    ideco_ages = [p[3] for p in plan if p]
+    last = max(dc_ages + ideco_ages + [cur])
+    z = rng.standard_normal((12 * max(0, last - cur), n))
+    dc_bal = simulate_balances(input_["dcCurrentBalance"], input_["dcMonthlyContribution"], dc_mean, volatility,
+                               cur, int(input_["dcEndAge"]), dc_ages, z)
+    ideco_bal = simulate_balances(input_["idecoCurrentBalance"], input_["idecoMonthlyContribution"], ideco_mean,
+                                  volatility, cur, int(input_["idecoEndAge"]), ideco_ages, z)
+    del z
+    res = batch.evaluate_paths(input_, plan, dc_bal, ideco_bal, n)
+    return {"net": res["totalNet"], "best": res["bestIndex"]}
+
+
+def simulate(input_: Dict[str, Any], paths: int = 10000, volatility: float = 0.15, seed: Optional[int] = None,
+             dc_mean: Optional[float] = None, ideco_mean: Optional[float] = None,
+             chunk_size: int = 10000, workers: int = 0) -> Dict[str, Any]:
+    # input_: validated input (validations.validate_input already applied).
+    # dc_mean/ideco_mean: expected annual return (default: dcReturnRate/idecoReturnRate).
+    # -> {"paths", "seed", "volatility", "strategies": [{code, name, deterministicNet, p5, p50, p95, mean, winRate}],
+    #     "seconds"}
+    started = time.perf_counter()
+    det = calculate_all(input_)
+    plan = _plan(input_, det["strategies"])
+    dc_mean = float(input_["dcReturnRate"]) if dc_mean is None else float(dc_mean)
+    ideco_mean = float(input_["idecoReturnRate"]) if ideco_mean is None else float(ideco_mean)
+    paths = max(0, int(paths))
+    chunk_size = max(1, int(chunk_size))
+    sizes = [min(chunk_size, paths - lo) for lo in range(0, paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(input_, plan, n, s, float(volatility), dc_mean, ideco_mean) for n, s in zip(sizes, seeds)]
+    if workers <= 1:
+        parts = [_simulate_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_simulate_chunk, jobs))
+
+    net = np.concatenate([p["net"] for p in parts]) if parts else np.zeros((0, len(plan)))
+    best = np.concatenate([p["best"] for p in parts]) if parts else np.zeros(0, dtype=np.int64)
+    rows = []
+    for j, s in enumerate(det["strategies"]):
+        row = {"code": s["code"], "name": s["name"], "deterministicNet": s["totalNet"]}
+        if plan[j] is None or paths == 0:
+            row.update({f"p{q}": None for q in PERCENTILES}, mean=None, winRate=0.0)
+        else:
+            qs = np.percentile(net[:, j], PERCENTILES)
+            row.update({f"p{q}": float(v) for q, v in zip(PERCENTILES, qs)}, mean=float(net[:, j].mean()),
+                       winRate=float((best == j).mean()))
+        rows.append(row)
+    return {"paths": paths, "seed": seed, "volatility": float(volatility), "dcMean": dc_mean, "idecoMean": ideco_mean,
+            "strategies": rows, "seconds": time.perf_counter() - started}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="DC/iDeCo 運用利回りのモンテカルロ・シミュレーション")
+    p.add_argument("input", help="入力JSON（export_input_json 形式、または入力dict）")
+    p.add_argument("--paths", type=int, default=10000)
+    p.add_argument("--volatility", type=float, default=0.15, help="年率ボラティリティ（0.15 = 15%%）")
+    p.add_argument("--dc-mean", type=float, default=None, help="DC 期待利回り（既定：dcReturnRate）")
+    p.add_argument("--ideco-mean", type=float, default=None, help="iDeCo 期待利回り（既定：idecoReturnRate）")
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--chunk-size", type=int, default=10000)
+    p.add_argument("--workers", type=int, default=0, help="プロセス数（0/1 はプロセスプールを使わない）")
+    args = p.parse_args(argv)
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        input_ = normalize_input_dict(json.load(f))
+    errs = validate_input(input_)
+    if errs:
+        print("\n".join(errs), file=sys.stderr)
+        return 2
+    result = simulate(input_, args.paths, args.volatility, args.seed, args.dc_mean, args.ideco_mean,
+                      args.chunk_size, args.workers)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
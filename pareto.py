@@ -0,0 +1,90 @@
+# pareto.py
+# Pareto frontier of every candidate of strategies A-D (instead of the single better()/pick_best_strategy winner).
+#
+# - Objectives: totalNet (max), effective tax rate totalTax/totalGross (min, 1.0 when gross <= 0 as in
+#   pick_best_strategy), latest receipt age = max(DC age, iDeCo age) of the candidate (min; the severance
+#   receipt age is the same for every candidate).
+# - Candidates come from core.optimize_strategy(collect=...): search="full" evaluates every age combination
+#   with pruning off (totals only, via _candidate_totals), search="standard" the JS v4.4 candidates.
+# - pareto_frontier is a sort-and-sweep: sort by (age, -net, rate), then keep a 2-D staircase of the
+#   points kept so far (net ascending, rate ascending) and test each point with one bisect,
+#   O(n log n) + list inserts instead of O(n^2) pairwise dominance checks.
+# - Points equal on all three objectives collapse to the first one in sort order.
+
+from __future__ import annotations
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence
+import time
+
+from core import (CalcCache, SimulationInput, calculate_public_pension, calculate_strategy_a, calculate_strategy_b,
+                  calculate_strategy_c, calculate_strategy_d)
+
+COLUMNS = ("code", "dcMode", "idecoMode", "dcAge", "idecoAge", "latestAge",
+           "totalGross", "totalTax", "totalNet", "effectiveTaxRate")
+
+
+def pareto_frontier(net: Sequence[float], rate: Sequence[float], age: Sequence[int]) -> List[int]:
+    # indices of the non-dominated points (max net, min rate, min age), ordered by (age, -net, rate)
+    order = sorted(range(len(net)), key=lambda i: (age[i], -net[i], rate[i]))
+    nets: List[float] = []   # staircase: nets ascending, rates ascending
+    rates: List[float] = []
+    kept: List[int] = []
+    for i in order:
+        n, r = net[i], rate[i]
+        # every point already swept has age <= age[i]; the cheapest rate among those with net >= n
+        # is the first staircase entry at or right of n
+        pos = bisect_left(nets, n)
+        if pos < len(nets) and rates[pos] <= r:
+            continue
+        kept.append(i)
+        end = pos
+        while end < len(nets) and nets[end] == n:
+            end += 1
+        lo = pos
+        while lo > 0 and rates[lo - 1] >= r:
+            lo -= 1
+        nets[lo:end] = [n]
+        rates[lo:end] = [r]
+    return kept
+
+
+def _receipt_ages(cand: Dict[str, Any]):
+    dc_age = cand["dcLumpAge"] if cand["dcMode"] == "lump" else cand["dcPensionStartAge"]
+    ideco_age = cand["idecoLumpAge"] if cand["idecoMode"] == "lump" else cand["idecoPensionStartAge"]
+    return int(dc_age), int(ideco_age)
+
+
+def calculate_pareto(input_: Dict[str, Any], search: str = "full", cache: Optional[CalcCache] = None,
+                     public_pension_annual: Optional[float] = None) -> Dict[str, Any]:
+    # input_: validated input. -> {"columns": {COLUMNS[k]: [...]}, "size", "evaluated", "search", "seconds"}
+    started = time.perf_counter()
+    cache = cache if cache is not None else CalcCache(maxsize=4096)
+    record = SimulationInput.coerce(input_)
+    yos = record.serviceYears
+    if public_pension_annual is None:
+        public_pension_annual = calculate_public_pension(record.avgSalary, yos, record.pensionExemption,
+                                                         record.retirementAge)
+    cols: Dict[str, List[Any]] = {k: [] for k in COLUMNS}
+    for code, fn in (("A", calculate_strategy_a), ("B", calculate_strategy_b),
+                     ("C", calculate_strategy_c), ("D", calculate_strategy_d)):
+        collected: List[Any] = []
+        fn(record, public_pension_annual, yos, cache, search, collected)
+        for cand, totals in collected:
+            dc_age, ideco_age = _receipt_ages(cand)
+            gross, tax = totals["totalGross"], totals["totalTax"]
+            cols["code"].append(code)
+            cols["dcMode"].append(cand["dcMode"])
+            cols["idecoMode"].append(cand["idecoMode"])
+            cols["dcAge"].append(dc_age)
+            cols["idecoAge"].append(ideco_age)
+            cols["latestAge"].append(max(dc_age, ideco_age))
+            cols["totalGross"].append(gross)
+            cols["totalTax"].append(tax)
+            cols["totalNet"].append(totals["totalNet"])
+            cols["effectiveTaxRate"].append(tax / gross if gross > 0 else 1.0)
+    keep = pareto_frontier(cols["totalNet"], cols["effectiveTaxRate"], cols["latestAge"])
+    return {
+        "columns": {k: [v[i] for i in keep] for k, v in cols.items()},
+        "size": len(keep), "evaluated": len(cols["code"]), "search": search,
+        "seconds": time.perf_counter() - started,
+    }
@@ -0,0 +1,309 @@
+# result_cache.py
+# Persistent calculate_all result cache (SQLite), shared by all Streamlit worker processes on one host.
+# - key: sha256 of io_json.canonical_input_json (app_version + normalized input) + calculation options + code_version()
+# - eviction: least recently used entries first once the stored payloads exceed max_bytes
+# - invalidation: the whole table is dropped when io_json.APP_VERSION or code_version() differs from the stored one
+#   (code_version covers core.RESULT_SCHEMA and the core.py source, so a deploy that changes the result
+#   never serves old payloads, and processes still running the old code write under keys the new code never reads)
+# - concurrency: WAL journal + busy timeout; every operation uses its own short-lived connection.
+#   Lookups are plain reads (no write lock): hit/miss/time counters and last-access times are kept per
+#   process and written in the next put(), or by flush() every flush_interval seconds / flush_every lookups.
+# - a payload that no longer decodes (corrupt / truncated blob) counts as a miss and its row is deleted.
+
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional
+from functools import lru_cache
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import core
+from core import calculate_all, get_future_value_engine
+import io_json
+
+DEFAULT_PATH = os.path.join(".cache", "result_cache.sqlite")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    compute_seconds REAL NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS results_last_access ON results(last_access);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_COUNTERS = ("hits", "misses", "saved_seconds", "lookup_seconds")
+# per-caller parts of a result that are not stored (node-store statistics of one process / session)
+TRANSIENT_KEYS = ("incremental", "cacheStats")
+
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    # core.RESULT_SCHEMA + sha256 of core.py (falls back to the schema alone when the source is not shipped)
+    try:
+        with open(core.__file__, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    except OSError:
+        digest = "nosource"
+    return f"schema{core.RESULT_SCHEMA}-{digest}"
+
+
+class ResultCache:
+    def __init__(self, path: str = DEFAULT_PATH, max_bytes: int = DEFAULT_MAX_BYTES, timeout: float = 30.0,
+                 flush_interval: float = 5.0, flush_every: int = 100):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.timeout = timeout
+        self.flush_interval = flush_interval
+        self.flush_every = max(1, int(flush_every))
+        self._lock = threading.Lock()
+        self._pending: Dict[str, float] = dict.fromkeys(_COUNTERS, 0)
+        self._touched: Dict[str, list] = {}  # key -> [last access time, hits] not yet written
+        self._lookups = 0
+        self._flushed = time.monotonic()
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(_SCHEMA)
+        self._check_version()
+
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    def _check_version(self) -> None:
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            stored = dict(con.execute("SELECT name, value FROM meta WHERE name IN ('app_version', 'code_version')"))
+            if stored.get("app_version") != io_json.APP_VERSION or stored.get("code_version") != code_version():
+                con.execute("DELETE FROM results")
+                con.execute("INSERT OR REPLACE INTO meta(name, value) VALUES('app_version', ?)", (io_json.APP_VERSION,))
+                con.execute("INSERT OR REPLACE INTO meta(name, value) VALUES('code_version', ?)", (code_version(),))
+                for name in _COUNTERS:
+                    con.execute("INSERT OR REPLACE INTO meta(name, value) VALUES(?, '0')", (name,))
+            con.execute("COMMIT")
+        finally:
+            con.close()
+
+    @staticmethod
+    def make_key(input_: Dict[str, Any], **options: Any) -> str:
+        canonical = io_json.canonical_input_json(input_)
+        opts = json.dumps(dict(options, code=code_version()), sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256((canonical + "\n" + opts).encode("utf-8")).hexdigest()
+
+    def _bump(self, con: sqlite3.Connection, name: str, amount: float) -> None:
+        con.execute("UPDATE meta SET value = CAST(CAST(value AS REAL) + ? AS TEXT) WHERE name = ?", (amount, name))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        started = time.perf_counter()
+        con = self._connect()
+        try:
+            row = con.execute("SELECT value, compute_seconds FROM results WHERE key = ?", (key,)).fetchone()
+        finally:
+            con.close()
+        value = None
+        if row is not None:
+            try:
+                value = json.loads(zlib.decompress(row[0]).decode("utf-8"))
+            except (zlib.error, ValueError):
+                # corrupt / truncated payload: a miss, and the row is dropped so the recomputed result replaces it
+                self._discard(key)
+                row = None
+        lookup = time.perf_counter() - started
+        with self._lock:
+            self._lookups += 1
+            if row is None:
+                self._pending["misses"] += 1
+            else:
+                self._pending["hits"] += 1
+                self._pending["saved_seconds"] += max(0.0, row[1] - lookup)
+                self._pending["lookup_seconds"] += lookup
+                touched = self._touched.setdefault(key, [0.0, 0])
+                touched[0] = time.time()
+                touched[1] += 1
+            due = self._lookups >= self.flush_every or time.monotonic() - self._flushed >= self.flush_interval
+        if due:
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass  # kept in memory for the next write
+        return value
+
+    def _discard(self, key: str) -> None:
+        try:
+            con = self._connect()
+            try:
+                con.execute("DELETE FROM results WHERE key = ?", (key,))
+            finally:
+                con.close()
+        except sqlite3.Error:
+            pass  # put() overwrites it anyway
+
+    def _take_pending(self):
+        with self._lock:
+            pending, touched = self._pending, self._touched
+            self._pending, self._touched = dict.fromkeys(_COUNTERS, 0), {}
+            self._lookups = 0
+            self._flushed = time.monotonic()
+        return pending, touched
+
+    def _restore_pending(self, pending: Dict[str, float], touched: Dict[str, list]) -> None:
+        with self._lock:
+            for name, amount in pending.items():
+                self._pending[name] += amount
+            for key, (when, hits) in touched.items():
+                cur = self._touched.setdefault(key, [0.0, 0])
+                cur[0] = max(cur[0], when)
+                cur[1] += hits
+
+    def _write_pending(self, con: sqlite3.Connection, pending: Dict[str, float], touched: Dict[str, list]) -> None:
+        for name, amount in pending.items():
+            if amount:
+                self._bump(con, name, amount)
+        con.executemany("UPDATE results SET last_access = MAX(last_access, ?), hits = hits + ? WHERE key = ?",
+                        [(when, hits, key) for key, (when, hits) in touched.items()])
+
+    def flush(self) -> None:
+        # writes this process's counters / last-access times (one short write transaction)
+        pending, touched = self._take_pending()
+        if not touched and not any(pending.values()):
+            return
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            self._write_pending(con, pending, touched)
+            con.execute("COMMIT")
+        except sqlite3.Error:
+            self._restore_pending(pending, touched)
+            raise
+        finally:
+            con.close()
+
+    def put(self, key: str, value: Dict[str, Any], compute_seconds: float) -> None:
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"), 1)
+        now = time.time()
+        pending, touched = self._take_pending()
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            self._write_pending(con, pending, touched)  # before _evict, so recent hits count as recent
+            con.execute("INSERT OR REPLACE INTO results(key, value, size, compute_seconds, created, last_access, hits) "
+                        "VALUES(?, ?, ?, ?, ?, ?, 0)", (key, blob, len(blob), compute_seconds, now, now))
+            self._evict(con)
+            con.execute("COMMIT")
+        except sqlite3.Error:
+            self._restore_pending(pending, touched)
+            raise
+        finally:
+            con.close()
+
+    def _evict(self, con: sqlite3.Connection) -> None:
+        total = con.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims = []
+        for key, size in con.execute("SELECT key, size FROM results ORDER BY last_access ASC"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        con.executemany("DELETE FROM results WHERE key = ?", victims)
+
+    def get_or_compute(self, input_: Dict[str, Any], compute: Callable[[], Dict[str, Any]], **options: Any) -> Dict[str, Any]:
+        # compute() runs at most once: a failed lookup counts as a miss, a failed store is dropped
+        # (locked/corrupt file, read-only disk never block or repeat the calculation)
+        key = self.make_key(input_, **options)
+        try:
+            cached = self.get(key)
+        except sqlite3.Error:
+            cached = None
+        if cached is not None:
+            return cached
+        started = time.perf_counter()
+        result = compute()
+        try:
+            stored = {k: v for k, v in result.items() if k not in TRANSIENT_KEYS}
+            self.put(key, stored, time.perf_counter() - started)
+        except sqlite3.Error:
+            pass
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            self.flush()
+        except sqlite3.Error:
+            pass
+        con = self._connect()
+        try:
+            meta = dict(con.execute("SELECT name, value FROM meta").fetchall())
+            entries, size = con.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        finally:
+            con.close()
+        hits = int(float(meta.get("hits", 0)))
+        misses = int(float(meta.get("misses", 0)))
+        lookups = hits + misses
+        return {
+            "appVersion": meta.get("app_version"),
+            "codeVersion": meta.get("code_version"),
+            "entries": entries,
+            "bytes": size,
+            "maxBytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hitRatio": (hits / lookups) if lookups else 0.0,
+            "savedSeconds": float(meta.get("saved_seconds", 0)),
+            "avgLookupSeconds": (float(meta.get("lookup_seconds", 0)) / hits) if hits else 0.0,
+        }
+
+    def clear(self) -> None:
+        self._take_pending()
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            con.execute("DELETE FROM results")
+            for name in _COUNTERS:
+                con.execute("UPDATE meta SET value = '0' WHERE name = ?", (name,))
+            con.execute("COMMIT")
+        finally:
+            con.close()
+
+
+def calculate_all_cached(input_: Dict[str, Any], cache: Optional[ResultCache], search: str = "standard",
+                         progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+    # calculate_all through the persistent cache; cache=None computes directly.
+    # Cache failures (locked/corrupt file, read-only disk) never block the calculation (see get_or_compute).
+    # progress: forwarded to calculate_all (not called on a cache hit).
+    # (IncrementalCalculator(result_cache=...) does the same lookup itself.)
+    compute = lambda: calculate_all(input_, search=search, progress=progress)
+    if cache is None:
+        return compute()
+    return cache.get_or_compute(input_, compute, search=search, engine=get_future_value_engine())
+
+
+def cache_from_env() -> Optional[ResultCache]:
+    # RESULT_CACHE_PATH: file path, or "off" to disable. RESULT_CACHE_MAX_MB: size limit.
+    path = os.environ.get("RESULT_CACHE_PATH", DEFAULT_PATH)
+    if path.strip().lower() in ("", "off", "0", "none"):
+        return None
+    max_mb = float(os.environ.get("RESULT_CACHE_MAX_MB", DEFAULT_MAX_BYTES / (1024 * 1024)))
+    try:
+        return ResultCache(path, int(max_mb * 1024 * 1024))
+    except (sqlite3.Error, OSError):
+        return None
@@ -0,0 +1,193 @@
+# sweep.py
+# Sensitivity analysis: calculate_all over a 1-D or 2-D grid of input values.
+#
+# - Any numeric field of input_internal can be swept (io_json.INT_KEYS values are cast to int).
+#   Hidden fields the form derives from retirementAge/joinAge (serviceYears, dcStartAge, dcEndAge,
+#   idecoEndAge, an auto-filled severanceReceiveAge) are re-derived per grid point as ui.render_input_form does.
+# - Invariants are reused across grid points: the public pension is computed once per distinct
+#   (avgSalary, serviceYears, pensionExemption, retirementAge), and one CalcCache is shared, so
+#   future values / annuities that do not depend on the swept fields are computed once.
+# - Grid points that fail validate_input, or whose calculation raises (e.g. a swept retirementAge/joinAge
+#   giving serviceYears=0), are reported in "errors" (bestCode None, nets NaN); the rest of the grid is kept.
+
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import math
+import time
+
+from core import CalcCache, calculate_all, calculate_public_pension, pick_best_strategy
+from io_json import FLOAT_KEYS, INT_KEYS
+from validations import validate_input
+
+STRATEGY_CODES = ("A", "B", "C", "D")
+
+# 画面で選べる項目（field -> (表示名, 単位, 画面値→内部値の倍率)）
+SWEEP_FIELDS: Dict[str, Tuple[str, str, float]] = {
+    "severancePay": ("退職金見込額", "万円", 1.0),
+    "severanceReceiveAge": ("退職金受取年齢", "歳", 1.0),
+    "retirementAge": ("退職予定年齢", "歳", 1.0),
+    "dcReturnRate": ("企業型DC 想定年利率", "%", 0.01),
+    "dcCurrentBalance": ("企業型DC 現在の評価額", "万円", 1.0),
+    "dcMonthlyContribution": ("企業型DC 月次拠出額", "万円", 1.0),
+    "idecoReturnRate": ("iDeCo 想定年利率", "%", 0.01),
+    "idecoCurrentBalance": ("iDeCo 現在の評価額", "万円", 1.0),
+    "idecoMonthlyContribution": ("iDeCo 月次拠出額", "万円", 1.0),
+    "avgSalary": ("平均標準報酬月額", "万円", 1.0),
+}
+
+
+def grid_values(start: float, stop: float, steps: int) -> List[float]:
+    # steps evenly spaced values from start to stop (inclusive)
+    steps = max(1, int(steps))
+    if steps == 1:
+        return [float(start)]
+    return [start + (stop - start) * i / (steps - 1) for i in range(steps)]
+
+
+def apply_value(base: Dict[str, Any], field: str, value: Any) -> Dict[str, Any]:
+    # copy of base with field=value and the form-derived hidden fields recomputed
+    if field not in INT_KEYS and field not in FLOAT_KEYS:
+        raise ValueError(f"not a numeric input field: {field}")
+    inp = dict(base)
+    inp[field] = int(round(float(value))) if field in INT_KEYS else float(value)
+    if field in ("retirementAge", "joinAge"):
+        ret = int(inp.get("retirementAge", 0) or 0)
+        join = int(inp.get("joinAge", 0) or 0)
+        inp["serviceYears"] = (ret - join) if (ret > 0 and join > 0) else 0
+        inp["dcStartAge"] = join
+        inp["dcEndAge"] = min(ret, 60) if ret > 0 else 0
+        if field == "retirementAge":
+            inp["idecoEndAge"] = 60 if inp.get("idecoContinueContribution") else ret
+            # 退職金受取年齢がフォームの自動値（退職予定年齢、60歳上限）のままなら追従させる
+            old_ret = int(base.get("retirementAge", 0) or 0)
+            if int(base.get("severanceReceiveAge", 0) or 0) == min(old_ret, 60) and ret > 0:
+                inp["severanceReceiveAge"] = min(ret, 60)
+    return inp
+
+
+def _public_pension(memo: Dict[Tuple[Any, ...], float], inp: Dict[str, Any]) -> float:
+    key = (inp["avgSalary"], int(inp["serviceYears"]), bool(inp["pensionExemption"]), int(inp["retirementAge"]))
+    ppa = memo.get(key)
+    if ppa is None:
+        ppa = memo[key] = calculate_public_pension(*key)
+    return ppa
+
+
+def _calculate_point(inp: Dict[str, Any], cache: CalcCache, search: str,
+                     pension_memo: Dict[Tuple[Any, ...], float]) -> Tuple[Optional[Dict[str, Any]], Optional[List[str]]]:
+    # -> (calculate_all result, None) or (None, [error message]) when the calculation fails for this point
+    try:
+        return calculate_all(inp, cache, search, public_pension_annual=_public_pension(pension_memo, inp)), None
+    except Exception as e:
+        return None, [f"計算に失敗しました（{type(e).__name__}: {e}）"]
+
+
+def sweep(input_: Dict[str, Any], x_field: str, x_values: Sequence[float], y_field: Optional[str] = None,
+          y_values: Optional[Sequence[float]] = None, search: str = "standard",
+          cache: Optional[CalcCache] = None) -> Dict[str, Any]:
+    # -> grids indexed [y][x] (one row when y_field is None):
+    #    bestCode, bestNet, totalNet {code: grid}, errors (None or list of messages)
+    started = time.perf_counter()
+    cache = cache if cache is not None else CalcCache(maxsize=8192)
+    ys: List[Any] = list(y_values) if y_field else [None]
+    xs = list(x_values)
+    pension_memo: Dict[Tuple[Any, ...], float] = {}
+    best_code: List[List[Optional[str]]] = []
+    best_net: List[List[float]] = []
+    total_net: Dict[str, List[List[float]]] = {code: [] for code in STRATEGY_CODES}
+    errors: List[List[Optional[List[str]]]] = []
+    for y in ys:
+        row_code, row_best, row_err = [], [], []
+        row_net: Dict[str, List[float]] = {code: [] for code in STRATEGY_CODES}
+        row_base = apply_value(input_, y_field, y) if y_field else input_
+        for x in xs:
+            inp = apply_value(row_base, x_field, x)
+            errs = validate_input(inp)
+            res = None
+            if not errs:
+                res, errs = _calculate_point(inp, cache, search, pension_memo)
+            if res is None:
+                row_code.append(None)
+                row_best.append(math.nan)
+                row_err.append(errs)
+                for code in STRATEGY_CODES:
+                    row_net[code].append(math.nan)
+                continue
+            row_code.append(res["best"]["code"])
+            row_best.append(res["best"]["totalNet"])
+            row_err.append(None)
+            for s in res["strategies"]:
+                row_net[s["code"]].append(s["totalNet"])
+        best_code.append(row_code)
+        best_net.append(row_best)
+        errors.append(row_err)
+        for code in STRATEGY_CODES:
+            total_net[code].append(row_net[code])
+    return {
+        "xField": x_field, "xValues": xs, "yField": y_field, "yValues": ys if y_field else [],
+        "bestCode": best_code, "bestNet": best_net, "totalNet": total_net, "errors": errors,
+        "cacheStats": cache.stats(), "seconds": time.perf_counter() - started,
+    }
+
+
+MAX_RECEIVE_AGE = 75  # core.optimize_strategy max_receive_age (validate_input の退職金受取年齢上限)
+
+
+def optimize_retirement_age(input_: Dict[str, Any], search: str = "standard",
+                            retirement_ages: Optional[Sequence[int]] = None,
+                            severance_ages: Optional[Sequence[int]] = None,
+                            cache: Optional[CalcCache] = None) -> Dict[str, Any]:
+    # Every feasible (retirementAge, severanceReceiveAge) pair, ranked by pick_best_strategy.
+    # Default ranges: retirementAge max(currentAge, joinAge + 1)..min(75, endAge-1) (at least one year of
+    # service), severanceReceiveAge currentAge..75; pairs rejected by validate_input or whose calculation
+    # fails are left empty with the reason in "errors".
+    # Shared across the surface: one CalcCache (future values by target age, annuities and the
+    # per-(yearly, age >= 65) pension tax memo), the memoized span merges, and the public pension.
+    # -> sweep()-shaped grids (x = retirementAge, y = severanceReceiveAge) plus "optimum".
+    started = time.perf_counter()
+    cache = cache if cache is not None else CalcCache(maxsize=16384)
+    cur = int(input_["currentAge"])
+    end = int(input_.get("endAge") or 90)
+    if retirement_ages is None:
+        lo = max(cur, int(input_.get("joinAge") or 0) + 1)
+        retirement_ages = range(lo, max(lo, min(MAX_RECEIVE_AGE, end - 1)) + 1)
+    if severance_ages is None:
+        severance_ages = range(cur, MAX_RECEIVE_AGE + 1)
+    xs = [int(a) for a in retirement_ages]
+    ys = [int(a) for a in severance_ages if xs and cur <= int(a) <= max(xs)]
+    pension_memo: Dict[Tuple[Any, ...], float] = {}
+    best_code: List[List[Optional[str]]] = []
+    best_net: List[List[float]] = []
+    errors: List[List[Optional[List[str]]]] = []
+    optimum: Optional[Dict[str, Any]] = None
+    evaluated = 0
+    for sev in ys:
+        row_code, row_net, row_err = [], [], []
+        for ret in xs:
+            inp = apply_value(input_, "retirementAge", ret)
+            inp["severanceReceiveAge"] = sev
+            errs = ["退職金受取年齢は、退職予定年齢以下にしてください。"] if sev > ret else validate_input(inp)
+            res = None
+            if not errs:
+                res, errs = _calculate_point(inp, cache, search, pension_memo)
+            if res is None:
+                row_code.append(None)
+                row_net.append(math.nan)
+                row_err.append(errs)
+                continue
+            evaluated += 1
+            best = res["best"]
+            row_code.append(best["code"])
+            row_net.append(best["totalNet"])
+            row_err.append(None)
+            candidate = dict(best, retirementAge=ret, severanceReceiveAge=sev)
+            if optimum is None or pick_best_strategy([optimum, candidate]) is candidate:
+                optimum = candidate
+        best_code.append(row_code)
+        best_net.append(row_net)
+        errors.append(row_err)
+    return {
+        "xField": "retirementAge", "xValues": xs, "yField": "severanceReceiveAge", "yValues": ys,
+        "bestCode": best_code, "bestNet": best_net, "errors": errors, "evaluated": evaluated,
+        "optimum": optimum, "cacheStats": cache.stats(), "seconds": time.perf_counter() - started,
+    }
@@ -0,0 +1,60 @@
+import asyncio
+
+import api_server
+from core import calculate_all
+from test_core import _sample_input
+
+
+def _serve(scenario, **kwargs):
+    async def run():
+        server = api_server.ApiServer(port=0, **kwargs)
+        port = await server.start()
+        try:
+            return await scenario(port)
+        finally:
+            await server.close()
+    return asyncio.run(run())
+
+
+def test_single_bulk_validate_and_errors():
+    inp = _sample_input()
+
+    async def scenario(port):
+        req = lambda *a: api_server.request_json("127.0.0.1", port, *a)
+        single = await req("POST", "/calculate", {"app_version": "x", "input": inp})
+        bad = await req("POST", "/calculate", dict(inp, currentAge=99))
+        bulk = await req("POST", "/calculate/bulk", {"inputs": [inp, dict(inp, currentAge=99), inp]})
+        valid = await req("POST", "/validate", inp)
+        missing = await req("GET", "/nope")
+        broken = await req("POST", "/calculate?search=bogus", inp)
+        stats = await req("GET", "/stats")
+        return single, bad, bulk, valid, missing, broken, stats
+
+    single, bad, bulk, valid, missing, broken, stats = _serve(scenario)
+    assert single[0] == 200 and single[1]["result"]["best"] == calculate_all(inp)["best"]
+    assert bad[0] == 422 and bad[1]["errors"]
+    assert bulk[0] == 200 and bulk[1]["ok"] == 2 and bulk[1]["errors"] == 1
+    assert [r["index"] for r in bulk[1]["results"]] == [0, 1, 2]
+    assert valid == (200, {"errors": [], "input": valid[1]["input"]})
+    assert missing[0] == 404 and broken[0] == 400
+    assert stats[1]["requests"] == 3 and stats[1]["records"] == 5 and stats[1]["latencyMs"]["p99"] > 0
+
+
+def test_concurrent_requests_share_micro_batches():
+    inp = _sample_input()
+
+    async def scenario(port):
+        replies = await asyncio.gather(*[api_server.request_json("127.0.0.1", port, "POST", "/calculate", inp)
+                                         for _ in range(12)])
+        return replies, (await api_server.request_json("127.0.0.1", port, "GET", "/stats"))[1]
+
+    replies, stats = _serve(scenario, window=0.05, max_batch=64)
+    assert all(status == 200 for status, _ in replies)
+    assert stats["batches"] < 12 and stats["meanBatchSize"] > 1
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert api_server.percentile(values, 50) == 50.0
+    assert api_server.percentile(values, 99) == 99.0
+    assert api_server.percentile([], 99) == 0.0
@@ -0,0 +1,76 @@
+import math
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core import calculate_all
+from batch import BATCH_ABS_TOLERANCE, BATCH_REL_TOLERANCE, NO_AGE, calculate_all_batch, records_to_columns
+
+
+def _random_input(rng):
+    cur = rng.randint(25, 59)
+    ret = rng.randint(max(cur, 45), 65)
+    join = rng.randint(18, min(40, ret - 1))
+    sev = rng.randint(cur, ret) if rng.random() < 0.3 else ret
+    cont = rng.random() < 0.3
+    return {
+        "currentAge": cur, "retirementAge": ret, "joinAge": join, "serviceYears": ret - join,
+        "severanceReceiveAge": sev, "severancePay": rng.choice([0, 500, 1500, 2500, 4000]),
+        "dcStartAge": join, "dcEndAge": min(ret, 60), "dcCurrentBalance": rng.uniform(0, 3000),
+        "dcMonthlyContribution": rng.choice([0, 1, 2.75, 5.5]), "dcReturnRate": rng.choice([0, 0.01, 0.03, 0.05]),
+        "idecoStartAge": rng.randint(20, min(cur, ret - 1)), "idecoEndAge": 60 if cont else ret,
+        "idecoCurrentBalance": rng.uniform(0, 1000), "idecoMonthlyContribution": rng.choice([0, 1, 2.3]),
+        "idecoReturnRate": rng.choice([0, 0.02, 0.04]), "avgSalary": rng.uniform(20, 65),
+        "pensionExemption": rng.random() < 0.3, "idecoContinueContribution": cont, "endAge": 90,
+    }
+
+
+def _close(a, b):
+    return math.isclose(a, b, rel_tol=BATCH_REL_TOLERANCE, abs_tol=BATCH_ABS_TOLERANCE)
+
+
+def test_batch_matches_scalar_on_random_corpus():
+    rng = random.Random(20240501)
+    records = [_random_input(rng) for _ in range(400)]
+    out = calculate_all_batch(records_to_columns(records), chunk_size=128)
+    assert out["totalNet"].shape == (400, 4)
+    for i, rec in enumerate(records):
+        res = calculate_all(dict(rec))
+        by_code = {s["code"]: s for s in res["strategies"]}
+        for j, s in enumerate(res["strategies"]):
+            for key in ("totalGross", "totalTax", "totalNet"):
+                assert _close(out[key][i, j], s[key]), (i, s["code"], key)
+            for key in ("dcLumpAge", "idecoLumpAge", "dcPensionStartAge", "idecoPensionStartAge"):
+                expected = s["_candidate"][key]
+                assert out[key][i, j] == (NO_AGE if expected is None else expected), (i, s["code"], key)
+        picked = by_code[str(out["bestCode"][i])]
+        # a different code is only allowed for strategies tied within the documented tolerance
+        assert _close(picked["totalNet"], res["best"]["totalNet"]), i
+        assert _close(picked["totalTax"], res["best"]["totalTax"]), i
+
+
+def test_batch_empty_input():
+    out = calculate_all_batch(records_to_columns([]))
+    assert out["totalNet"].shape == (0, 4)
+    assert out["bestCode"].shape == (0,)
+
+
+def test_batch_non_positive_chunk_size_is_clamped():
+    rng = random.Random(7)
+    columns = records_to_columns([_random_input(rng) for _ in range(5)])
+    expected = calculate_all_batch(columns)
+    for size in (0, -3):
+        out = calculate_all_batch(columns, chunk_size=size)
+        assert (out["totalNet"] == expected["totalNet"]).all() and (out["bestIndex"] == expected["bestIndex"]).all()
+
+
+def test_field_lists_follow_simulation_input():
+    import batch
+    import io_json
+    from core import SimulationInput
+    assert (io_json.INT_KEYS, io_json.FLOAT_KEYS, io_json.BOOL_KEYS) == (
+        SimulationInput.INT_FIELDS, SimulationInput.FLOAT_FIELDS, SimulationInput.BOOL_FIELDS)
+    fields = batch.INT_FIELDS + batch.FLOAT_FIELDS + batch.BOOL_FIELDS
+    assert sorted(fields + batch.UNUSED_FIELDS) == sorted(SimulationInput.FIELDS)
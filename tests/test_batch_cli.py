@@ -0,0 +1,31 @@
+import io
+import json
+
+from batch_cli import read_records, run
+
+CSV = """currentAge,retirementAge,joinAge,severancePay,dcCurrentBalance,dcMonthlyContribution,dcReturnRate,idecoStartAge,idecoCurrentBalance,idecoMonthlyContribution,idecoReturnRate,avgSalary,pensionExemption,idecoContinueContribution
+45,60,22,2000,800,2,0.03,30,300,2.3,0.04,45,False,False
+61,60,22,2000,800,2,0.03,30,300,2.3,0.04,45,False,False
+50,55,25,1500,400,1.5,0.02,40,100,1,0.03,40,True,False
+"""
+
+
+def _run(workers):
+    out, err = io.StringIO(), io.StringIO()
+    summary = run(read_records(io.StringIO(CSV), "csv"), out, err, workers=workers, chunk_size=1)
+    return summary, [json.loads(l) for l in out.getvalue().splitlines()], [json.loads(l) for l in err.getvalue().splitlines()]
+
+
+def test_csv_rows_are_validated_and_written_in_order():
+    summary, results, errors = _run(workers=0)
+    assert summary["records"] == 3 and summary["ok"] == 2 and summary["errors"] == 1
+    assert [r["index"] for r in results] == [0, 2]
+    assert errors[0]["index"] == 1 and errors[0]["errors"]
+    assert results[1]["result"]["input"]["pensionExemption"] is True
+    assert results[0]["result"]["best"]["code"] in ("A", "B", "C", "D")
+
+
+def test_process_pool_matches_in_process():
+    _, serial, _ = _run(workers=0)
+    _, pooled, _ = _run(workers=2)
+    assert pooled == serial
@@ -0,0 +1,47 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+pytest.importorskip("reportlab")
+
+import batch_pdf
+from batch_cli import read_records
+from core import calculate_all
+from test_batch_cli import CSV
+from test_core import _sample_input
+
+
+def _run(tmp_path, workers, name="out.zip"):
+    err = io.StringIO()
+    out = str(tmp_path / name)
+    summary = batch_pdf.run(read_records(io.StringIO(CSV), "csv"), out, err, workers=workers, chunk_size=1)
+    return summary, out, [json.loads(l) for l in err.getvalue().splitlines()]
+
+
+def test_raw_inputs_stream_into_zip_in_order(tmp_path):
+    summary, out, errors = _run(tmp_path, workers=0)
+    assert summary["ok"] == 2 and summary["errors"] == 1 and summary["pages"] >= 2
+    assert summary["pagesPerSecond"] > 0
+    assert [e["index"] for e in errors] == [1]
+    with zipfile.ZipFile(out) as z:
+        assert z.namelist() == ["000000.pdf", "000002.pdf"]
+        assert all(z.read(n).startswith(b"%PDF") for n in z.namelist())
+
+
+def test_pool_and_directory_output_match(tmp_path):
+    serial, _, _ = _run(tmp_path, workers=0, name="serial")
+    pooled, out, _ = _run(tmp_path, workers=2, name="pooled")
+    assert (pooled["ok"], pooled["pages"]) == (serial["ok"], serial["pages"])
+    assert sorted(p.name for p in (tmp_path / "pooled").iterdir()) == ["000000.pdf", "000002.pdf"]
+
+
+def test_precomputed_results_are_rendered_without_recalculation(tmp_path, monkeypatch):
+    res = calculate_all(_sample_input())
+    monkeypatch.setattr(batch_pdf, "calculate_all", lambda *_: pytest.fail("recalculated"))
+    records = [{"index": 0, "result": res}, dict(res, employeeId="E 01")]
+    summary = batch_pdf.run(records, str(tmp_path / "r.zip"), io.StringIO(), name_field="employeeId")
+    assert summary["ok"] == 2
+    with zipfile.ZipFile(tmp_path / "r.zip") as z:
+        assert z.namelist() == ["000000.pdf", "000001_E_01.pdf"]
@@ -0,0 +1,18 @@
+import bench
+
+
+def test_profiles_validate():
+    for name in bench.PROFILES:
+        inp = bench.profile_input(name)
+        assert inp["serviceYears"] > 0
+
+
+def test_run_and_compare_flags_regressions():
+    cur = bench.run_benchmarks(["standard_60"], repeat=1, min_time=0.0, include_pdf=False, name_filter="future_value")
+    assert set(cur["results"]) == {"standard_60/calculate_future_value[reference]",
+                                   "standard_60/calculate_future_value[closed_form]"}
+    base = {"results": {k: {"median": v["median"] / 2} for k, v in cur["results"].items()}}
+    rows = bench.compare(cur, base, threshold=0.25)
+    assert len(rows) == 2 and all(r["regressed"] for r in rows)
+    assert not any(r["regressed"] for r in bench.compare(cur, cur, threshold=0.25))
+    assert cur["counters"]["standard_60/calculate_all[full]"]["retirementTaxHits"] > 0
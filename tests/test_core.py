@@ -1,10 +1,21 @@
 import math
+
+import pytest
+
+import core
 from core import (
     calculate_retirement_deduction,
     calculate_income_tax,
+    calculate_pension_tax,
     calculate_pension_deduction,
     adjusted_deduction_with_19_year_rule,
     calculate_public_pension,
+    calculate_future_value,
+    check_future_value_drift,
+    calculate_all,
+    calculate_strategy_a,
+    build_pension_component_monthly,
+    CalcCache,
 )
 
 def test_retirement_deduction_branch():
@@ -27,3 +38,208 @@ def test_19year_rule_adjustment_nonnegative():
 
 def test_public_pension_nonnegative():
     assert calculate_public_pension(avg_salary=30, years_of_service=20, exemption=False, retirement_age=60) >= 0
+
+def test_future_value_closed_form_matches_reference():
+    ref = calculate_future_value(300, 2.5, 0.03, 40, 65, 60, engine="reference")
+    fast = calculate_future_value(300, 2.5, 0.03, 40, 65, 60, engine="closed_form")
+    assert math.isclose(fast, ref, rel_tol=1e-12)
+    assert calculate_future_value(100, 1, 0.0, 50, 60, 55, engine="closed_form") == 160
+    drift = check_future_value_drift()
+    assert drift["cases"] > 0
+    assert drift["maxRelDrift"] < 1e-12
+
+
+def _sample_input(**overrides):
+    d = {
+        "currentAge": 45, "retirementAge": 60, "joinAge": 22, "serviceYears": 38,
+        "severanceReceiveAge": 60, "severancePay": 2000,
+        "dcStartAge": 22, "dcEndAge": 60, "dcCurrentBalance": 800, "dcMonthlyContribution": 2.0, "dcReturnRate": 0.03,
+        "idecoStartAge": 30, "idecoEndAge": 60, "idecoCurrentBalance": 300, "idecoMonthlyContribution": 2.3, "idecoReturnRate": 0.04,
+        "avgSalary": 45, "pensionExemption": False, "idecoContinueContribution": False, "endAge": 90,
+    }
+    d.update(overrides)
+    return d
+
+def test_calc_cache_reuses_values_and_matches_uncached():
+    inp = _sample_input(retirementAge=50, severanceReceiveAge=50, serviceYears=28, dcEndAge=50, idecoEndAge=50)
+    res = calculate_all(inp)
+    assert res["cacheStats"]["hits"] > 0
+    plain = calculate_strategy_a(inp, res["publicPensionAnnual"], 28)
+    assert plain["totalNet"] == res["strategies"][0]["totalNet"]
+    assert plain["_candidate"] == res["strategies"][0]["_candidate"]
+
+    cache = CalcCache(maxsize=2)
+    for age in (60, 61, 62, 60):
+        cache.future_value(100, 1, 0.03, 45, age, 60)
+    assert cache.stats()["size"] == 2
+    assert cache.misses == 4  # 60 was evicted before it was requested again
+
+def test_pension_component_reuses_strategy_annuities():
+    inp = _sample_input()
+    res = calculate_all(inp)
+    d = next(s for s in res["strategies"] if s["code"] == "D")
+    reused = build_pension_component_monthly(d["_candidate"], inp, res["publicPensionAnnual"], 65, 90,
+                                             pension_annual=d["_pensionAnnual"])
+    recomputed = build_pension_component_monthly(d["_candidate"], inp, res["publicPensionAnnual"], 65, 90)
+    assert reused == recomputed
+
+def test_tax_brackets_array_path_matches_scalar():
+    np = pytest.importorskip("numpy")
+    incomes = [0, 50, 194.9, 195, 329.9, 330, 694.9, 899.9, 900, 1799.9, 3999.9, 4000, 8000]
+    for x in incomes:
+        assert calculate_income_tax(np.array([x]))[0] == calculate_income_tax(x)
+    totals = np.array([0, 60, 130, 131, 330, 331, 410, 770, 1000, 1200], dtype=float)
+    for age in (64, 65):
+        ages = np.full(totals.shape, age)
+        assert list(calculate_pension_deduction(totals, ages)) == [calculate_pension_deduction(t, age) for t in totals]
+        assert list(calculate_pension_tax(totals, ages)) == [calculate_pension_tax(t, age) for t in totals]
+    by_age = calculate_pension_tax(np.full(30, 250.0), np.arange(60, 90))
+    assert list(by_age) == [calculate_pension_tax(250.0, a) for a in range(60, 90)]
+
+def test_full_search_pruning_is_exact(monkeypatch):
+    inputs = [_sample_input(), _sample_input(retirementAge=50, severanceReceiveAge=50, serviceYears=28, dcEndAge=50, idecoEndAge=50),
+              _sample_input(severancePay=0, dcReturnRate=0.0, idecoCurrentBalance=0)]
+    pruned = [calculate_all(dict(inp), search="full") for inp in inputs]
+    monkeypatch.setattr(core, "_candidate_bounds", lambda *a, **k: (float("inf"), float("-inf")))
+    for inp, res in zip(inputs, pruned):
+        ref = calculate_all(dict(inp), search="full")
+        assert [s["_candidate"] for s in res["strategies"]] == [s["_candidate"] for s in ref["strategies"]]
+        assert [s["totalNet"] for s in res["strategies"]] == [s["totalNet"] for s in ref["strategies"]]
+        assert res["best"]["code"] == ref["best"]["code"]
+        a = res["strategies"][0]["_search"]
+        assert a["candidates"] == 16 * 16 and a["evaluated"] + a["pruned"] == a["candidates"]
+
+def test_candidate_totals_match_evaluate_candidate():
+    inp = _sample_input(retirementAge=55, severanceReceiveAge=55, serviceYears=33, dcEndAge=55, idecoEndAge=55)
+    ppa = core.calculate_public_pension(inp["avgSalary"], 33, False, 55)
+    meta = {"name": "", "code": "", "describe": lambda c, _: ""}
+    memo = core.PensionTaxMemo()
+    for dc_mode, ideco_mode in (("lump", "lump"), ("lump", "pension"), ("pension", "lump"), ("pension", "pension")):
+        for age in (60, 63, 70, 75):
+            cand = {"dcMode": dc_mode, "idecoMode": ideco_mode,
+                    "dcLumpAge": age if dc_mode == "lump" else None, "idecoLumpAge": 75 if ideco_mode == "lump" else None,
+                    "dcPensionStartAge": age if dc_mode == "pension" else None,
+                    "idecoPensionStartAge": 62 if ideco_mode == "pension" else None}
+            full = core.evaluate_candidate(inp, ppa, 33, cand, meta)["strategy"]
+            totals = core._candidate_totals(inp, ppa, 33, core.candidate_options(inp, cand), memo)
+            assert totals == {k: full[k] for k in ("totalGross", "totalTax", "totalNet")}
+
+def test_pension_timeline_is_shared_by_totals_and_bands():
+    inp = _sample_input()
+    res = calculate_all(inp)
+    d = next(s for s in res["strategies"] if s["code"] == "D")
+    tl = d["pensionTimeline"]
+    assert tl["ages"] == list(range(60, 90))
+    assert all(math.isclose(g - t, n) for g, t, n in zip(tl["gross"], tl["tax"], tl["net"]))
+    cf = core.PensionCashflow.from_timeline(tl)
+    assert cf.band(65, 90)["netMonthly"] == d["monthlyIncome65plusNet"]
+    band = build_pension_component_monthly(d["_candidate"], inp, res["publicPensionAnnual"], 60, 65, cashflow=cf)
+    assert band == build_pension_component_monthly(d["_candidate"], inp, res["publicPensionAnnual"], 60, 65)
+
+
+def test_metrics_block_is_opt_in_and_counts_hot_paths():
+    inp = _sample_input()
+    plain = core.calculate_all(dict(inp))
+    assert "metrics" not in plain
+    res = core.calculate_all(dict(inp), metrics=True)
+    m = res["metrics"]
+    assert m["evaluateCandidate"] == {s["code"]: s["_search"]["evaluated"] for s in res["strategies"]}
+    assert set(m["optimizeStrategySeconds"]) == {"A", "B", "C", "D"}
+    assert m["futureValue"]["calls"] > 0 and m["futureValue"]["monthsIterated"] % 12 == 0
+    assert m["taxCalls"]["pensionTax"] > 0
+    assert core._metrics_on == 0
+    assert [s["totalNet"] for s in res["strategies"]] == [s["totalNet"] for s in plain["strategies"]]
+
+
+def test_retirement_tax_memo_is_bounded_and_exact():
+    inp = _sample_input()
+    plain = core.calculate_all(dict(inp), search="full")
+    cache = core.CalcCache(maxsize=8)
+    res = core.calculate_all(dict(inp), cache, search="full", metrics=True)
+    stats = res["cacheStats"]
+    assert stats["size"] <= 8 and stats["retirementTaxHits"] > 0
+    assert res["metrics"]["memo"] == {"retirementTaxHits": stats["retirementTaxHits"],
+                                      "retirementTaxMisses": stats["retirementTaxMisses"],
+                                      "cashflowHits": stats["cashflowHits"], "cashflowMisses": stats["cashflowMisses"]}
+    assert [s["totalNet"] for s in res["strategies"]] == [s["totalNet"] for s in plain["strategies"]]
+    cache.clear()
+    assert cache.stats()["retirementTaxHits"] == 0 and cache.stats()["cashflowHits"] == 0
+
+
+def test_retirement_tax_memo_leaves_fv_lru_and_counters_alone():
+    cache = core.CalcCache(maxsize=2)
+    fv = [cache.pmt(1000 * n, 0.03, 20) for n in range(1, 3)]
+    events = [core.LumpEvent(65, 1000 + n, (("退職一時金", 65, 1000 + n),), ((30, 65),)) for n in range(5)]
+    for event in events + events[-2:]:
+        cache.retirement_tax(event, None)
+    assert (cache.hits, cache.misses) == (0, 2)
+    stats = cache.stats()
+    assert (stats["retirementTaxHits"], stats["retirementTaxMisses"], stats["retirementTaxSize"]) == (2, 5, 2)
+    assert [cache.pmt(1000 * n, 0.03, 20) for n in range(1, 3)] == fv and cache.hits == 2
+
+
+
+def test_simulation_input_record_parses_once_and_is_frozen():
+    raw = _sample_input()
+    rec = core.SimulationInput.from_dict(dict(raw, currentAge=str(raw["currentAge"]), pensionExemption="false"))
+    assert rec.currentAge == int(raw["currentAge"]) and rec["currentAge"] == rec.currentAge
+    assert rec.pensionExemption is False
+    with pytest.raises(AttributeError):
+        rec.currentAge = 1
+    assert rec == core.SimulationInput.from_dict(rec.to_dict()) and len({rec, rec.replace()}) == 1
+    assert rec.replace(severancePay=1.0).severancePay == 1.0
+    a = core.calculate_all(dict(raw))
+    b = core.calculate_all(core.SimulationInput.from_dict(raw))
+    assert [s["totalNet"] for s in a["strategies"]] == [s["totalNet"] for s in b["strategies"]]
+    assert b["input"] == rec.to_dict()
+
+
+def test_lump_events_keep_merged_spans_and_dict_shape():
+    inp = core.SimulationInput.from_dict(_sample_input(severanceReceiveAge=60, dcStartAge=22, dcEndAge=60))
+    opts = {"dcMode": "lump", "idecoMode": "pension", "dcLumpAge": 60, "dcLumpAmount": 500.0}
+    (ev,) = core._lump_events(inp, inp.serviceYears, opts)
+    assert ev.spans == core._merge_spans(ev.periods) and ev.years == core.union_length_years(ev.to_dict()["periods"])
+    assert core.build_lump_events(inp, inp.serviceYears, opts) == [ev.to_dict()]
+    assert core._event_deduction(ev, None) == core.adjusted_deduction_with_19_year_rule(ev.to_dict(), None)
+
+def test_warm_start_hints_keep_full_search_result():
+    inp = _sample_input(currentAge=33, retirementAge=65, joinAge=39, serviceYears=26, severancePay=992,
+                        dcStartAge=39, dcCurrentBalance=436, dcMonthlyContribution=0.0, dcReturnRate=0.011,
+                        idecoStartAge=21, idecoEndAge=65, idecoCurrentBalance=16, idecoMonthlyContribution=0.5,
+                        idecoReturnRate=0.01, avgSalary=37)
+    previous = calculate_all(dict(inp), search="full")
+    for changed in (dict(inp, avgSalary=38), dict(inp, idecoReturnRate=0.02), _sample_input()):
+        cold = calculate_all(dict(changed), search="full")
+        warm = calculate_all(dict(changed), search="full", hints=core.hints_from_result(previous))
+        for c, w in zip(cold["strategies"], warm["strategies"]):
+            assert {k: v for k, v in c.items() if k != "_search"} == {k: v for k, v in w.items() if k != "_search"}
+        assert warm["best"]["code"] == cold["best"]["code"]
+    warm = calculate_all(dict(inp, avgSalary=38), search="full", hints=core.hints_from_result(previous))
+    a = warm["strategies"][0]["_search"]
+    assert a["warmStart"] and a["evaluated"] < a["candidates"] // 10
+    assert "warmStart" not in calculate_all(dict(inp), search="standard", hints=core.hints_from_result(previous))["strategies"][0]["_search"]
+
+def test_cashflow_memo_is_lru():
+    inp = core.SimulationInput.coerce(_sample_input())
+    cache = CalcCache(maxsize=2)
+    opts = [{"dcMode": "pension", "dcPensionStartAge": 60 + k, "dcPensionAnnual": 10.0} for k in range(3)]
+    first = cache.pension_cashflow(inp, 100.0, opts[0])
+    cache.pension_cashflow(inp, 100.0, opts[1])
+    assert cache.pension_cashflow(inp, 100.0, opts[0]) is first  # refreshed, so opts[1] is evicted next
+    cache.pension_cashflow(inp, 100.0, opts[2])
+    assert len(cache.cashflows) == 2 and cache.pension_cashflow(inp, 100.0, opts[0]) is first
+    misses = cache.cashflow_misses
+    cache.pension_cashflow(inp, 100.0, opts[1])
+    assert cache.cashflow_misses == misses + 1
+
+def test_pension_tax_memo_is_lru():
+    memo = core.PensionTaxMemo(maxsize=2)
+    core._pension_tax_memo(memo, 100.0, 66)
+    core._pension_tax_memo(memo, 200.0, 66)
+    core._pension_tax_memo(memo, 100.0, 70)  # hit (same bracket), refreshed
+    core._pension_tax_memo(memo, 300.0, 66)
+    assert list(memo) == [(100.0, True), (300.0, True)]
+    assert memo[(300.0, True)] == calculate_pension_tax(300.0, 66)
+    cache = CalcCache(maxsize=3)
+    calculate_all(_sample_input(), cache, search="full")
+    assert len(cache.pension_tax) <= 3
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+import golden
+
+CORPUS = os.path.join(os.path.dirname(__file__), "golden", "corpus.jsonl.gz")
+
+
+def test_corpus_covers_the_validate_input_domain():
+    cases = list(golden.read_golden(CORPUS))
+    inputs = [c["input"] for c in cases]
+    assert len(cases) == 500
+    assert any(i["serviceYears"] == 0 for i in inputs) and any(i["pensionExemption"] for i in inputs)
+    assert any(i["retirementAge"] == 75 for i in inputs) and any(i["endAge"] != 90 for i in inputs)
+    assert any("error" in c["standard"] for c in cases)
+
+
+@pytest.mark.parametrize("engine", ["reference", "shared-cache"])
+def test_current_engine_matches_frozen_outputs(engine):
+    report = golden.check(CORPUS, engine, "standard")
+    assert report["cases"] == 500 and report["mismatches"] == []
+
+
+def test_full_search_pruning_matches_unpruned_and_frozen():
+    for engine in ("reference", "full-unpruned", "warm-start"):
+        assert golden.check(CORPUS, engine, "full", limit=15)["mismatches"] == []
+
+
+def test_vectorized_engine_within_tolerance():
+    pytest.importorskip("numpy")
+    assert golden.check(CORPUS, "vectorized", "standard", limit=200)["mismatches"] == []
+
+
+def test_diff_tolerance_and_shrink():
+    exp = {"A.totalNet": 100.0, "A.dcLumpAge": 60, "best": "A"}
+    assert golden.diff(exp, {"A.totalNet": 100.0 + 1e-9, "A.dcLumpAge": 60}, golden.CLOSE) == []
+    assert [d["field"] for d in golden.diff(exp, {"A.totalNet": 100.1, "best": "B"}, golden.CLOSE)] == ["A.totalNet", "best"]
+    case = next(golden.read_golden(CORPUS))
+    inp, diffs = golden.shrink(case["input"], "reference", "standard")
+    assert diffs == [] and inp == case["input"]
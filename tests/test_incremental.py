@@ -0,0 +1,66 @@
+import core
+import incremental
+from test_core import _sample_input
+
+
+def _totals(result):
+    return [(s["code"], s["totalGross"], s["totalTax"], s["totalNet"], s["_candidate"]) for s in result["strategies"]]
+
+
+def test_invalidated_follows_dependencies():
+    assert incremental.invalidated(["avgSalary"]) == ["publicPension", "pensionTotals", "strategies", "best"]
+    dirty = incremental.invalidated(["idecoReturnRate"])
+    assert "dcFutureValue" not in dirty and "publicPension" not in dirty
+    assert {"idecoFutureValue", "annuities", "lumpEvents", "deductions", "pensionTotals"} <= set(dirty)
+    assert incremental.invalidated(["joinAge"]) == []
+
+
+def test_incremental_matches_calculate_all_and_reuses_nodes():
+    for search in ("standard", "full"):
+        calc = incremental.IncrementalCalculator()
+        base = _sample_input()
+        first = calc.calculate_all(dict(base), search)
+        assert first["incremental"]["reused"] == []
+        for key, value in (("avgSalary", base["avgSalary"] + 5), ("idecoReturnRate", base["idecoReturnRate"] + 0.01),
+                           ("severancePay", base["severancePay"] + 300)):
+            calc.calculate_all(dict(base), search)
+            inp = dict(base, **{key: value})
+            res = calc.calculate_all(dict(inp), search)
+            assert _totals(res) == _totals(core.calculate_all(dict(inp), search=search))
+            assert res["best"]["code"] == core.calculate_all(dict(inp), search=search)["best"]["code"]
+            report = res["incremental"]
+            assert report["changed"] == [key]
+            assert report["lookups"]["hits"] > 0
+        assert "publicPension" in report["reused"] and "pensionTotals" in report["reused"]
+        assert report["lookups"]["cashflowMisses"] == 0
+
+
+def test_unrelated_change_reuses_strategies_and_failure_keeps_state():
+    calc = incremental.IncrementalCalculator()
+    base = _sample_input()
+    first = calc.calculate_all(dict(base))
+    res = calc.calculate_all(dict(base, joinAge=base["joinAge"] - 1))
+    assert res["strategies"] is first["strategies"] and res["incremental"]["recomputed"] == []
+    try:
+        calc.calculate_all(dict(base, serviceYears=0, avgSalary=base["avgSalary"] + 1))
+    except IndexError:
+        pass
+    again = calc.calculate_all(dict(base, avgSalary=base["avgSalary"] + 1))
+    assert _totals(again) == _totals(core.calculate_all(dict(base, avgSalary=base["avgSalary"] + 1)))
+
+
+def test_result_cache_hits_update_baseline_and_store_no_session_data(tmp_path):
+    from result_cache import ResultCache
+    cache = ResultCache(str(tmp_path / "c.sqlite"))
+    base = _sample_input()
+    first = incremental.IncrementalCalculator(result_cache=cache)
+    first.calculate_all(dict(base))
+    first.calculate_all(dict(base, avgSalary=50))
+    stored = cache.get(cache.make_key(dict(base), search="standard", engine=core.get_future_value_engine()))
+    assert "incremental" not in stored and "cacheStats" not in stored
+    second = incremental.IncrementalCalculator(result_cache=cache)
+    hit = second.calculate_all(dict(base, avgSalary=50))
+    assert hit["incremental"]["resultCacheHit"] and second.record == core.SimulationInput.coerce(dict(base, avgSalary=50))
+    res = second.calculate_all(dict(base, avgSalary=50, severancePay=2500))
+    assert res["incremental"]["changed"] == ["severancePay"] and "publicPension" in res["incremental"]["reused"]
+    assert _totals(res) == _totals(core.calculate_all(dict(base, avgSalary=50, severancePay=2500)))
@@ -0,0 +1,39 @@
+import core
+import jobs
+from test_core import _sample_input
+
+
+def test_job_runs_calculate_all_with_progress_and_partial_best():
+    inp = _sample_input()
+    seen = []
+
+    def fn(progress):
+        def tap(pattern, done, total, strategy):
+            seen.append((pattern, done, total, strategy is not None))
+            progress(pattern, done, total, strategy)
+        return core.calculate_all(dict(inp), search="full", progress=tap)
+
+    job = jobs.CalculationJob(fn).start()
+    job.join(30)
+    snap = job.snapshot()
+    assert snap["status"] == jobs.DONE and snap["fraction"] == 1.0 and snap["finished"] == 4
+    assert [s["totalNet"] for s in job.result["strategies"]] == \
+        [s["totalNet"] for s in core.calculate_all(dict(inp), search="full")["strategies"]]
+    assert snap["bestSoFar"]["code"] == job.result["best"]["code"]
+    finished = [p for p, done, total, fin in seen if fin]
+    assert finished == ["A", "B", "C", "D"]
+    assert all(0 < done <= total for _, done, total, _ in seen)
+
+
+def test_cancel_stops_at_next_progress_call():
+    job = jobs.CalculationJob(lambda progress: core.calculate_all(_sample_input(), search="full", progress=progress))
+    job.cancel()
+    job.start().join(30)
+    snap = job.snapshot()
+    assert snap["status"] == jobs.CANCELLED and job.result is None and snap["cancelRequested"]
+
+
+def test_failure_is_reported():
+    job = jobs.CalculationJob(lambda progress: 1 / 0).start()
+    job.join(30)
+    assert job.status == jobs.FAILED and "ZeroDivisionError" in job.error
@@ -0,0 +1,43 @@
+import asyncio
+import threading
+
+import api_server
+import loadtest
+from validations import validate_input
+
+
+def test_corpus_is_valid_and_deterministic():
+    corpus = loadtest.make_corpus(30, seed=3)
+    assert corpus == loadtest.make_corpus(30, seed=3)
+    assert all(not validate_input(dict(inp)) for inp in corpus)
+    assert len({inp["retirementAge"] for inp in corpus}) > 3
+
+
+def test_core_ramp_and_compare():
+    corpus = loadtest.make_corpus(10)
+    report = loadtest.run("core", [1, 2], corpus, duration=0.2, warmup=0.0)
+    assert [lv["concurrency"] for lv in report["levels"]] == [1, 2]
+    for lv in report["levels"]:
+        assert lv["requests"] > 0 and lv["errors"] == 0
+        assert sum(lv["histogram"]["counts"]) == lv["requests"]
+        assert lv["processes"][0]["rssBytes"] > 0
+    rows = loadtest.compare(report, report)
+    assert [r["throughputRatio"] for r in rows] == [1.0, 1.0]
+
+
+def test_http_target_against_local_server():
+    loop = asyncio.new_event_loop()
+    server = api_server.ApiServer(port=0, window=0.001)
+    port = loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        report = loadtest.run("http", [2], loadtest.make_corpus(5), duration=0.3, warmup=0.0,
+                              url=f"http://127.0.0.1:{port}")
+    finally:
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+    lv = report["levels"][0]
+    assert lv["requests"] > 0 and lv["errors"] == 0
+    assert lv["processes"][0]["role"] == "server"
@@ -0,0 +1,30 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import montecarlo
+from test_core import _sample_input
+from validations import validate_input
+
+
+def _input(**overrides):
+    inp = _sample_input(**overrides)
+    assert validate_input(inp) == []
+    return inp
+
+
+def test_zero_volatility_reproduces_deterministic_totals():
+    res = montecarlo.simulate(_input(), paths=50, volatility=0.0, seed=3, chunk_size=20)
+    for row in res["strategies"]:
+        for q in ("p5", "p50", "p95"):
+            assert row[q] == pytest.approx(row["deterministicNet"], rel=1e-9, abs=1e-6)
+    assert sum(r["winRate"] for r in res["strategies"]) == pytest.approx(1.0)
+
+
+def test_seeded_runs_are_reproducible_and_ordered():
+    a = montecarlo.simulate(_input(), paths=3000, volatility=0.2, seed=7, chunk_size=1000)
+    b = montecarlo.simulate(_input(), paths=3000, volatility=0.2, seed=7, chunk_size=1000)
+    assert a["strategies"] == b["strategies"]
+    for row in a["strategies"]:
+        assert row["p5"] < row["p50"] < row["p95"]
+    assert sum(r["winRate"] for r in a["strategies"]) == pytest.approx(1.0)
@@ -0,0 +1,31 @@
+import random
+
+import pareto
+from test_core import _sample_input
+
+
+def _dominated(i, net, rate, age):
+    return any(net[j] >= net[i] and rate[j] <= rate[i] and age[j] <= age[i]
+               and (net[j], rate[j], age[j]) != (net[i], rate[i], age[i]) for j in range(len(net)))
+
+
+def test_frontier_matches_pairwise_dominance():
+    rnd = random.Random(7)
+    for _ in range(200):
+        k = rnd.randint(0, 30)
+        net = [rnd.choice([1.0, 2.0, 3.0, 4.5]) for _ in range(k)]
+        rate = [rnd.choice([0.1, 0.2, 0.3]) for _ in range(k)]
+        age = [rnd.randint(60, 63) for _ in range(k)]
+        kept = pareto.pareto_frontier(net, rate, age)
+        expected = {(net[i], rate[i], age[i]) for i in range(k) if not _dominated(i, net, rate, age)}
+        assert sorted((net[i], rate[i], age[i]) for i in kept) == sorted(expected)
+
+
+def test_calculate_pareto_is_columnar_and_non_dominated():
+    res = pareto.calculate_pareto(_sample_input())
+    cols = res["columns"]
+    assert set(cols) == set(pareto.COLUMNS)
+    assert all(len(v) == res["size"] for v in cols.values())
+    assert 0 < res["size"] <= res["evaluated"]
+    net, rate, age = cols["totalNet"], cols["effectiveTaxRate"], cols["latestAge"]
+    assert not any(_dominated(i, net, rate, age) for i in range(res["size"]))
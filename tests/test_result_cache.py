@@ -0,0 +1,114 @@
+import random
+
+import io_json
+import result_cache
+from result_cache import ResultCache, calculate_all_cached
+
+from test_core import _sample_input
+
+
+def test_hit_after_miss_and_canonical_key(tmp_path):
+    cache = ResultCache(str(tmp_path / "c.sqlite"))
+    first = calculate_all_cached(_sample_input(), cache)
+    # same input with different numeric types / key order hits the same entry
+    again = calculate_all_cached(_sample_input(severancePay=2000.0, currentAge=45.0), cache)
+    assert again["strategies"] == first["strategies"]
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["entries"] == 1
+    calculate_all_cached(_sample_input(), cache, search="full")
+    assert cache.stats()["entries"] == 2
+
+
+def test_app_version_change_invalidates(tmp_path, monkeypatch):
+    path = str(tmp_path / "c.sqlite")
+    calculate_all_cached(_sample_input(), ResultCache(path))
+    monkeypatch.setattr(io_json, "APP_VERSION", "next-version")
+    cache = ResultCache(path)
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["appVersion"] == "next-version"
+
+
+def test_size_based_lru_eviction(tmp_path):
+    rng = random.Random(0)
+    cache = ResultCache(str(tmp_path / "c.sqlite"), max_bytes=10_000)
+    for i in range(20):
+        cache.put(f"k{i}", {"payload": "".join(rng.choice("0123456789abcdef") for _ in range(4000))}, 0.01)
+        if i == 0:
+            cache.get("k0")
+    stats = cache.stats()
+    assert stats["bytes"] <= 10_000
+    assert cache.get("k19") is not None
+    assert cache.get("k0") is None and cache.get("k1") is None
+
+
+def test_disabled_by_env(monkeypatch):
+    monkeypatch.setenv("RESULT_CACHE_PATH", "off")
+    assert result_cache.cache_from_env() is None
+
+
+def test_store_or_lookup_failure_computes_once(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / "c.sqlite"))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"value": len(calls)}
+
+    def locked(*args, **kwargs):
+        raise result_cache.sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(cache, "put", locked)
+    assert cache.get_or_compute(_sample_input(), compute) == {"value": 1} and len(calls) == 1
+    monkeypatch.setattr(cache, "get", locked)
+    assert cache.get_or_compute(_sample_input(), compute) == {"value": 2} and len(calls) == 2
+
+
+def test_corrupt_payload_is_a_miss_and_gets_replaced(tmp_path):
+    import sqlite3
+    import zlib
+    path = str(tmp_path / "c.sqlite")
+    cache = ResultCache(path)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"value": len(calls)}
+
+    key = cache.make_key(_sample_input())
+    for blob in (b"garbage", zlib.compress(b'{"value": ')[:-2], zlib.compress(b"not json")):
+        cache.get_or_compute(_sample_input(), compute)
+        con = sqlite3.connect(path)
+        con.execute("UPDATE results SET value = ? WHERE key = ?", (blob, key))
+        con.commit()
+        con.close()
+        assert cache.get(key) is None
+        n = len(calls)
+        assert cache.get_or_compute(_sample_input(), compute) == {"value": n + 1}
+        assert cache.get(key) == {"value": n + 1} and len(calls) == n + 1
+
+
+def test_code_version_change_invalidates_and_changes_key(tmp_path, monkeypatch):
+    path = str(tmp_path / "c.sqlite")
+    calculate_all_cached(_sample_input(), ResultCache(path))
+    key = ResultCache.make_key(_sample_input(), search="standard")
+    monkeypatch.setattr(result_cache, "code_version", lambda: "schema-next")
+    assert ResultCache.make_key(_sample_input(), search="standard") != key
+    cache = ResultCache(path)
+    assert cache.stats()["entries"] == 0 and cache.stats()["codeVersion"] == "schema-next"
+
+
+def test_lookups_take_no_write_lock_and_counters_flush(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    cache = ResultCache(path, flush_interval=3600)
+    calculate_all_cached(_sample_input(), cache)
+    other = result_cache.sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")  # another process holds the write lock
+    try:
+        cache.timeout = 0.05
+        assert calculate_all_cached(_sample_input(), cache)["best"]
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    cache.flush()
+    stats = ResultCache(path).stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
@@ -0,0 +1,79 @@
+import math
+
+import core
+import sweep
+from test_core import _sample_input
+from validations import validate_input
+
+
+def _input(**overrides):
+    inp = _sample_input(**overrides)
+    assert validate_input(inp) == []
+    return inp
+
+
+def test_sweep_grid_matches_pointwise_calculate_all():
+    base = _input()
+    xs = sweep.grid_values(0.0, 0.05, 4)
+    ys = [base["severancePay"] - 300, base["severancePay"] + 300]
+    res = sweep.sweep(base, "dcReturnRate", xs, "severancePay", ys)
+    assert len(res["bestCode"]) == 2 and len(res["bestCode"][0]) == 4
+    for yi, y in enumerate(ys):
+        for xi, x in enumerate(xs):
+            inp = dict(base, severancePay=y, dcReturnRate=x)
+            direct = core.calculate_all(inp)
+            assert res["bestCode"][yi][xi] == direct["best"]["code"]
+            assert res["bestNet"][yi][xi] == direct["best"]["totalNet"]
+            assert [res["totalNet"][s["code"]][yi][xi] for s in direct["strategies"]] == \
+                [s["totalNet"] for s in direct["strategies"]]
+    assert res["cacheStats"]["hits"] > 0
+
+
+def test_sweep_rederives_hidden_fields_and_reports_invalid_points():
+    base = _input()
+    moved = sweep.apply_value(base, "retirementAge", base["retirementAge"] - 2)
+    assert moved["serviceYears"] == base["serviceYears"] - 2
+    assert moved["dcEndAge"] == min(moved["retirementAge"], 60)
+    res = sweep.sweep(base, "currentAge", [base["currentAge"], base["retirementAge"] + 1])
+    assert res["bestCode"][0][0] is not None and res["errors"][0][0] is None
+    assert res["bestCode"][0][1] is None and res["errors"][0][1] and math.isnan(res["bestNet"][0][1])
+
+
+def test_retirement_age_optimizer_matches_pointwise_ranking():
+    base = _input()
+    rets = [base["currentAge"] + 1, base["retirementAge"], 65]
+    sevs = [base["currentAge"] + 1, 60]
+    res = sweep.optimize_retirement_age(base, retirement_ages=rets, severance_ages=sevs)
+    optimum = None
+    for yi, sev in enumerate(res["yValues"]):
+        for xi, ret in enumerate(res["xValues"]):
+            inp = sweep.apply_value(base, "retirementAge", ret)
+            inp["severanceReceiveAge"] = sev
+            if sev > ret or validate_input(inp):
+                assert res["bestCode"][yi][xi] is None and res["errors"][yi][xi]
+                continue
+            best = core.calculate_all(inp)["best"]
+            assert (res["bestCode"][yi][xi], res["bestNet"][yi][xi]) == (best["code"], best["totalNet"])
+            cand = dict(best, retirementAge=ret, severanceReceiveAge=sev)
+            if optimum is None or core.pick_best_strategy([optimum, cand]) is cand:
+                optimum = cand
+    assert (res["optimum"]["retirementAge"], res["optimum"]["severanceReceiveAge"]) == \
+        (optimum["retirementAge"], optimum["severanceReceiveAge"])
+    assert res["evaluated"] > 0 and res["cacheStats"]["hits"] > 0
+
+
+def test_sweep_reports_calculation_failures_per_point():
+    base = _input()
+    res = sweep.sweep(base, "joinAge", [base["retirementAge"], base["joinAge"]])
+    assert res["bestCode"][0][0] is None and math.isnan(res["bestNet"][0][0])
+    assert "IndexError" in res["errors"][0][0][0]
+    assert res["bestCode"][0][1] == core.calculate_all(base)["best"]["code"] and res["errors"][0][1] is None
+
+
+def test_retirement_age_optimizer_handles_join_at_current_age():
+    base = sweep.apply_value(_input(currentAge=40, joinAge=40), "retirementAge", 60)
+    assert validate_input(base) == []
+    res = sweep.optimize_retirement_age(base)
+    assert res["xValues"][0] == 41 and res["optimum"] is not None
+    explicit = sweep.optimize_retirement_age(base, retirement_ages=[40, 60], severance_ages=[40])
+    assert explicit["bestCode"][0][0] is None and "IndexError" in explicit["errors"][0][0][0]
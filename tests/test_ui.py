@@ -0,0 +1,27 @@
+import copy
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+import core
+import ui
+from test_core import _sample_input
+
+
+def test_results_html_is_cached_by_object_and_by_content(monkeypatch):
+    res = core.calculate_all(_sample_input())
+    args = (res["strategies"], res["best"], res["input"], res["publicPensionAnnual"])
+    calls = []
+    build = ui.build_results_html
+    monkeypatch.setattr(ui, "build_results_html", lambda *a: calls.append(1) or build(*a))
+    first = ui.results_html(*args)
+    assert ui.results_html(*args) is first
+    assert ui.results_html(*copy.deepcopy(args)) == first
+    assert len(calls) == 1
+    cards, table, cashflow = first
+    assert res["best"]["name"] in cards and "mz-table" in table and "受取サマリー" in cashflow
+
+
+def test_css_is_read_once():
+    assert ui._css_markup() is ui._css_markup()
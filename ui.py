@@ -1,15 +1,24 @@
 # ui.py
 from __future__ import annotations
-from typing import Any, Dict, List, Tuple
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import threading
 import streamlit as st
 import streamlit.components.v1 as components
-from core import safe_number, build_pension_component_monthly
+from core import safe_number, build_pension_component_monthly, PensionCashflow
 import textwrap
 
-def inject_css():
+@lru_cache(maxsize=1)
+def _css_markup() -> str:
+    # assets/styles.css はプロセスごとに1回だけ読む（変更を反映するにはサーバーを再起動）
     with open("assets/styles.css", "r", encoding="utf-8") as f:
-        css = f.read()
-    st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
+        return f"<style>{f.read()}</style>"
+
+def inject_css():
+    st.markdown(_css_markup(), unsafe_allow_html=True)
 
 def render_shell_start(active_tab: int):
     st.markdown('<div class="mz-container">', unsafe_allow_html=True)
@@ -210,6 +219,12 @@ def render_input_form(defaults: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
             st.session_state["idecoContinueContribution"] = "iDeCoの追加拠出なし"
             idecoContinueContribution = "iDeCoの追加拠出なし"
     
+        st.checkbox(
+            "詳細探索（60歳〜75歳の全受取年齢・全年金開始年齢を比較）",
+            value=bool(st.session_state.get("fullSearch", False)),
+            key="fullSearch",
+        )
+
         submitted = st.form_submit_button("💡 最適戦略を計算する", use_container_width=True)
 
         # UIで非表示にした項目は内部で自動設定して計算に利用します。
@@ -248,7 +263,9 @@ def render_input_form(defaults: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
         return submitted, input_internal
 
 
-def render_results(strategies: List[Dict[str, Any]], best: Dict[str, Any], input_: Dict[str, Any], public_pension_annual: float):
+def build_results_html(strategies: List[Dict[str, Any]], best: Dict[str, Any], input_: Dict[str, Any],
+                       public_pension_annual: float) -> Tuple[str, str, str]:
+    # -> (戦略カード, 戦略比較表, おすすめ戦略の受取サマリー) のHTML
 
     def _format_strategy_description(desc: str) -> str:
         # 表示のみの整形（計算ロジックには影響しない）
@@ -265,10 +282,11 @@ def render_results(strategies: List[Dict[str, Any]], best: Dict[str, Any], input
     for s in strategies:
         is_rec = (s["code"] == best["code"])
         card_cls = "result-card recommended" if is_rec else "result-card"
+        badge = '<span class="badge">おすすめ</span>' if is_rec else ""
         eff = (s["totalTax"]/s["totalGross"]*100) if s["totalGross"]>0 else 0.0
         cards_html += textwrap.dedent(f'''
         <div class="{card_cls}">
-          <h3>{s["name"]}{("<span class=\"badge\">おすすめ</span>" if is_rec else "")}</h3>
+          <h3>{s["name"]}{badge}</h3>
           {_format_strategy_description(str(s.get("description","")))}
           <div class="result-grid">
             <div class="result-item"><label>総受取額（税引前）</label><span class="value">{_num(s["totalGross"])}万円</span></div>
@@ -315,14 +333,6 @@ def render_results(strategies: List[Dict[str, Any]], best: Dict[str, Any], input
             ''').lstrip()
         cards_html += "</div>"
 
-    st.markdown('<h2 style="color:#fff; margin-top:10px;">🎯 おすすめ戦略</h2>', unsafe_allow_html=True)
-    st.markdown('''
-    <div style="background:#fff7ed; border:1px solid #fdba74; padding:12px 14px; border-radius:12px; margin:8px 0 18px 0; color:#7c2d12; line-height:1.6;">
-      <div style="font-weight:700;">🔶 受取ルールについて</div>
-      <div>本シミュレーションでは、退職所得控除枠の復活などを考慮し、年齢優先・19年ルールに基づいて一時金受取年齢を自動最適化しています。</div>
-    </div>
-    ''', unsafe_allow_html=True)
-    st.markdown(cards_html, unsafe_allow_html=True)
 
     by_code = {s["code"]: s for s in strategies}
     A,B,C,D = by_code["A"], by_code["B"], by_code["C"], by_code["D"]
@@ -392,12 +402,15 @@ def render_results(strategies: List[Dict[str, Any]], best: Dict[str, Any], input
       </tr>
     </table>
     '''
-    st.markdown('<div style="height:8px;"></div><h2 style="color:#fff;">📊 戦略比較表</h2>', unsafe_allow_html=True)
-    st.markdown(table_html, unsafe_allow_html=True)
 
     cand = best.get("_candidate") or {}
-    bandA = build_pension_component_monthly(cand, input_, public_pension_annual, 60, 65)
-    bandB = build_pension_component_monthly(cand, input_, public_pension_annual, 65, int(input_["endAge"]))
+    # おすすめ戦略の年齢別年金キャッシュフロー（計算済み）を再利用（再計算しない）
+    pension_annual = best.get("_pensionAnnual")
+    cashflow = PensionCashflow.from_timeline(best["pensionTimeline"]) if best.get("pensionTimeline") else None
+    bandA = build_pension_component_monthly(cand, input_, public_pension_annual, 60, 65,
+                                            pension_annual=pension_annual, cashflow=cashflow)
+    bandB = build_pension_component_monthly(cand, input_, public_pension_annual, 65, int(input_["endAge"]),
+                                            pension_annual=pension_annual, cashflow=cashflow)
 
     def pension_label(prefix: str, band: Dict[str, float]) -> str:
         parts=[]
@@ -451,4 +464,243 @@ def render_results(strategies: List[Dict[str, Any]], best: Dict[str, Any], input
         </div>
       </div>
     ''').lstrip()
+    return cards_html, table_html, cashflow_html
+
+
+
+_RESULTS_HTML_MAX = 256
+_results_html_cache: "OrderedDict[str, Tuple[str, str, str]]" = OrderedDict()
+# 同じ結果オブジェクト（session_state の last_result）の再描画はハッシュも計算しない。
+# 参照を保持するので id() が別オブジェクトに再利用されることはない。
+_results_html_by_id: "OrderedDict[Tuple[int, int, int], Tuple[Any, Any, Any, float, Tuple[str, str, str]]]" = OrderedDict()
+_results_html_lock = threading.Lock()
+
+def _results_key(strategies: List[Dict[str, Any]], best: Dict[str, Any], input_: Dict[str, Any],
+                 public_pension_annual: float) -> str:
+    # 表示に使う値だけのハッシュ（pensionTimeline/_candidate はおすすめ戦略のみ使用）
+    shown = [{k: v for k, v in s.items() if not k.startswith("_") and k != "pensionTimeline"} for s in strategies]
+    payload = [shown, best.get("code"), best.get("_candidate"), best.get("_pensionAnnual"),
+               best.get("pensionTimeline"), input_, public_pension_annual]
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+def _lru_put(cache: "OrderedDict", key: Any, value: Any) -> None:
+    cache[key] = value
+    while len(cache) > _RESULTS_HTML_MAX:
+        cache.popitem(last=False)
+
+def results_html(strategies: List[Dict[str, Any]], best: Dict[str, Any], input_: Dict[str, Any],
+                 public_pension_annual: float) -> Tuple[str, str, str]:
+    # build_results_html をプロセス内で共有キャッシュ（タブ切替などの再実行では組み立て直さない）。
+    # 同じ内容の結果（別セッション・結果キャッシュからの復元）は内容ハッシュで共有する。
+    id_key = (id(strategies), id(best), id(input_))
+    with _results_html_lock:
+        hit = _results_html_by_id.get(id_key)
+        if hit is not None and hit[0] is strategies and hit[1] is best and hit[2] is input_ \
+                and hit[3] == public_pension_annual:
+            _results_html_by_id.move_to_end(id_key)
+            return hit[4]
+    key = _results_key(strategies, best, input_, public_pension_annual)
+    with _results_html_lock:
+        html = _results_html_cache.get(key)
+        if html is not None:
+            _results_html_cache.move_to_end(key)
+    if html is None:
+        html = build_results_html(strategies, best, input_, public_pension_annual)
+    with _results_html_lock:
+        _lru_put(_results_html_cache, key, html)
+        _lru_put(_results_html_by_id, id_key, (strategies, best, input_, public_pension_annual, html))
+    return html
+
+def render_results(strategies: List[Dict[str, Any]], best: Dict[str, Any], input_: Dict[str, Any], public_pension_annual: float):
+    cards_html, table_html, cashflow_html = results_html(strategies, best, input_, public_pension_annual)
+
+    st.markdown('<h2 style="color:#fff; margin-top:10px;">🎯 おすすめ戦略</h2>', unsafe_allow_html=True)
+    st.markdown('''
+    <div style="background:#fff7ed; border:1px solid #fdba74; padding:12px 14px; border-radius:12px; margin:8px 0 18px 0; color:#7c2d12; line-height:1.6;">
+      <div style="font-weight:700;">🔶 受取ルールについて</div>
+      <div>本シミュレーションでは、退職所得控除枠の復活などを考慮し、年齢優先・19年ルールに基づいて一時金受取年齢を自動最適化しています。</div>
+    </div>
+    ''', unsafe_allow_html=True)
+    st.markdown(cards_html, unsafe_allow_html=True)
+    st.markdown('<div style="height:8px;"></div><h2 style="color:#fff;">📊 戦略比較表</h2>', unsafe_allow_html=True)
+    st.markdown(table_html, unsafe_allow_html=True)
     st.markdown(cashflow_html, unsafe_allow_html=True)
+
+def _sweep_label(f: Optional[str]) -> str:
+    from sweep import SWEEP_FIELDS
+    if not f:
+        return ""
+    name, unit, _ = SWEEP_FIELDS.get(f, (f, "", 1.0))
+    return f"{name}（{unit}）"
+
+
+def _sweep_shown(f: Optional[str], v: float) -> float:
+    # 内部値 → 画面表示値（利率は%）
+    from sweep import SWEEP_FIELDS
+    return v / SWEEP_FIELDS[f][2] if f in SWEEP_FIELDS else v
+
+
+def _render_sweep_heatmap(res: Dict[str, Any]) -> None:
+    # sweep()/optimize_retirement_age() の結果（[y][x] グリッド）をヒートマップ表示
+    import altair as alt
+
+    xf, yf = res["xField"], res["yField"]
+    cells = []
+    for yi, row in enumerate(res["bestCode"]):
+        y_val = _sweep_shown(yf, res["yValues"][yi]) if yf else 0
+        for xi, code in enumerate(row):
+            cells.append({"x": round(_sweep_shown(xf, res["xValues"][xi]), 4), "y": round(y_val, 4),
+                          "code": code or "－",
+                          "net": None if code is None else round(res["bestNet"][yi][xi], 1)})
+    base = alt.Chart(alt.Data(values=cells)).encode(
+        x=alt.X("x:O", title=_sweep_label(xf)),
+        y=alt.Y("y:O", title=_sweep_label(yf), sort="descending", axis=alt.Axis() if yf else None),
+    )
+    heat = base.mark_rect().encode(
+        color=alt.Color("net:Q", title="最適戦略の手取り総額（万円）", scale=alt.Scale(scheme="greens")),
+        tooltip=[alt.Tooltip("x:O", title=_sweep_label(xf))] + ([alt.Tooltip("y:O", title=_sweep_label(yf))] if yf else [])
+                + [alt.Tooltip("code:N", title="最適戦略"), alt.Tooltip("net:Q", title="手取り総額（万円）")],
+    )
+    text = base.mark_text(fontWeight="bold").encode(text="code:N")
+    st.altair_chart((heat + text).properties(height=60 if not yf else 22 * len(res["bestCode"]) + 60),
+                    use_container_width=True)
+    n_err = sum(1 for row in res["errors"] for e in row if e)
+    st.caption(f"文字は最適戦略（A〜D）、色は手取り総額。{len(cells)}通りを {res['seconds']:.2f}秒で計算"
+               + (f"（対象外 {n_err}通りは「－」）" if n_err else ""))
+
+
+def render_sweep(input_: Dict[str, Any]) -> None:
+    # 感度分析：1〜2項目を振って最適戦略・手取り総額をヒートマップ表示
+    from sweep import SWEEP_FIELDS, grid_values, sweep
+
+    fields = list(SWEEP_FIELDS)
+    with st.expander("🔍 感度分析（条件を変えた場合の最適戦略）", expanded=False):
+        with st.form("sweepForm", clear_on_submit=False):
+            c1, c2, c3, c4 = st.columns(4)
+            x_field = c1.selectbox("横軸の項目", fields, format_func=_sweep_label, key="sweep_x")
+            x_cur = _sweep_shown(x_field, safe_number(input_.get(x_field), 0.0))
+            x_from = c2.number_input("開始", value=float(x_cur) * 0.5, key="sweep_x_from")
+            x_to = c3.number_input("終了", value=float(x_cur) * 1.5 if x_cur else 10.0, key="sweep_x_to")
+            x_steps = c4.number_input("分割数", min_value=1, max_value=41, value=11, step=1, key="sweep_x_steps")
+            c1, c2, c3, c4 = st.columns(4)
+            y_field = c1.selectbox("縦軸の項目", ["(なし)"] + fields,
+                                   format_func=lambda f: f if f == "(なし)" else _sweep_label(f), key="sweep_y")
+            y_cur = _sweep_shown(y_field, safe_number(input_.get(y_field), 0.0)) if y_field != "(なし)" else 0.0
+            y_from = c2.number_input("開始 ", value=float(y_cur) * 0.5, key="sweep_y_from")
+            y_to = c3.number_input("終了 ", value=float(y_cur) * 1.5 if y_cur else 10.0, key="sweep_y_to")
+            y_steps = c4.number_input("分割数 ", min_value=1, max_value=41, value=9, step=1, key="sweep_y_steps")
+            run = st.form_submit_button("感度分析を実行", use_container_width=True)
+
+        if run:
+            xs = [v * SWEEP_FIELDS[x_field][2] for v in grid_values(x_from, x_to, int(x_steps))]
+            if y_field == "(なし)":
+                st.session_state.sweep_result = sweep(input_, x_field, xs)
+            else:
+                ys = [v * SWEEP_FIELDS[y_field][2] for v in grid_values(y_from, y_to, int(y_steps))]
+                st.session_state.sweep_result = sweep(input_, x_field, xs, y_field, ys)
+
+        res = st.session_state.get("sweep_result")
+        if res and res["xField"] in SWEEP_FIELDS:
+            _render_sweep_heatmap(res)
+
+
+def render_retirement_age_optimizer(input_: Dict[str, Any]) -> None:
+    # 退職予定年齢 × 退職金受取年齢 の全組合せを比較（戦略の選び方と同じ基準で最適な組合せを表示）
+    from sweep import optimize_retirement_age
+
+    with st.expander("🎯 退職年齢の最適化（退職予定年齢 × 退職金受取年齢）", expanded=False):
+        if st.button("全ての組合せを計算する", key="retire_opt_run", use_container_width=True):
+            st.session_state.retire_opt_result = optimize_retirement_age(input_)
+        res = st.session_state.get("retire_opt_result")
+        if not res:
+            return
+        opt = res.get("optimum")
+        if opt:
+            st.markdown(f"**おすすめ：{opt['retirementAge']}歳で退職・{opt['severanceReceiveAge']}歳で退職金受取**　"
+                        f"{opt['name']}（手取り総額 {_num(opt['totalNet'])}万円）")
+        else:
+            st.write("条件を満たす組合せがありません。")
+        _render_sweep_heatmap(res)
+
+
+def render_pareto(input_: Dict[str, Any]) -> None:
+    # 手取り総額・実効税率・最終受取年齢のどれかで他に劣らない受取方法（パレート最適解）の一覧
+    import altair as alt
+    from pareto import calculate_pareto
+
+    with st.expander("🧭 受取方法のトレードオフ（パレート最適解）", expanded=False):
+        if st.button("全ての受取年齢の組合せを比較する", key="pareto_run", use_container_width=True):
+            st.session_state.pareto_result = calculate_pareto(input_)
+        res = st.session_state.get("pareto_result")
+        if not res:
+            return
+        cols = res["columns"]
+        points = [{"code": cols["code"][i], "dcAge": cols["dcAge"][i], "idecoAge": cols["idecoAge"][i],
+                   "latestAge": cols["latestAge"][i], "net": round(cols["totalNet"][i], 1),
+                   "rate": round(cols["effectiveTaxRate"][i] * 100, 2)} for i in range(res["size"])]
+        chart = alt.Chart(alt.Data(values=points)).mark_circle(size=60).encode(
+            x=alt.X("rate:Q", title="実効税率（%）", scale=alt.Scale(zero=False)),
+            y=alt.Y("net:Q", title="手取り総額（万円）", scale=alt.Scale(zero=False)),
+            color=alt.Color("latestAge:Q", title="最終受取年齢", scale=alt.Scale(scheme="viridis")),
+            shape=alt.Shape("code:N", title="戦略"),
+            tooltip=[alt.Tooltip("code:N", title="戦略"), alt.Tooltip("dcAge:Q", title="DC受取年齢"),
+                     alt.Tooltip("idecoAge:Q", title="iDeCo受取年齢"), alt.Tooltip("net:Q", title="手取り総額（万円）"),
+                     alt.Tooltip("rate:Q", title="実効税率（%）")],
+        )
+        st.altair_chart(chart, use_container_width=True)
+        st.caption(f"{res['evaluated']:,}通りのうち {res['size']:,}通りがパレート最適（{res['seconds']:.2f}秒）。"
+                   "左上ほど有利、色が濃いほど早く受け取り終わります。")
+
+
+def render_job_progress(snap: Dict[str, Any]) -> bool:
+    # バックグラウンド計算の進捗（jobs.CalculationJob.snapshot()）。中止ボタンが押されたら True
+    label = "計算中…"
+    if snap.get("pattern") and snap.get("total"):
+        label = f"計算中… 戦略{snap['pattern']}：候補 {snap['done']:,} / {snap['total']:,}"
+    if snap.get("cancelRequested"):
+        label = "中止しています…"
+    st.progress(min(1.0, max(0.0, snap.get("fraction", 0.0))), text=label)
+    best = snap.get("bestSoFar")
+    if best:
+        st.caption(f"暫定のおすすめ（{snap['finished']}/4 戦略計算済み）：{best['name']}　手取り総額 {_num(best['totalNet'])}万円")
+    st.caption(f"経過 {snap.get('seconds', 0.0):.1f}秒")
+    return st.button("⏹ 計算を中止", key="calc_job_cancel", disabled=bool(snap.get("cancelRequested")))
+
+
+def render_cache_debug(cache) -> None:
+    # 管理者向け（?debug=1）：結果キャッシュのヒット率・短縮時間
+    with st.expander("🛠 結果キャッシュ（管理者向け）", expanded=False):
+        if cache is None:
+            st.write("結果キャッシュは無効です（RESULT_CACHE_PATH=off）。")
+            return
+        stats = cache.stats()
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("ヒット率", f"{stats['hitRatio']*100:.1f}%")
+        c2.metric("ヒット / ミス", f"{stats['hits']:,} / {stats['misses']:,}")
+        c3.metric("短縮した計算時間", f"{stats['savedSeconds']:.2f}秒")
+        c4.metric("使用量", f"{stats['bytes']/1024/1024:.1f} / {stats['maxBytes']/1024/1024:.0f}MB")
+        st.caption(f"件数 {stats['entries']:,}・平均読込 {stats['avgLookupSeconds']*1000:.2f}ms・{stats['appVersion']}")
+        if st.button("キャッシュを削除", key="clear_result_cache"):
+            cache.clear()
+            st.rerun()
+
+def render_metrics_debug(metrics: Optional[Dict[str, Any]]) -> None:
+    # 管理者向け（?debug=1）：直近の計算の内訳（calculate_all(..., metrics=True)）
+    with st.expander("🛠 計算メトリクス（管理者向け）", expanded=False):
+        if not metrics:
+            st.write("メトリクスはありません（?debug=1 の状態で計算すると記録されます）。")
+            return
+        st.caption(f"合計 {metrics.get('totalSeconds', 0.0)*1000:.1f}ms")
+        secs = metrics.get("optimizeStrategySeconds", {})
+        evals = metrics.get("evaluateCandidate", {})
+        totals = metrics.get("candidateTotals", {})
+        rows = [{"戦略": code, "所要時間(ms)": round(secs.get(code, 0.0)*1000, 2),
+                 "evaluate_candidate": evals.get(code, 0), "候補合計のみ評価": totals.get(code, 0)}
+                for code in sorted(set(secs) | set(evals) | set(totals))]
+        st.table(rows)
+        fv = metrics.get("futureValue", {})
+        st.write(f"calculate_future_value：{fv.get('calls', 0):,}回（月次ループ {fv.get('monthsIterated', 0):,}か月）")
+        st.write("税計算の呼び出し回数：" + "・".join(f"{k} {v:,}" for k, v in metrics.get("taxCalls", {}).items()))
+        memo = metrics.get("memo", {})
+        st.write(f"退職所得税メモ：ヒット {memo.get('retirementTaxHits', 0):,}回・計算 {memo.get('retirementTaxMisses', 0):,}回")
+        st.write(f"年金キャッシュフローメモ：ヒット {memo.get('cashflowHits', 0):,}回・計算 {memo.get('cashflowMisses', 0):,}回")